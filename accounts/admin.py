@@ -1,10 +1,12 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from core.admin_tools import ScalableChangeListMixin
+from ledger.services import LedgerService
 from .models import User
 
 
 @admin.register(User)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(ScalableChangeListMixin, UserAdmin):
 
     list_display = (
         "username",
@@ -20,6 +22,7 @@ class CustomUserAdmin(UserAdmin):
     list_filter = ("user_type", "is_active", "is_staff", "created_at")
     search_fields = ("username", "email", "first_name", "last_name", "phone_number")
     ordering = ("-created_at",)
+    date_hierarchy = "created_at"
 
     fieldsets = (
         (None, {"fields": ("username", "password")}),
@@ -65,3 +68,12 @@ class CustomUserAdmin(UserAdmin):
     )
 
     readonly_fields = ("created_at", "updated_at", "date_joined", "last_login")
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Book balance edits in the ledger as adjustments
+        if "wallet_balance" in form.changed_data:
+            LedgerService.sync_wallets(
+                User.objects.filter(pk=obj.pk),
+                description=f"Balance set in the admin by {request.user}",
+            )
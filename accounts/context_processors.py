@@ -0,0 +1,18 @@
+from django.utils.functional import SimpleLazyObject
+
+from .services import UserSnapshotService
+
+
+def user_snapshot(request):
+    """
+    Expose the logged-in user's cached snapshot as ``user_snapshot``.
+
+    Templates shared by every page (the navbar) read it instead of ``user``,
+    so rendering them does not load the ``auth_user`` row. None when
+    anonymous.
+    """
+    return {
+        "user_snapshot": SimpleLazyObject(
+            lambda: UserSnapshotService.for_request(request)
+        )
+    }
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from accounts.services import OTPService
+
+
+class Command(BaseCommand):
+    help = "Delete expired OTP codes in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=OTPService.PURGE_BATCH_SIZE,
+            help="Number of rows deleted per statement",
+        )
+
+    def handle(self, *args, **options):
+        deleted = OTPService.purge_expired(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired OTP(s)."))
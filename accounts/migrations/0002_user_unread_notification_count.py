@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-19 09:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="unread_notification_count",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Cached number of unread in-app notifications"
+            ),
+        ),
+    ]
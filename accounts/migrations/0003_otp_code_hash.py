@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-19 09:43
+
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def hash_existing_codes(apps, schema_editor):
+    OTP = apps.get_model("accounts", "OTP")
+    key = settings.SECRET_KEY.encode()
+    for otp in OTP.objects.filter(is_used=False).only("id", "code").iterator():
+        otp.code_hash = hmac.new(key, otp.code.encode(), hashlib.sha256).hexdigest()
+        otp.save(update_fields=["code_hash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_user_unread_notification_count"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="otp",
+            name="accounts_ot_user_id_791635_idx",
+        ),
+        migrations.AddField(
+            model_name="otp",
+            name="code_hash",
+            field=models.CharField(
+                default="",
+                help_text="Keyed hash of the OTP code (never stored in clear)",
+                max_length=64,
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(hash_existing_codes, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="otp",
+            name="code",
+        ),
+        migrations.AddIndex(
+            model_name="otp",
+            index=models.Index(
+                fields=["user", "purpose", "is_used"],
+                name="accounts_ot_user_id_2dc7bd_idx",
+            ),
+        ),
+    ]
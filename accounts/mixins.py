@@ -2,15 +2,18 @@ from django.shortcuts import redirect
 from django.contrib import messages
 from django.urls import reverse
 
+from .services import UserSnapshotService
+
 
 class EmailVerificationRequiredMixin:
 
     def dispatch(self, request, *args, **kwargs):
-        if not request.user.is_authenticated:
+        snapshot = UserSnapshotService.for_request(request)
+        if snapshot is None:
             messages.error(request, "You must be logged in to access this page.")
             return redirect("accounts:login")
 
-        if not request.user.is_verified:
+        if not snapshot.is_verified:
             messages.warning(
                 request, "Please verify your email address to access this page."
             )
@@ -1,7 +1,10 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
 from django.utils import timezone
 from django.conf import settings
+import hashlib
+import hmac
 import random
 import string
 
@@ -36,9 +39,74 @@ class User(AbstractUser):
     profile_picture_url = models.URLField(
         blank=True, null=True, help_text="URL to user's profile picture"
     )
+    unread_notification_count = models.PositiveIntegerField(
+        default=0, help_text="Cached number of unread in-app notifications"
+    )
+
+    # Maintained with F() updates only; a full save() from a stale instance
+    # (e.g. request.user) must not write them back.
+    COUNTER_FIELDS = ("unread_notification_count",)
 
     class Meta:
         db_table = "auth_user"
+        indexes = [
+            # Admin changelist ordering and date hierarchy
+            models.Index(fields=["created_at"]),
+        ]
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        previous = None
+        if not self._state.adding:
+            if update_fields is None:
+                kwargs["update_fields"] = [
+                    field.name
+                    for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in self.COUNTER_FIELDS
+                ]
+            if update_fields is None or {"first_name", "last_name"} & set(
+                update_fields
+            ):
+                previous = (
+                    User.objects.filter(pk=self.pk)
+                    .values_list("first_name", "last_name")
+                    .first()
+                )
+        super().save(*args, **kwargs)
+        User.invalidate_snapshot(self.pk)
+        if previous is not None and previous != (self.first_name, self.last_name):
+            from appointments.models import Appointment, CalendarFeed
+
+            # The other side of each appointment sees this name in their feed
+            CalendarFeed.touch_listing(
+                Appointment.objects.filter(
+                    models.Q(patient=self.pk) | models.Q(doctor__user=self.pk)
+                )
+            )
+
+    def delete(self, *args, **kwargs):
+        user_id = self.pk
+        result = super().delete(*args, **kwargs)
+        User.invalidate_snapshot(user_id)
+        return result
+
+    @staticmethod
+    def snapshot_cache_key(user_id):
+        # Versioned by the UserSnapshot layout, so entries cached by older
+        # code are never read back with fields missing
+        return f"user-snapshot:2:{user_id}"
+
+    @staticmethod
+    def invalidate_snapshot(user_id):
+        """Drop the cached UserSnapshot now and again once the transaction commits."""
+        User.invalidate_snapshots([user_id])
+
+    @staticmethod
+    def invalidate_snapshots(user_ids):
+        """Drop the cached UserSnapshots of ``user_ids`` in one cache call."""
+        keys = [User.snapshot_cache_key(user_id) for user_id in user_ids]
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
 
 
 class OTP(models.Model):
@@ -46,7 +114,9 @@ class OTP(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="otps"
     )
-    code = models.CharField(max_length=10, help_text="OTP code")
+    code_hash = models.CharField(
+        max_length=64, help_text="Keyed hash of the OTP code (never stored in clear)"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
     is_used = models.BooleanField(default=False)
@@ -59,17 +129,38 @@ class OTP(models.Model):
     class Meta:
         ordering = ["-created_at"]
         indexes = [
-            models.Index(fields=["user", "is_used"]),
+            models.Index(fields=["user", "purpose", "is_used"]),
             models.Index(fields=["expires_at"]),
         ]
 
     def __str__(self):
-        return f"OTP for {self.user.email} - {self.code}"
+        return f"OTP for {self.user.email} - {self.purpose}"
+
+    @staticmethod
+    def hash_code(code):
+        """Return the keyed hash stored in place of ``code``."""
+        return hmac.new(
+            settings.SECRET_KEY.encode(), str(code).encode(), hashlib.sha256
+        ).hexdigest()
+
+    @property
+    def code(self):
+        """Plain-text code; only available on the instance that generated it."""
+        return getattr(self, "_code", None)
+
+    @code.setter
+    def code(self, value):
+        self._code = value
+        self.code_hash = self.hash_code(value)
 
     @classmethod
     def generate_otp(cls, user, purpose="verification"):
         """Generate a new OTP for the user."""
-        cls.objects.filter(user=user, is_used=False).update(is_used=True)
+        # Only the user's live code for this purpose can match; the
+        # (user, purpose, is_used) index keeps this to a single-row update.
+        cls.objects.filter(user=user, purpose=purpose, is_used=False).update(
+            is_used=True
+        )
 
         code = "".join(random.choices(string.digits, k=settings.OTP_LENGTH))
 
@@ -88,4 +179,4 @@ class OTP(models.Model):
 
     def mark_as_used(self):
         self.is_used = True
-        self.save()
+        self.save(update_fields=["is_used"])
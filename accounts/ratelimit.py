@@ -0,0 +1,58 @@
+import time
+
+from django.core.cache import cache
+
+
+class RateLimitExceeded(Exception):
+    """Raised when an action is attempted more often than its limit allows."""
+
+
+class SlidingWindowRateLimiter:
+    """
+    Approximate sliding-window rate limiter backed by the Django cache.
+
+    Keeps one counter per fixed window and weights the previous window by how
+    much of it still overlaps the sliding window, so a check costs a single
+    get_many and a hit a single incr, with no per-request bookkeeping.
+    """
+
+    def __init__(self, scope, limit, window):
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+
+    def _key(self, ident, index):
+        return f"ratelimit:{self.scope}:{ident}:{index}"
+
+    def _state(self, ident):
+        index, offset = divmod(time.time(), self.window)
+        current_key = self._key(ident, int(index))
+        previous_key = self._key(ident, int(index) - 1)
+
+        counts = cache.get_many([current_key, previous_key])
+        overlap = 1 - offset / self.window
+        estimate = counts.get(previous_key, 0) * overlap + counts.get(current_key, 0)
+        return estimate, current_key
+
+    def is_allowed(self, ident):
+        """Return True if ``ident`` still has budget in the current window."""
+        estimate, _key = self._state(ident)
+        return estimate < self.limit
+
+    def hit(self, ident):
+        """Record one attempt for ``ident``."""
+        _estimate, key = self._state(ident)
+        # Keep the counter alive for the window after it, which still reads it
+        cache.add(key, 0, timeout=self.window * 2)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Evicted between add() and incr()
+            cache.set(key, 1, timeout=self.window * 2)
+
+    def allow(self, ident):
+        """Record an attempt if there is budget left; return whether it was allowed."""
+        if not self.is_allowed(ident):
+            return False
+        self.hit(ident)
+        return True
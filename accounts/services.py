@@ -1,14 +1,35 @@
+from dataclasses import dataclass
+
+from django.contrib.auth import HASH_SESSION_KEY, SESSION_KEY
+from django.core.cache import cache
 from django.core.mail import send_mail
 from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
 from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
 from django.utils.html import strip_tags
 from .models import User, OTP
+from .ratelimit import RateLimitExceeded, SlidingWindowRateLimiter
 
 
 class OTPService:
+    PURGE_BATCH_SIZE = 1000
+    send_limiter = SlidingWindowRateLimiter("otp-send", *settings.OTP_SEND_RATE_LIMIT)
+    verify_limiter = SlidingWindowRateLimiter(
+        "otp-verify", *settings.OTP_VERIFY_RATE_LIMIT
+    )
+
+    @staticmethod
+    def _check_send_limit(user, purpose):
+        if not OTPService.send_limiter.allow(f"{user.pk}:{purpose}"):
+            raise RateLimitExceeded(
+                "Too many codes requested. Please wait a few minutes and try again."
+            )
 
     @staticmethod
     def send_verification_otp(user):
+        OTPService._check_send_limit(user, "email_verification")
         otp = OTP.generate_otp(user, purpose="email_verification")
 
         subject = "Verify Your Email Address - Booking System"
@@ -50,6 +71,7 @@ class OTPService:
 
     @staticmethod
     def send_password_reset_otp(user):
+        OTPService._check_send_limit(user, "password_reset")
         otp = OTP.generate_otp(user, purpose="password_reset")
 
         subject = "Password Reset Request - Booking System"
@@ -91,8 +113,16 @@ class OTPService:
 
     @staticmethod
     def verify_otp(user, code, purpose="email_verification"):
+        if not OTPService.verify_limiter.allow(f"{user.pk}:{purpose}"):
+            return False, "Too many attempts. Please wait a few minutes and try again."
+
         try:
-            otp = OTP.objects.get(user=user, code=code, purpose=purpose, is_used=False)
+            otp = OTP.objects.get(
+                user=user,
+                purpose=purpose,
+                is_used=False,
+                code_hash=OTP.hash_code(code),
+            )
 
             if not otp.is_valid():
                 return False, "OTP has expired"
@@ -121,3 +151,155 @@ class OTPService:
             return OTPService.send_password_reset_otp(user)
         else:
             raise ValueError("Invalid OTP purpose")
+
+    @staticmethod
+    def purge_expired(batch_size=None):
+        """
+        Delete expired OTPs in chunks so no single statement holds long locks.
+
+        Returns:
+            int: Number of OTPs deleted
+        """
+        batch_size = batch_size or OTPService.PURGE_BATCH_SIZE
+        expired = OTP.objects.filter(expires_at__lt=timezone.now())
+
+        deleted = 0
+        while True:
+            ids = list(
+                expired.order_by("expires_at").values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            deleted += OTP.objects.filter(id__in=ids).delete()[0]
+
+        return deleted
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """The handful of user attributes needed to authorise a request."""
+
+    id: int
+    user_type: str
+    is_superuser: bool
+    is_active: bool
+    is_verified: bool
+    doctor_id: int | None
+    # Bumped by every save of the user row, which is how wallet moves are written
+    wallet_version: int
+    session_auth_hash: str
+    # What the navbar shows, so rendering it never loads request.user
+    username: str
+    full_name: str
+    unread_notification_count: int
+
+    @property
+    def is_admin(self):
+        return self.is_superuser or self.user_type == "admin"
+
+
+class UserSnapshotService:
+    """
+    Cache-backed lightweight view of a user for permission checks.
+
+    Reading the snapshot through the session lets hot-path checks and the
+    navbar skip the full ``auth_user`` row and the ``doctor_profile`` lookup.
+    Entries are dropped whenever the user or their doctor profile is saved
+    and whenever the unread notification counter moves.
+    """
+
+    FIELDS = (
+        "id",
+        "user_type",
+        "is_superuser",
+        "is_active",
+        "is_verified",
+        "password",
+        "updated_at",
+        "doctor_profile__id",
+        "username",
+        "first_name",
+        "last_name",
+        "unread_notification_count",
+    )
+
+    @staticmethod
+    def get(user_id):
+        """
+        Return the snapshot for ``user_id``, loading it with one query on a miss.
+
+        Returns:
+            UserSnapshot or None: None if the user does not exist
+        """
+        key = User.snapshot_cache_key(user_id)
+        snapshot = cache.get(key)
+        if snapshot is not None:
+            return snapshot
+
+        # Always from the primary: the key has no version, so a row read
+        # from a lagging replica would be served until the entry expires
+        row = (
+            User.objects.using(DEFAULT_DB_ALIAS)
+            .filter(pk=user_id)
+            .values(*UserSnapshotService.FIELDS)
+            .first()
+        )
+        if row is None:
+            return None
+
+        snapshot = UserSnapshot(
+            id=row["id"],
+            user_type=row["user_type"],
+            is_superuser=row["is_superuser"],
+            is_active=row["is_active"],
+            is_verified=row["is_verified"],
+            doctor_id=row["doctor_profile__id"],
+            wallet_version=int(row["updated_at"].timestamp() * 1_000_000),
+            session_auth_hash=User(password=row["password"]).get_session_auth_hash(),
+            username=row["username"],
+            full_name=f"{row['first_name']} {row['last_name']}".strip(),
+            unread_notification_count=row["unread_notification_count"],
+        )
+        cache.set(key, snapshot, settings.USER_SNAPSHOT_TIMEOUT)
+        return snapshot
+
+    @staticmethod
+    def for_user(user):
+        """Return the snapshot for an already resolved user, or None if anonymous."""
+        if not user.is_authenticated:
+            return None
+        return UserSnapshotService.get(user.pk)
+
+    @staticmethod
+    def for_request(request):
+        """
+        Return the snapshot of the logged-in user without loading ``request.user``.
+
+        The session's auth hash is checked against the snapshot the same way
+        ``django.contrib.auth.get_user`` does; on any mismatch this falls back
+        to resolving ``request.user`` so logout-on-password-change still holds.
+
+        Returns:
+            UserSnapshot or None: None for anonymous requests
+        """
+        if hasattr(request, "_user_snapshot"):
+            return request._user_snapshot
+
+        snapshot = None
+        session = getattr(request, "session", None)
+        if session is not None and SESSION_KEY in session:
+            user_id = User._meta.pk.to_python(session[SESSION_KEY])
+            snapshot = UserSnapshotService.get(user_id)
+            if not (
+                snapshot is not None
+                and snapshot.is_active
+                and constant_time_compare(
+                    session.get(HASH_SESSION_KEY, ""), snapshot.session_auth_hash
+                )
+            ):
+                snapshot = UserSnapshotService.for_user(request.user)
+        elif hasattr(request, "user"):
+            snapshot = UserSnapshotService.for_user(request.user)
+
+        request._user_snapshot = snapshot
+        return snapshot
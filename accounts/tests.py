@@ -1,9 +1,18 @@
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.urls import reverse
 from django.contrib.auth.forms import AuthenticationForm
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+from datetime import timedelta
 from decimal import Decimal
+from io import StringIO
+import re
 
 User = get_user_model()
 
@@ -349,6 +358,7 @@ class RegistrationViewsTest(TestCase):
 
     def setUp(self):
         """Set up test data."""
+        cache.clear()  # reset OTP rate-limit counters
         self.client = Client()
         self.registration_data = {
             "first_name": "John",
@@ -547,6 +557,7 @@ class OTPVerificationTests(TestCase):
 
     def setUp(self):
         """Set up test data."""
+        cache.clear()  # reset OTP rate-limit counters
         self.user = User.objects.create_user(
             username="testuser@example.com",
             email="testuser@example.com",
@@ -682,7 +693,7 @@ class OTPVerificationTests(TestCase):
 
         otps = OTP.objects.filter(user=self.user, is_used=False)
         self.assertEqual(otps.count(), 1)
-        self.assertNotEqual(otps.first().code, initial_otp.code)
+        self.assertNotEqual(otps.first().code_hash, initial_otp.code_hash)
 
     def test_otp_verification_requires_login(self):
         """Test that OTP verification requires login."""
@@ -729,6 +740,7 @@ class PasswordResetTests(TestCase):
 
     def setUp(self):
         """Set up test data."""
+        cache.clear()  # reset OTP rate-limit counters
         self.user = User.objects.create_user(
             username="testuser@example.com",
             email="testuser@example.com",
@@ -900,7 +912,7 @@ class PasswordResetTests(TestCase):
             user=self.user, is_used=False, purpose="password_reset"
         )
         self.assertEqual(otps.count(), 1)
-        self.assertNotEqual(otps.first().code, initial_otp.code)
+        self.assertNotEqual(otps.first().code_hash, initial_otp.code_hash)
 
     def test_password_reset_authenticated_user_redirect(self):
         """Test that authenticated users are redirected from password reset request."""
@@ -926,18 +938,14 @@ class PasswordResetTests(TestCase):
         # Check email was sent
         self.assertEqual(len(mail.outbox), 1)
 
-        # Step 2: Get OTP from email (in real scenario, user would read email)
-        from accounts.models import OTP
-
-        otp = OTP.objects.filter(
-            user=self.user, purpose="password_reset", is_used=False
-        ).first()
+        # Step 2: Get OTP from email; only its hash is stored
+        code = re.search(r"\b\d{6}\b", mail.outbox[0].body).group()
 
         # Step 3: Reset password with OTP
         response = self.client.post(
             reverse("accounts:password_reset", kwargs={"user_id": self.user.id}),
             {
-                "otp_code": otp.code,
+                "otp_code": code,
                 "new_password1": "newpassword123",
                 "new_password2": "newpassword123",
             },
@@ -951,6 +959,195 @@ class PasswordResetTests(TestCase):
         self.assertFalse(self.user.check_password("oldpassword123"))
 
 
+class OTPHardeningTests(TestCase):
+    """Test cases for OTP hashing, rate limiting and purging."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser@example.com",
+            email="testuser@example.com",
+            password="testpass123",
+            is_verified=False,
+        )
+
+    def test_code_is_stored_hashed(self):
+        """Test that only the keyed hash of the code reaches the database."""
+        from accounts.models import OTP
+        from accounts.services import OTPService
+
+        otp = OTPService.send_verification_otp(self.user)
+        stored = OTP.objects.get(pk=otp.pk)
+
+        self.assertIsNone(stored.code)
+        self.assertEqual(stored.code_hash, OTP.hash_code(otp.code))
+        self.assertNotIn(otp.code, stored.code_hash)
+
+    def test_generate_only_invalidates_same_purpose(self):
+        """Test that a new code leaves codes for other purposes usable."""
+        from accounts.models import OTP
+
+        reset = OTP.generate_otp(self.user, purpose="password_reset")
+        OTP.generate_otp(self.user, purpose="email_verification")
+
+        reset.refresh_from_db()
+        self.assertFalse(reset.is_used)
+
+    def test_send_rate_limited(self):
+        """Test that requesting too many codes is refused."""
+        from accounts.ratelimit import RateLimitExceeded
+        from accounts.services import OTPService
+
+        limit, _window = settings.OTP_SEND_RATE_LIMIT
+        for _ in range(limit):
+            OTPService.send_verification_otp(self.user)
+
+        with self.assertRaises(RateLimitExceeded):
+            OTPService.send_verification_otp(self.user)
+        # Other purposes have their own budget
+        OTPService.send_password_reset_otp(self.user)
+
+    def test_verify_rate_limited(self):
+        """Test that brute-forcing codes is cut off even for the right code."""
+        from accounts.services import OTPService
+
+        otp = OTPService.send_verification_otp(self.user)
+        limit, _window = settings.OTP_VERIFY_RATE_LIMIT
+        for _ in range(limit):
+            success, _message = OTPService.verify_otp(self.user, "000000")
+            self.assertFalse(success)
+
+        success, message = OTPService.verify_otp(self.user, otp.code)
+
+        self.assertFalse(success)
+        self.assertIn("Too many attempts", message)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_verified)
+
+    def test_purge_expired_otps_command(self):
+        """Test that the purge command deletes only expired codes."""
+        from accounts.models import OTP
+
+        live = OTP.generate_otp(self.user, purpose="email_verification")
+        for _ in range(3):
+            OTP.objects.create(
+                user=self.user,
+                code="123456",
+                expires_at=timezone.now() - timedelta(minutes=1),
+            )
+
+        call_command("purge_expired_otps", "--batch-size", "2", stdout=StringIO())
+
+        self.assertEqual(list(OTP.objects.values_list("id", flat=True)), [live.id])
+
+
+class UserSnapshotTests(TestCase):
+    """Test cases for the cached user snapshot."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser@example.com",
+            email="testuser@example.com",
+            password="testpass123",
+            is_verified=False,
+        )
+
+    def test_snapshot_is_cached(self):
+        """Test that a cached snapshot costs no queries."""
+        from accounts.services import UserSnapshotService
+
+        snapshot = UserSnapshotService.get(self.user.pk)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(UserSnapshotService.get(self.user.pk), snapshot)
+        self.assertEqual(snapshot.user_type, "patient")
+        self.assertIsNone(snapshot.doctor_id)
+
+    def test_snapshot_invalidated_on_save(self):
+        """Test that saving the user refreshes the snapshot."""
+        from accounts.services import UserSnapshotService
+
+        before = UserSnapshotService.get(self.user.pk)
+        self.user.is_verified = True
+        self.user.wallet_balance = Decimal("25.00")
+        self.user.save()
+
+        after = UserSnapshotService.get(self.user.pk)
+        self.assertTrue(after.is_verified)
+        self.assertGreater(after.wallet_version, before.wallet_version)
+
+    def test_snapshot_tracks_doctor_profile(self):
+        """Test that creating a doctor profile refreshes the doctor id."""
+        from accounts.services import UserSnapshotService
+        from doctors.models import Doctor, Specialty
+
+        UserSnapshotService.get(self.user.pk)
+        admin = User.objects.create_user(
+            username="admin", email="admin@example.com", user_type="admin"
+        )
+        doctor = Doctor.objects.create(
+            user=self.user,
+            specialty=Specialty.objects.create(
+                name="Cardiology", description="Heart specialist"
+            ),
+            license_number="LIC1",
+            experience_years=1,
+            bio="Bio",
+            consultation_fee=Decimal("50.00"),
+            created_by=admin,
+        )
+
+        self.assertEqual(UserSnapshotService.get(self.user.pk).doctor_id, doctor.id)
+        self.assertTrue(UserSnapshotService.get(admin.pk).is_admin)
+
+    def test_request_snapshot_skips_user_row(self):
+        """Test that a warm snapshot authorises a request without loading the user."""
+        from accounts.services import UserSnapshotService
+
+        self.client.login(username="testuser@example.com", password="testpass123")
+        request = self.client.get(reverse("core:home")).wsgi_request
+        request.__dict__.pop("_user_snapshot", None)
+        UserSnapshotService.get(self.user.pk)
+
+        with self.assertNumQueries(0):
+            snapshot = UserSnapshotService.for_request(request)
+        self.assertEqual(snapshot.id, self.user.pk)
+
+    def test_navbar_renders_from_snapshot(self):
+        """Test that the navbar needs no user row and shows the unread count."""
+        from notifications.services import NotificationService
+
+        self.client.login(username="testuser@example.com", password="testpass123")
+        self.client.get(reverse("core:home"))
+        NotificationService.notify(self.user, "Hello")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("core:home"))
+
+        self.assertContains(response, "testuser@example.com")
+        self.assertEqual(response.context["user_snapshot"].unread_notification_count, 1)
+        # Only the snapshot's narrow reload, never the full row
+        self.assertFalse(
+            [q for q in queries.captured_queries if "last_login" in q["sql"]]
+        )
+
+    def test_request_snapshot_respects_password_change(self):
+        """Test that changing the password still logs other sessions out."""
+        from accounts.services import UserSnapshotService
+
+        self.client.login(username="testuser@example.com", password="testpass123")
+        self.user.set_password("newpass456")
+        self.user.save()
+
+        request = self.client.get(reverse("core:home")).wsgi_request
+        request.__dict__.pop("_user_snapshot", None)
+
+        self.assertIsNone(UserSnapshotService.for_request(request))
+
+
 class GoogleOAuthTests(TestCase):
     """Test cases for Google OAuth functionality."""
 
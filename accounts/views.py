@@ -9,6 +9,7 @@ from django.utils.http import url_has_allowed_host_and_scheme
 from django.conf import settings
 from django.views.generic import TemplateView, RedirectView
 from django.contrib.auth import get_user_model
+from appointments.models import CalendarFeed
 from .forms import (
     CustomLoginForm,
     UserRegistrationForm,
@@ -16,6 +17,7 @@ from .forms import (
     PasswordResetRequestForm,
     PasswordResetForm,
 )
+from .ratelimit import RateLimitExceeded
 from .services import OTPService
 
 User = get_user_model()
@@ -75,8 +77,24 @@ class ProfileView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["user"] = self.request.user
+        feed = CalendarFeed.objects.filter(user=self.request.user).first()
+        if feed is not None:
+            context["calendar_feed_url"] = self.request.build_absolute_uri(
+                reverse("appointments:calendar_feed", args=[feed.token])
+            )
         return context
 
+    def post(self, request, *args, **kwargs):
+        """Create the calendar feed link, or replace it with a new one."""
+        _feed, created = CalendarFeed.reset(request.user)
+        if created:
+            messages.success(request, "Your calendar link is ready.")
+        else:
+            messages.success(
+                request, "Your calendar link was reset. The old link no longer works."
+            )
+        return redirect("accounts:profile")
+
 
 def get_redirect_url(request):
     if not request.user.is_authenticated:
@@ -221,6 +239,8 @@ class PasswordResetRequestView(TemplateView):
                         f"Password reset code sent to {email}. Please check your email.",
                     )
                     return redirect("accounts:password_reset", user_id=user.id)
+                except RateLimitExceeded as e:
+                    messages.error(request, str(e))
                 except Exception as e:
                     messages.error(
                         request,
@@ -309,6 +329,8 @@ def resend_password_reset_otp(request, user_id):
         try:
             OTPService.send_password_reset_otp(user)
             success, message = True, "New password reset code sent successfully."
+        except RateLimitExceeded as e:
+            success, message = False, str(e)
         except Exception as e:
             success, message = False, "Failed to send password reset code."
 
@@ -0,0 +1,25 @@
+from django.contrib import admin
+from .models import DoctorDailyStats, RollupWatermark
+
+
+@admin.register(DoctorDailyStats)
+class DoctorDailyStatsAdmin(admin.ModelAdmin):
+    list_display = (
+        "doctor",
+        "date",
+        "slots_offered",
+        "slots_booked",
+        "cancelled",
+        "completed",
+        "revenue",
+        "updated_at",
+    )
+    list_select_related = ("doctor__user",)
+    raw_id_fields = ("doctor",)
+    date_hierarchy = "date"
+    show_full_result_count = False
+
+
+@admin.register(RollupWatermark)
+class RollupWatermarkAdmin(admin.ModelAdmin):
+    list_display = ("name", "processed_until")
@@ -0,0 +1,49 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.services import RollupService
+
+
+class Command(BaseCommand):
+    help = "Update the per-doctor daily rollups for days changed since the last run"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Rebuild every day instead of only the days changed since the last run",
+        )
+        parser.add_argument(
+            "--from",
+            dest="start",
+            type=date.fromisoformat,
+            help="Rebuild days from this date (YYYY-MM-DD), e.g. after deleting slots",
+        )
+        parser.add_argument(
+            "--to",
+            dest="end",
+            type=date.fromisoformat,
+            help="Rebuild days up to this date (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=RollupService.BATCH_SIZE,
+            help="Doctor-days recomputed per round of queries",
+        )
+
+    def handle(self, *args, **options):
+        start, end = options["start"], options["end"]
+        if start and end and start > end:
+            raise CommandError("--from must not be after --to")
+        if options["full"] and (start or end):
+            raise CommandError("--full cannot be combined with --from/--to")
+
+        written = RollupService.run(
+            full=options["full"],
+            start=start,
+            end=end,
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Updated {written} daily rollup(s)."))
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("doctors", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RollupWatermark",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, unique=True)),
+                ("processed_until", models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="DoctorDailyStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("slots_offered", models.PositiveIntegerField(default=0)),
+                (
+                    "slots_booked",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Slots with a pending, confirmed or completed appointment",
+                    ),
+                ),
+                ("cancelled", models.PositiveIntegerField(default=0)),
+                ("completed", models.PositiveIntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        help_text="Successful payments for appointments on this day",
+                        max_digits=12,
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "doctor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_stats",
+                        to="doctors.doctor",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Doctor daily stats",
+                "ordering": ["date"],
+                "indexes": [
+                    models.Index(fields=["date"], name="analytics_d_date_75ebd0_idx")
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("doctor", "date"), name="unique_doctor_daily_stats"
+                    )
+                ],
+            },
+        ),
+    ]
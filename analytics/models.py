@@ -0,0 +1,48 @@
+from django.db import models
+
+
+class DoctorDailyStats(models.Model):
+    """Pre-aggregated activity of one doctor on one day, maintained by rollup_stats."""
+
+    doctor = models.ForeignKey(
+        "doctors.Doctor", on_delete=models.CASCADE, related_name="daily_stats"
+    )
+    date = models.DateField()
+    slots_offered = models.PositiveIntegerField(default=0)
+    slots_booked = models.PositiveIntegerField(
+        default=0, help_text="Slots with a pending, confirmed or completed appointment"
+    )
+    cancelled = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        help_text="Successful payments for appointments on this day",
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["date"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["doctor", "date"], name="unique_doctor_daily_stats"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["date"]),
+        ]
+        verbose_name_plural = "Doctor daily stats"
+
+    def __str__(self):
+        return f"{self.doctor_id} - {self.date}"
+
+
+class RollupWatermark(models.Model):
+    """How far each rollup job has read the source tables."""
+
+    name = models.CharField(max_length=50, unique=True)
+    processed_until = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} @ {self.processed_until}"
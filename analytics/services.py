@@ -0,0 +1,215 @@
+from datetime import timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from appointments.models import Appointment, TimeSlot
+from payments.models import Payment
+from .models import DoctorDailyStats, RollupWatermark
+
+
+class RollupService:
+    WATERMARK = "doctor_daily_stats"
+    # Re-read a little before the watermark so rows whose transaction
+    # committed after the previous run started are not missed. Recomputing
+    # a day is idempotent, so the overlap only costs a few extra rows.
+    OVERLAP = timedelta(minutes=10)
+    # (doctor, day) pairs recomputed per round of aggregate queries
+    BATCH_SIZE = 500
+
+    @staticmethod
+    def dirty_days(since):
+        """
+        Return the (doctor_id, date) pairs whose source rows changed after ``since``.
+
+        Each source is filtered on an indexed timestamp, so the cost follows
+        the number of changed rows rather than the size of the tables.
+        """
+        pairs = set(
+            TimeSlot.objects.filter(created_at__gt=since).values_list(
+                "doctor_id", "date"
+            )
+        )
+        pairs.update(
+            Appointment.objects.filter(updated_at__gt=since).values_list(
+                "doctor_id", "time_slot__date"
+            )
+        )
+        pairs.update(
+            Payment.objects.filter(created_at__gt=since).values_list(
+                "appointment_id__doctor_id", "appointment_id__time_slot__date"
+            )
+        )
+        return pairs
+
+    @staticmethod
+    def all_days(start=None, end=None):
+        """Return every (doctor_id, date) pair with slots, optionally within a range."""
+        slots = TimeSlot.objects.all()
+        if start:
+            slots = slots.filter(date__gte=start)
+        if end:
+            slots = slots.filter(date__lte=end)
+        pairs = set(slots.values_list("doctor_id", "date").order_by().distinct())
+
+        # Days whose slots were all deleted still hold a stale rollup row
+        stale = DoctorDailyStats.objects.all()
+        if start:
+            stale = stale.filter(date__gte=start)
+        if end:
+            stale = stale.filter(date__lte=end)
+        pairs.update(stale.values_list("doctor_id", "date"))
+        return pairs
+
+    @staticmethod
+    def recompute(pairs, batch_size=None):
+        """
+        Rebuild the DoctorDailyStats rows of ``pairs`` from the source tables.
+
+        Every batch runs three grouped aggregates (slots, appointments,
+        payments) and one upsert, whatever the number of rows involved.
+
+        Args:
+            pairs: Iterable of (doctor_id, date)
+            batch_size: Pairs handled per round of queries
+
+        Returns:
+            int: Number of rollup rows written
+        """
+        batch_size = batch_size or RollupService.BATCH_SIZE
+        pairs = iter(sorted(pairs))
+        written = 0
+
+        while batch := list(islice(pairs, batch_size)):
+            doctor_ids = {doctor_id for doctor_id, _day in batch}
+            days = {day for _doctor_id, day in batch}
+
+            slots = {
+                (row["doctor_id"], row["date"]): row["total"]
+                for row in TimeSlot.objects.filter(
+                    doctor_id__in=doctor_ids, date__in=days
+                )
+                .values("doctor_id", "date")
+                .annotate(total=Count("id"))
+                .order_by()
+            }
+            appointments = {
+                (row["doctor_id"], row["time_slot__date"]): row
+                for row in Appointment.objects.filter(
+                    doctor_id__in=doctor_ids, time_slot__date__in=days
+                )
+                .values("doctor_id", "time_slot__date")
+                .annotate(
+                    booked=Count(
+                        "id", filter=Q(status__in=Appointment.ACTIVE_STATUSES)
+                    ),
+                    cancelled=Count("id", filter=Q(status="CANCELLED")),
+                    completed=Count("id", filter=Q(status="COMPLETED")),
+                )
+                .order_by()
+            }
+            revenue = {
+                (
+                    row["appointment_id__doctor_id"],
+                    row["appointment_id__time_slot__date"],
+                ): row["total"]
+                for row in Payment.objects.filter(
+                    status=Payment.SUCCESS,
+                    appointment_id__doctor_id__in=doctor_ids,
+                    appointment_id__time_slot__date__in=days,
+                )
+                .values("appointment_id__doctor_id", "appointment_id__time_slot__date")
+                .annotate(total=Sum("amount"))
+                .order_by()
+            }
+
+            rows = []
+            for pair in batch:
+                counts = appointments.get(pair, {})
+                rows.append(
+                    DoctorDailyStats(
+                        doctor_id=pair[0],
+                        date=pair[1],
+                        slots_offered=slots.get(pair, 0),
+                        slots_booked=counts.get("booked", 0),
+                        cancelled=counts.get("cancelled", 0),
+                        completed=counts.get("completed", 0),
+                        revenue=revenue.get(pair) or Decimal("0"),
+                    )
+                )
+            DoctorDailyStats.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=["doctor", "date"],
+                update_fields=[
+                    "slots_offered",
+                    "slots_booked",
+                    "cancelled",
+                    "completed",
+                    "revenue",
+                    "updated_at",
+                ],
+            )
+            written += len(rows)
+
+        return written
+
+    @staticmethod
+    def recompute_on_commit(pairs):
+        """
+        Recompute ``pairs`` once the current transaction commits.
+
+        For the days an appointment or slot moves away from: ``dirty_days``
+        finds rows where they are now, so their previous day is never seen
+        as changed.
+        """
+        pairs = set(pairs)
+        transaction.on_commit(lambda: RollupService.recompute(pairs))
+
+    @staticmethod
+    def run(full=False, start=None, end=None, batch_size=None):
+        """
+        Bring the rollups up to date and advance the watermark.
+
+        Without a watermark (first run) or with ``full``, every day with
+        slots is rebuilt; otherwise only the days touched since the last run.
+        ``start``/``end`` rebuild a date range without moving the watermark,
+        e.g. after slots were deleted, which leaves no row to detect.
+
+        Returns:
+            int: Number of rollup rows written
+        """
+        if start or end:
+            return RollupService.recompute(
+                RollupService.all_days(start, end), batch_size
+            )
+
+        # Captured before reading so changes made during the run are picked
+        # up next time
+        now = timezone.now()
+        watermark = RollupWatermark.objects.filter(name=RollupService.WATERMARK).first()
+        if full or watermark is None:
+            pairs = RollupService.all_days()
+        else:
+            pairs = RollupService.dirty_days(
+                watermark.processed_until - RollupService.OVERLAP
+            )
+
+        with transaction.atomic():
+            written = RollupService.recompute(pairs, batch_size)
+            RollupWatermark.objects.update_or_create(
+                name=RollupService.WATERMARK, defaults={"processed_until": now}
+            )
+        return written
+
+    @staticmethod
+    def last_run():
+        """Return when the rollups were last brought up to date, or None."""
+        return (
+            RollupWatermark.objects.filter(name=RollupService.WATERMARK)
+            .values_list("processed_until", flat=True)
+            .first()
+        )
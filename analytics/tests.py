@@ -0,0 +1,208 @@
+from datetime import date, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from appointments.models import Appointment, TimeSlot
+from appointments.services import AppointmentRescheduleService
+from doctors.models import Doctor, Specialty
+from payments.models import Payment
+from .models import DoctorDailyStats, RollupWatermark
+from .services import RollupService
+
+User = get_user_model()
+
+
+class RollupServiceTest(TestCase):
+    """Test cases for the per-doctor daily rollups."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.admin_user = User.objects.create_user(
+            username="admin",
+            email="admin@test.com",
+            password="testpass123",
+            user_type="admin",
+            is_superuser=True,
+        )
+        self.doctor_user = User.objects.create_user(
+            username="dr_smith",
+            email="dr.smith@test.com",
+            password="testpass123",
+            first_name="John",
+            last_name="Smith",
+            user_type="doctor",
+        )
+        self.doctor = Doctor.objects.create(
+            user=self.doctor_user,
+            specialty=Specialty.objects.create(
+                name="Cardiology", description="Heart specialist"
+            ),
+            license_number="LIC123456",
+            experience_years=5,
+            bio="Experienced cardiologist",
+            consultation_fee=Decimal("100.00"),
+            created_by=self.admin_user,
+        )
+        self.patient = User.objects.create_user(
+            username="patient", email="patient@test.com", password="testpass123"
+        )
+        self.day = date.today()
+        self.slots = [
+            TimeSlot.objects.create(
+                doctor=self.doctor,
+                date=self.day,
+                start_time=time(hour, 0),
+                end_time=time(hour, 15),
+            )
+            for hour in (9, 10, 11, 12)
+        ]
+        self.confirmed = self._book(self.slots[0], "CONFIRMED")
+        self._book(self.slots[1], "CANCELLED")
+        self._book(self.slots[2], "COMPLETED")
+        Payment.objects.create(
+            appointment_id=self.confirmed, amount=Decimal("100.00"), status="success"
+        )
+        Payment.objects.create(
+            appointment_id=self.confirmed, amount=Decimal("100.00"), status="failed"
+        )
+
+    def _book(self, slot, status):
+        return Appointment.objects.create(
+            patient=self.patient,
+            doctor=self.doctor,
+            time_slot=slot,
+            status=status,
+            consultation_fee=Decimal("100.00"),
+        )
+
+    def test_first_run_builds_rollup(self):
+        """Test that the first run aggregates every day with slots."""
+        call_command("rollup_stats", stdout=StringIO())
+
+        stats = DoctorDailyStats.objects.get(doctor=self.doctor, date=self.day)
+        self.assertEqual(stats.slots_offered, 4)
+        self.assertEqual(stats.slots_booked, 2)
+        self.assertEqual(stats.cancelled, 1)
+        self.assertEqual(stats.completed, 1)
+        self.assertEqual(stats.revenue, Decimal("100.00"))
+        self.assertTrue(
+            RollupWatermark.objects.filter(name="doctor_daily_stats").exists()
+        )
+
+    def test_incremental_run_only_touches_changed_days(self):
+        """Test that later runs recompute only days changed since the watermark."""
+        RollupService.run()
+        other_day = TimeSlot.objects.create(
+            doctor=self.doctor,
+            date=self.day + timedelta(days=3),
+            start_time=time(9, 0),
+            end_time=time(9, 15),
+        )
+        # Move the watermark past the overlap so the setUp rows count as
+        # already processed; the tampered rollup must then survive the run
+        DoctorDailyStats.objects.filter(date=self.day).update(slots_offered=99)
+        later = timezone.now() + timedelta(hours=1)
+        RollupWatermark.objects.update(processed_until=later)
+        TimeSlot.objects.filter(pk=other_day.pk).update(
+            created_at=later + timedelta(minutes=1)
+        )
+
+        self.assertEqual(RollupService.run(), 1)
+        self.assertEqual(DoctorDailyStats.objects.get(date=self.day).slots_offered, 99)
+        self.assertEqual(
+            DoctorDailyStats.objects.get(date=other_day.date).slots_offered, 1
+        )
+
+    def test_status_change_is_picked_up(self):
+        """Test that cancelling an appointment updates its day's rollup."""
+        RollupService.run()
+
+        self.confirmed.status = "CANCELLED"
+        self.confirmed.save()
+        self.assertEqual(RollupService.run(), 1)
+
+        stats = DoctorDailyStats.objects.get(doctor=self.doctor, date=self.day)
+        self.assertEqual(stats.slots_booked, 1)
+        self.assertEqual(stats.cancelled, 2)
+
+    def test_moves_recompute_the_day_left(self):
+        """Test that a reschedule or a slot moved to another day updates both."""
+        tomorrow, later = self.day + timedelta(days=1), self.day + timedelta(days=2)
+        start, target = (
+            TimeSlot.objects.create(
+                doctor=self.doctor,
+                date=day,
+                start_time=time(9, 0),
+                end_time=time(9, 15),
+                is_available=day != tomorrow,
+            )
+            for day in (tomorrow, later)
+        )
+        moved = self._book(start, "CONFIRMED")
+        Payment.objects.create(
+            appointment_id=moved, amount=Decimal("100.00"), status="success"
+        )
+        RollupService.run()
+
+        with mock.patch("appointments.services.WaitlistWorker.submit"):
+            with self.captureOnCommitCallbacks(execute=True):
+                AppointmentRescheduleService.reschedule(moved.pk, target.pk)
+        RollupService.run()
+
+        stats = DoctorDailyStats.objects.get(doctor=self.doctor, date=tomorrow)
+        self.assertEqual((stats.slots_booked, stats.revenue), (0, Decimal("0.00")))
+        stats = DoctorDailyStats.objects.get(doctor=self.doctor, date=later)
+        self.assertEqual((stats.slots_booked, stats.revenue), (1, Decimal("100.00")))
+
+        start.date = self.day + timedelta(days=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            start.save()
+
+        self.assertEqual(DoctorDailyStats.objects.get(date=tomorrow).slots_offered, 0)
+        self.assertEqual(DoctorDailyStats.objects.get(date=start.date).slots_offered, 1)
+
+    def test_recompute_uses_constant_queries(self):
+        """Test that a batch of days costs the same number of queries as one."""
+        for offset in range(1, 6):
+            TimeSlot.objects.create(
+                doctor=self.doctor,
+                date=self.day + timedelta(days=offset),
+                start_time=time(9, 0),
+                end_time=time(9, 15),
+            )
+
+        pairs = RollupService.all_days()
+
+        # Three aggregates and one upsert
+        with self.assertNumQueries(4):
+            written = RollupService.recompute(pairs)
+
+        self.assertEqual(written, 6)
+
+    def test_dashboard_reads_rollups_only(self):
+        """Test that the doctor's dashboard shows the rolled-up figures."""
+        RollupService.run()
+        self.client.login(username="dr_smith", password="testpass123")
+
+        response = self.client.get(reverse("analytics:dashboard"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["totals"]["slots_offered"], 4)
+        self.assertEqual(response.context["totals"]["utilisation"], 50)
+        self.assertEqual(response.context["totals"]["revenue"], Decimal("100.00"))
+        self.assertNotIn("top_doctors", response.context)
+
+    def test_dashboard_forbidden_for_patients(self):
+        """Test that patients are redirected away from the dashboard."""
+        self.client.login(username="patient", password="testpass123")
+
+        response = self.client.get(reverse("analytics:dashboard"))
+
+        self.assertRedirects(response, reverse("core:home"))
@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.db.models import Sum
+from django.shortcuts import redirect, render
+from django.utils import timezone
+
+from accounts.services import UserSnapshotService
+from doctors.models import Doctor
+from .models import DoctorDailyStats
+from .services import RollupService
+
+PERIOD_CHOICES = (7, 30, 90, 365)
+DEFAULT_PERIOD = 30
+
+TOTALS = {
+    "slots_offered": Sum("slots_offered"),
+    "slots_booked": Sum("slots_booked"),
+    "cancelled": Sum("cancelled"),
+    "completed": Sum("completed"),
+    "revenue": Sum("revenue"),
+}
+
+
+def _utilisation(row):
+    """Add the booked share of offered slots, in percent, to an aggregate row."""
+    offered = row.get("slots_offered") or 0
+    row["utilisation"] = (
+        round(100 * (row["slots_booked"] or 0) / offered) if offered else 0
+    )
+    return row
+
+
+@login_required
+def dashboard(request):
+    """
+    Utilisation and revenue per day, read only from the DoctorDailyStats rollups.
+
+    Doctors see their own figures; admins see every doctor and may narrow
+    the view down to one.
+    """
+    snapshot = UserSnapshotService.for_request(request)
+    stats = DoctorDailyStats.objects.all()
+    doctor = None
+
+    if snapshot.is_admin:
+        doctor_id = request.GET.get("doctor")
+        if doctor_id and doctor_id.isdigit():
+            doctor = Doctor.objects.select_related("user").filter(pk=doctor_id).first()
+    elif snapshot.doctor_id:
+        doctor = Doctor.objects.select_related("user").get(pk=snapshot.doctor_id)
+    else:
+        messages.error(request, "Analytics are only available to doctors and admins.")
+        return redirect("core:home")
+
+    if doctor:
+        stats = stats.filter(doctor=doctor)
+
+    try:
+        days = int(request.GET.get("days", DEFAULT_PERIOD))
+    except ValueError:
+        days = DEFAULT_PERIOD
+    if days not in PERIOD_CHOICES:
+        days = DEFAULT_PERIOD
+    end = timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    stats = stats.filter(date__range=(start, end))
+
+    context = {
+        "doctor": doctor,
+        "days": days,
+        "period_choices": PERIOD_CHOICES,
+        "start": start,
+        "end": end,
+        "totals": _utilisation(stats.aggregate(**TOTALS)),
+        "daily": [
+            _utilisation(row)
+            for row in stats.values("date").annotate(**TOTALS).order_by("-date")
+        ],
+        "last_run": RollupService.last_run(),
+    }
+    if snapshot.is_admin and doctor is None:
+        context["top_doctors"] = [
+            _utilisation(row)
+            for row in stats.values(
+                "doctor_id", "doctor__user__first_name", "doctor__user__last_name"
+            )
+            .annotate(**TOTALS)
+            .order_by("-revenue")[:10]
+        ]
+    return render(request, "analytics/dashboard.html", context)
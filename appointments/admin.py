@@ -1,12 +1,56 @@
 from django.contrib import admin
-from .models import Appointment, TimeSlot
+from core.admin_tools import AutocompleteFilter, ScalableChangeListMixin
+from core.exports import export_action
+from .models import Appointment, AppointmentStatusChange, TimeSlot, WaitlistEntry
+from .services import AppointmentTransitionService
+
+
+def transition_action(target):
+    """Admin action moving the selected appointments to ``target`` where allowed."""
+    label = dict(Appointment.STATUS_CHOICES)[target].lower()
+
+    def action(modeladmin, request, queryset):
+        results = AppointmentTransitionService.transition(
+            queryset.values_list('id', flat=True), target, user=request.user, reason='admin'
+        )
+        updated = sum(outcome == AppointmentTransitionService.UPDATED for outcome in results.values())
+        modeladmin.message_user(
+            request,
+            f"Marked {updated} appointment(s) {label}; {len(results) - updated} skipped because their status does not allow it.",
+        )
+
+    action.__name__ = f'mark_{target.lower()}'
+    return admin.action(description=f'Mark selected appointments as {label}')(action)
+
+
+class AppointmentStatusChangeInline(admin.TabularInline):
+    model = AppointmentStatusChange
+    fields = ('from_status', 'to_status', 'changed_by', 'reason', 'created_at')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(Appointment)
-class AppointmentAdmin(admin.ModelAdmin):
+class AppointmentAdmin(ScalableChangeListMixin, admin.ModelAdmin):
     list_display = ('id', 'patient', 'doctor', 'time_slot_info', 'status')
-    list_filter = ('status', 'doctor', 'patient')
+    # __str__ (used for the row checkbox label) also renders the slot's doctor
+    list_select_related = ('patient', 'doctor__user', 'time_slot__doctor__user')
+    list_filter = ('status', ('doctor', AutocompleteFilter), ('patient', AutocompleteFilter))
+    # The appointment's own copy of the slot start, so drilling down needs no join
+    date_hierarchy = 'start_at'
     search_fields = ('doctor__user__username', 'patient__username')
+    actions = [
+        transition_action('CONFIRMED'),
+        transition_action('COMPLETED'),
+        transition_action('CANCELLED'),
+        export_action('appointments', 'csv'),
+        export_action('appointments', 'jsonl'),
+    ]
+    inlines = [AppointmentStatusChangeInline]
 
     def time_slot_info(self, obj):
         if obj.time_slot:
@@ -25,8 +69,19 @@ def make_unavailable(modeladmin, request, queryset):
 
 
 @admin.register(TimeSlot)
-class TimeSlotAdmin(admin.ModelAdmin):
+class TimeSlotAdmin(ScalableChangeListMixin, admin.ModelAdmin):
     list_display = ("doctor", "date", "start_time", "end_time", "is_available", "created_at")
-    list_filter = ("doctor", "date", "is_available")
+    list_select_related = ("doctor__user",)
+    list_filter = (("doctor", AutocompleteFilter), "date", "is_available")
+    date_hierarchy = "date"
     search_fields = ("doctor__user__first_name", "doctor__user__last_name", "doctor__license_number")
     actions = [make_available, make_unavailable]
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(ScalableChangeListMixin, admin.ModelAdmin):
+    list_display = ("patient", "doctor", "date_from", "date_to", "status", "created_at")
+    list_select_related = ("patient", "doctor__user")
+    list_filter = (("doctor", AutocompleteFilter), "status")
+    search_fields = ("patient__username", "patient__email", "doctor__user__last_name")
+    raw_id_fields = ("patient", "appointment")
@@ -1,7 +1,8 @@
 # appointments/forms.py
 from datetime import time
 from django import forms
-from .models import Appointment, TimeSlot
+from django.utils import timezone
+from .models import Appointment, TimeSlot, WaitlistEntry
 
 
 class AppointmentForm(forms.ModelForm):
@@ -19,6 +20,35 @@ class AppointmentForm(forms.ModelForm):
         }
 
 
+class WaitlistForm(forms.ModelForm):
+    """Dates a patient is waiting for a slot with a doctor"""
+
+    class Meta:
+        model = WaitlistEntry
+        fields = ["date_from", "date_to"]
+        labels = {"date_from": "From", "date_to": "To"}
+        widgets = {
+            "date_from": forms.DateInput(
+                attrs={"type": "date", "class": "border rounded px-2 py-1"}
+            ),
+            "date_to": forms.DateInput(
+                attrs={"type": "date", "class": "border rounded px-2 py-1"}
+            ),
+        }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from = cleaned_data.get("date_from")
+        date_to = cleaned_data.get("date_to")
+
+        if date_to and date_to < timezone.localdate():
+            raise forms.ValidationError("Choose dates that are not in the past.")
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError("End date must be after start date.")
+
+        return cleaned_data
+
+
 TIME_CHOICES = [
     # Morning slots
     (time(9, 0), "09:00 - 09:15"),
@@ -139,3 +169,36 @@ class DeleteDayForm(forms.Form):
         label="Date to Clear",
         widget=forms.DateInput(attrs={"type": "date", "class": "form-control"}),
     )
+    cancel_appointments = forms.BooleanField(
+        required=False,
+        label="Also cancel booked appointments",
+        help_text="Cancel pending and confirmed appointments on this day and notify the patients",
+    )
+
+
+class BusyTimeImportForm(forms.Form):
+    """Form for uploading a doctor's busy time elsewhere as an .ics file"""
+
+    # Largest calendar file accepted, in bytes
+    MAX_SIZE = 5 * 1024 * 1024
+
+    calendar_file = forms.FileField(
+        label="Calendar File (.ics)",
+        widget=forms.ClearableFileInput(
+            attrs={"accept": ".ics,text/calendar", "class": "form-control"}
+        ),
+    )
+    action = forms.ChoiceField(
+        choices=[
+            ("delete", "Delete clashing free slots"),
+            ("close", "Mark clashing free slots unavailable"),
+        ],
+        initial="delete",
+        widget=forms.RadioSelect,
+    )
+
+    def clean_calendar_file(self):
+        calendar_file = self.cleaned_data["calendar_file"]
+        if calendar_file.size > self.MAX_SIZE:
+            raise forms.ValidationError("The calendar file must be at most 5 MB.")
+        return calendar_file
@@ -0,0 +1,383 @@
+import re
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from urllib.parse import urlsplit
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .models import Appointment
+
+CONTENT_TYPE = "text/calendar; charset=utf-8"
+
+# iCalendar status of each appointment status; statuses missing here
+# (expired holds) are left out of feeds
+EVENT_STATUS = {
+    "PENDING": "TENTATIVE",
+    "PENDING_PAYMENT": "TENTATIVE",
+    "CONFIRMED": "CONFIRMED",
+    "COMPLETED": "CONFIRMED",
+    "CANCELLED": "CANCELLED",
+}
+
+# Longest content line, in octets, before it is folded (RFC 5545 3.1)
+LINE_LIMIT = 75
+
+
+def escape_text(value):
+    """Escape a TEXT property value."""
+    return (
+        str(value or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def format_datetime(value):
+    """Format an aware datetime as a UTC DATE-TIME value."""
+    return value.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def content_line(name, value):
+    """
+    Return one CRLF-terminated content line, folded at 75 octets.
+
+    Folds never split a multi-byte UTF-8 character.
+    """
+    line = f"{name}:{value}"
+    if len(line.encode()) <= LINE_LIMIT:
+        return line + "\r\n"
+    parts = []
+    current, size = "", 0
+    for char in line:
+        width = len(char.encode())
+        # Continuation lines start with a space, which counts towards the limit
+        limit = LINE_LIMIT if not parts else LINE_LIMIT - 1
+        if size + width > limit:
+            parts.append(current)
+            current, size = "", 0
+        current += char
+        size += width
+    parts.append(current)
+    return "\r\n ".join(parts) + "\r\n"
+
+
+DURATION = re.compile(
+    r"^(?P<sign>[+-])?P(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?"
+    r"(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+)S)?)?$"
+)
+
+
+def unfold(text):
+    """Yield the unfolded content lines of an iCalendar document."""
+    current = None
+    for line in text.splitlines():
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def parse_line(line):
+    """Split a content line into (NAME, {PARAM: value}, value)."""
+    head, _sep, value = line.partition(":")
+    name, *params = head.split(";")
+    return (
+        name.upper(),
+        {
+            key.upper(): param.strip('"')
+            for key, _eq, param in (item.partition("=") for item in params)
+        },
+        value,
+    )
+
+
+def parse_datetime(value, params):
+    """
+    Parse a DATE or DATE-TIME value into an aware datetime.
+
+    Floating times and unknown TZIDs are read in the site's time zone; a
+    DATE is its local midnight.
+    """
+    tz = timezone.get_current_timezone()
+    if "TZID" in params:
+        try:
+            tz = ZoneInfo(params["TZID"])
+        except (ZoneInfoNotFoundError, ValueError):
+            pass
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        day = date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+        return timezone.make_aware(datetime.combine(day, time.min), tz)
+    if value.endswith("Z"):
+        return datetime.strptime(value, "%Y%m%dT%H%M%SZ").replace(
+            tzinfo=dt_timezone.utc
+        )
+    return timezone.make_aware(datetime.strptime(value, "%Y%m%dT%H%M%S"), tz)
+
+
+def parse_duration(value):
+    match = DURATION.match(value)
+    if match is None:
+        raise ValueError(f"Invalid duration: {value!r}")
+    parts = {
+        key: int(number or 0)
+        for key, number in match.groupdict().items()
+        if key != "sign"
+    }
+    duration = timedelta(**parts)
+    return -duration if match["sign"] == "-" else duration
+
+
+def busy_intervals(text):
+    """
+    Read the busy time of an iCalendar document.
+
+    Every opaque, not cancelled VEVENT is busy from DTSTART to DTEND (or
+    DTSTART + DURATION; an all-day event without either lasts the day), and
+    so is every FREEBUSY period that is not marked FREE. Recurring events
+    only count their first occurrence; export expanded occurrences instead.
+
+    Returns:
+        tuple: ([(start, end), ...] aware datetimes, number of events skipped
+        because they could not be read)
+
+    Raises:
+        ValueError: The text is not an iCalendar document
+    """
+    lines = unfold(text)
+    if next(lines, "").strip().upper() != "BEGIN:VCALENDAR":
+        raise ValueError("Not an iCalendar file.")
+
+    intervals = []
+    skipped = 0
+    event = None
+    # Depth of components nested in the current event (e.g. VALARM), whose
+    # properties are not the event's
+    nested = 0
+    for line in lines:
+        name, params, value = parse_line(line)
+        if (
+            event is not None
+            and name in ("BEGIN", "END")
+            and (nested or value.upper() != "VEVENT")
+        ):
+            nested += 1 if name == "BEGIN" else -1
+        elif nested:
+            continue
+        elif name == "BEGIN" and value.upper() == "VEVENT":
+            event = {}
+        elif name == "END" and value.upper() == "VEVENT" and event is not None:
+            try:
+                interval = _event_interval(event)
+            except (KeyError, ValueError):
+                skipped += 1
+            else:
+                if interval is not None:
+                    intervals.append(interval)
+            event = None
+        elif event is not None:
+            event.setdefault(name, (params, value))
+        elif name == "FREEBUSY" and params.get("FBTYPE", "BUSY").upper() != "FREE":
+            for period in value.split(","):
+                try:
+                    start, _sep, end = period.partition("/")
+                    start = parse_datetime(start, {})
+                    if end.startswith(("P", "+P", "-P")):
+                        end = start + parse_duration(end)
+                    else:
+                        end = parse_datetime(end, {})
+                except ValueError:
+                    skipped += 1
+                    continue
+                if start < end:
+                    intervals.append((start, end))
+    return intervals, skipped
+
+
+def _event_interval(event):
+    if event.get("TRANSP", ({}, ""))[1].upper() == "TRANSPARENT":
+        return None
+    if event.get("STATUS", ({}, ""))[1].upper() == "CANCELLED":
+        return None
+    params, value = event["DTSTART"]
+    start = parse_datetime(value, params)
+    if "DTEND" in event:
+        end = parse_datetime(event["DTEND"][1], event["DTEND"][0])
+    elif "DURATION" in event:
+        end = start + parse_duration(event["DURATION"][1])
+    elif params.get("VALUE") == "DATE" or len(value) == 8:
+        end = start + timedelta(days=1)
+    else:
+        return None
+    return (start, end) if start < end else None
+
+
+def merge_intervals(intervals):
+    """
+    Merge overlapping or touching intervals with one sort and one sweep.
+
+    Returns:
+        list: Disjoint (start, end) intervals in start order
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+class CalendarFeedService:
+    """Service for the per-user iCalendar feeds of appointments."""
+
+    CACHE_PREFIX = "calendar-feed"
+    CHUNK_SIZE = 500
+
+    @staticmethod
+    def cache_key(user_id, version):
+        return f"{CalendarFeedService.CACHE_PREFIX}:{user_id}:{version}"
+
+    @staticmethod
+    def etag(feed):
+        return f'"calendar-{feed.user_id}-{feed.version}"'
+
+    @staticmethod
+    def appointments(user_id):
+        """
+        The rows of a user's feed: appointments as patient and as doctor.
+
+        Finished appointments older than CALENDAR_FEED_PAST_DAYS are left out
+        so the feed does not grow with the user's whole history.
+        """
+        since = timezone.now() - timedelta(days=settings.CALENDAR_FEED_PAST_DAYS)
+        return (
+            Appointment.objects.filter(
+                Q(patient_id=user_id) | Q(doctor__user_id=user_id),
+                status__in=EVENT_STATUS,
+                end_at__gte=since,
+            )
+            .order_by("start_at", "id")
+            .values_list(
+                "id",
+                "status",
+                "start_at",
+                "end_at",
+                "notes",
+                "created_at",
+                "updated_at",
+                "patient_id",
+                "patient__first_name",
+                "patient__last_name",
+                "doctor__user__first_name",
+                "doctor__user__last_name",
+                "doctor__specialty__name",
+            )
+        )
+
+    @classmethod
+    def lines(cls, user_id):
+        """Yield the serialised feed of a user, one content line at a time."""
+        host = urlsplit(settings.SITE_URL).hostname or "localhost"
+        yield content_line("BEGIN", "VCALENDAR")
+        yield content_line("VERSION", "2.0")
+        yield content_line("PRODID", "-//Booking System//Appointments//EN")
+        yield content_line("CALSCALE", "GREGORIAN")
+        yield content_line("METHOD", "PUBLISH")
+        yield content_line("X-WR-CALNAME", "Appointments")
+
+        rows = cls.appointments(user_id).iterator(chunk_size=cls.CHUNK_SIZE)
+        for (
+            appointment_id,
+            status,
+            start_at,
+            end_at,
+            notes,
+            created_at,
+            updated_at,
+            patient_id,
+            patient_first,
+            patient_last,
+            doctor_first,
+            doctor_last,
+            specialty,
+        ) in rows:
+            if patient_id == user_id:
+                summary = f"Appointment with Dr. {doctor_first} {doctor_last}"
+            else:
+                summary = f"Appointment with {patient_first} {patient_last}"
+            yield content_line("BEGIN", "VEVENT")
+            yield content_line("UID", f"appointment-{appointment_id}@{host}")
+            # Derived from the row, not the clock, so a cached body stays
+            # byte-identical to a freshly built one
+            yield content_line("DTSTAMP", format_datetime(updated_at))
+            yield content_line("CREATED", format_datetime(created_at))
+            yield content_line("LAST-MODIFIED", format_datetime(updated_at))
+            yield content_line("DTSTART", format_datetime(start_at))
+            yield content_line("DTEND", format_datetime(end_at))
+            yield content_line("SUMMARY", escape_text(summary))
+            yield content_line("CATEGORIES", escape_text(specialty))
+            if notes:
+                yield content_line("DESCRIPTION", escape_text(notes))
+            yield content_line("STATUS", EVENT_STATUS[status])
+            yield content_line("END", "VEVENT")
+
+        yield content_line("END", "VCALENDAR")
+
+    @classmethod
+    def _stream_and_cache(cls, feed):
+        """Stream the feed and cache the body once it has been sent in full."""
+        parts = []
+        for line in cls.lines(feed.user_id):
+            parts.append(line)
+            yield line
+        cache.set(
+            cls.cache_key(feed.user_id, feed.version),
+            "".join(parts),
+            settings.CALENDAR_FEED_CACHE_TIMEOUT,
+        )
+
+    @classmethod
+    def response(cls, request, feed):
+        """
+        Return ``feed`` as a response to ``request``.
+
+        A client that sends back the current ETag or Last-Modified gets a
+        304 without its appointments being read. Otherwise the body comes
+        from the cache, or is streamed from the database and cached under the
+        feed's current version. ``feed`` is read before the appointments, so
+        a body is never older than the version it is cached under.
+        """
+        etag = cls.etag(feed)
+        last_modified = int(feed.changed_at.timestamp())
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            body = cache.get(cls.cache_key(feed.user_id, feed.version))
+            if body is not None:
+                response = HttpResponse(body, content_type=CONTENT_TYPE)
+            else:
+                response = StreamingHttpResponse(
+                    cls._stream_and_cache(feed), content_type=CONTENT_TYPE
+                )
+            response["Content-Disposition"] = 'inline; filename="appointments.ics"'
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        # Calendar apps revalidate on every poll instead of trusting a copy
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
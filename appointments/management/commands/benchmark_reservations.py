@@ -0,0 +1,180 @@
+import statistics
+import time
+import uuid
+from datetime import date, timedelta
+from datetime import time as clock
+from decimal import Decimal
+
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from accounts.models import User
+from appointments.models import Appointment, TimeSlot
+from appointments.views import reserve_slot_view
+from doctors.models import Doctor, Specialty
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure reservation latency for patients with growing appointment "
+        "histories, and of the INSERT that claims a slot, which is where the "
+        "database checks for overlapping appointments. Creates throwaway "
+        "bench_* users and slots and deletes them afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--history",
+            type=int,
+            nargs="+",
+            default=[0, 100, 1000],
+            help="Completed appointments already in the patient's history",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=20,
+            help="Reservations submitted per history size",
+        )
+
+    def handle(self, *args, **options):
+        if not 0 < options["requests"] <= 96:
+            raise CommandError("--requests must be between 1 and 96")
+
+        tag = uuid.uuid4().hex[:8]
+        specialty = Specialty.objects.create(
+            name=f"bench_{tag}", description="Benchmark"
+        )
+        admin = User.objects.create_user(
+            username=f"bench_admin_{tag}", email=f"bench_admin_{tag}@example.com"
+        )
+        doctor = Doctor.objects.create(
+            user=User.objects.create_user(
+                username=f"bench_doctor_{tag}",
+                email=f"bench_doctor_{tag}@example.com",
+                user_type="doctor",
+            ),
+            specialty=specialty,
+            license_number=f"BENCH-{tag}",
+            experience_years=1,
+            bio="Benchmark",
+            consultation_fee=Decimal("100.00"),
+            created_by=admin,
+        )
+        factory = RequestFactory()
+        patients = []
+
+        self.stdout.write(
+            f"{'history':>9} {'req p50':>9} {'req p95':>9} {'insert':>9} {'booked':>9}"
+        )
+        try:
+            # No confirmation emails leave the machine
+            with override_settings(
+                EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend"
+            ):
+                for index, history in enumerate(options["history"]):
+                    patient = User.objects.create_user(
+                        username=f"bench_patient_{tag}_{index}",
+                        email=f"bench_patient_{tag}_{index}@example.com",
+                    )
+                    patients.append(patient)
+                    self._history(doctor, patient, index, history)
+                    # Reservations and bare inserts each get a day of their
+                    # own, so up to 96 quarter-hour slots never overlap
+                    day = date.today() + timedelta(days=365 + 2 * index)
+
+                    timings = []
+                    for number in range(options["requests"]):
+                        slot = TimeSlot.objects.create(
+                            doctor=doctor,
+                            date=day,
+                            start_time=clock(number // 4, (number % 4) * 15),
+                            end_time=clock(number // 4, (number % 4) * 15 + 14),
+                        )
+                        request = factory.post(
+                            reverse("appointments:reserve_slot", args=[slot.id]),
+                            {"notes": ""},
+                        )
+                        request.user = patient
+                        request.session = SessionBase()
+                        request._messages = FallbackStorage(request)
+
+                        started = time.perf_counter()
+                        reserve_slot_view(request, slot.id)
+                        timings.append(time.perf_counter() - started)
+
+                    # The claiming INSERT alone, overlap guard included
+                    inserts = []
+                    for number in range(options["requests"]):
+                        slot = TimeSlot.objects.create(
+                            doctor=doctor,
+                            date=day + timedelta(days=1),
+                            start_time=clock(number // 4, (number % 4) * 15),
+                            end_time=clock(number // 4, (number % 4) * 15 + 14),
+                        )
+                        started = time.perf_counter()
+                        Appointment.objects.create(
+                            patient=patient,
+                            doctor=doctor,
+                            time_slot=slot,
+                            consultation_fee=doctor.consultation_fee,
+                        )
+                        inserts.append(time.perf_counter() - started)
+
+                    booked = (
+                        Appointment.objects.filter(patient=patient).count()
+                        - history
+                        - len(inserts)
+                    )
+                    p95 = sorted(timings)[max(0, int(len(timings) * 0.95) - 1)]
+                    self.stdout.write(
+                        f"{history:>9} {statistics.median(timings) * 1000:>7.1f}ms "
+                        f"{p95 * 1000:>7.1f}ms "
+                        f"{statistics.median(inserts) * 1000:>7.2f}ms "
+                        f"{booked:>5}/{len(timings)}"
+                    )
+        finally:
+            for patient in patients:
+                patient.delete()
+            doctor_user = doctor.user
+            doctor.delete()
+            doctor_user.delete()
+            admin.delete()
+            specialty.delete()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Reservation and insert latency should stay flat as the "
+                "history grows."
+            )
+        )
+
+    def _history(self, doctor, patient, index, count):
+        """Give ``patient`` ``count`` completed appointments on past days."""
+        last_day = date.today() - timedelta(days=1 + index * 1000)
+        slots = TimeSlot.objects.bulk_create(
+            TimeSlot(
+                doctor=doctor,
+                date=last_day - timedelta(days=number),
+                start_time=clock(9, 0),
+                end_time=clock(9, 15),
+                is_available=False,
+            )
+            for number in range(count)
+        )
+        Appointment.objects.bulk_create(
+            Appointment(
+                patient=patient,
+                doctor=doctor,
+                time_slot=slot,
+                status="COMPLETED",
+                consultation_fee=doctor.consultation_fee,
+                start_at=slot.start_at,
+                end_at=slot.end_at,
+            )
+            for slot in slots
+        )
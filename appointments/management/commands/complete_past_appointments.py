@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from appointments.services import AppointmentCompletionService
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark appointments whose slot has ended as COMPLETED (if confirmed) or "
+        "EXPIRED (if never paid) and invite patients to leave a review"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=AppointmentCompletionService.BATCH_SIZE,
+            help="Appointments updated per transaction",
+        )
+
+    def handle(self, *args, **options):
+        moved = AppointmentCompletionService.sweep(batch_size=options["batch_size"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Completed {moved['COMPLETED']} appointment(s), "
+                f"expired {moved['EXPIRED']} unpaid reservation(s)."
+            )
+        )
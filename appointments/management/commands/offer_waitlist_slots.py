@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from appointments.services import WaitlistService
+
+
+class Command(BaseCommand):
+    help = (
+        "Offer free upcoming slots to waitlisted patients the background worker missed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Maximum number of slots considered per run",
+        )
+
+    def handle(self, *args, **options):
+        offered = WaitlistService.offer_open_slots(batch_size=options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(f"Offered {offered} slot(s)."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from appointments.services import AppointmentHoldService
+
+
+class Command(BaseCommand):
+    help = "Expire unpaid PENDING appointments whose hold has lapsed and free their slots"
+
+    def handle(self, *args, **options):
+        expired_count, released_count = AppointmentHoldService.release_expired_holds()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Expired {expired_count} hold(s), released {released_count} slot(s)."
+            )
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from appointments.services import AppointmentReminderService
+
+
+class Command(BaseCommand):
+    help = "Send due appointment reminders (24h and 1h before) in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=AppointmentReminderService.BATCH_SIZE,
+            help="Number of reminders rendered and sent per batch",
+        )
+
+    def handle(self, *args, **options):
+        sent = AppointmentReminderService.send_due_reminders(
+            batch_size=options["batch_size"]
+        )
+
+        for kind, count in sent.items():
+            self.stdout.write(self.style.SUCCESS(f"Sent {count} {kind} reminder(s)."))
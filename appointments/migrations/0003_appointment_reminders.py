@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-19 09:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0002_appointment_slot_holds'),
+        ('doctors', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='last_reminder_sent',
+            field=models.CharField(blank=True, choices=[('', 'None'), ('24h', '24 hours before'), ('1h', '1 hour before')], default='', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='reminder_sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['status', 'last_reminder_sent'], name='appointment_status_c66644_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(fields=['date', 'start_time'], name='appointment_date_985ff0_idx'),
+        ),
+    ]
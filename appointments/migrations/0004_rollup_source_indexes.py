@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0003_appointment_reminders"),
+        ("doctors", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="appointment",
+            index=models.Index(
+                fields=["updated_at"], name="appointment_updated_6cefcf_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="timeslot",
+            index=models.Index(
+                fields=["created_at"], name="appointment_created_fa3c33_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0004_rollup_source_indexes"),
+        ("doctors", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="appointment",
+            name="unique_active_appointment_per_slot",
+        ),
+        migrations.AlterField(
+            model_name="appointment",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("PENDING", "Pending"),
+                    ("PENDING_PAYMENT", "Processing payment"),
+                    ("CONFIRMED", "Confirmed"),
+                    ("CANCELLED", "Cancelled"),
+                    ("COMPLETED", "Completed"),
+                    ("EXPIRED", "Expired"),
+                ],
+                default="PENDING",
+                max_length=20,
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="appointment",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(
+                    (
+                        "status__in",
+                        ["PENDING", "PENDING_PAYMENT", "CONFIRMED", "COMPLETED"],
+                    )
+                ),
+                fields=("time_slot",),
+                name="unique_active_appointment_per_slot",
+            ),
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:49
+
+from datetime import datetime
+
+from django.conf import settings
+from django.db import migrations, models, transaction
+from django.utils import timezone
+
+BATCH_SIZE = 2000
+
+
+def backfill_start_end_at(apps, schema_editor):
+    """Fill start_at/end_at in pk order, one short transaction per chunk."""
+    TimeSlot = apps.get_model("appointments", "TimeSlot")
+    local = timezone.get_default_timezone()
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            slots = list(
+                TimeSlot.objects.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .only("pk", "date", "start_time", "end_time")[:BATCH_SIZE]
+            )
+            if not slots:
+                return
+            for slot in slots:
+                slot.start_at = timezone.make_aware(
+                    datetime.combine(slot.date, slot.start_time), local
+                )
+                slot.end_at = timezone.make_aware(
+                    datetime.combine(slot.date, slot.end_time), local
+                )
+            TimeSlot.objects.bulk_update(slots, ["start_at", "end_at"])
+        last_pk = slots[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    # Each backfill chunk commits on its own instead of holding one
+    # transaction (and its locks) across the whole table
+    atomic = False
+
+    dependencies = [
+        ("appointments", "0005_pending_payment_status"),
+        ("doctors", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="timeslot",
+            name="end_at",
+            field=models.DateTimeField(
+                editable=False, null=True, verbose_name="Ends At"
+            ),
+        ),
+        migrations.AddField(
+            model_name="timeslot",
+            name="start_at",
+            field=models.DateTimeField(
+                editable=False, null=True, verbose_name="Starts At"
+            ),
+        ),
+        migrations.RunPython(backfill_start_end_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="timeslot",
+            name="end_at",
+            field=models.DateTimeField(editable=False, verbose_name="Ends At"),
+        ),
+        migrations.AlterField(
+            model_name="timeslot",
+            name="start_at",
+            field=models.DateTimeField(editable=False, verbose_name="Starts At"),
+        ),
+        migrations.AddIndex(
+            model_name="timeslot",
+            index=models.Index(
+                fields=["start_at"], name="appointment_start_a_81838e_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="timeslot",
+            index=models.Index(
+                fields=["doctor", "start_at"], name="appointment_doctor__8372a3_idx"
+            ),
+        ),
+    ]
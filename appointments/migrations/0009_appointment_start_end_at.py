@@ -0,0 +1,128 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:20
+
+from django.db import migrations, models, transaction
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 2000
+
+ACTIVE_STATUSES = "('PENDING', 'PENDING_PAYMENT', 'CONFIRMED', 'COMPLETED')"
+
+POSTGRESQL_GUARD = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    "ALTER TABLE appointments_appointment "
+    "ADD CONSTRAINT appointment_patient_no_overlap "
+    "EXCLUDE USING gist (patient_id WITH =, tstzrange(start_at, end_at) WITH &&) "
+    f"WHERE (status IN {ACTIVE_STATUSES})",
+]
+POSTGRESQL_GUARD_REMOVE = [
+    "ALTER TABLE appointments_appointment "
+    "DROP CONSTRAINT appointment_patient_no_overlap",
+]
+
+# Databases without exclusion constraints get the same check as triggers,
+# which still run inside the INSERT/UPDATE statement that claims the slot.
+# On SQLite a later migration that rebuilds this table drops them and must
+# recreate them.
+OVERLAPPING = (
+    "EXISTS (SELECT 1 FROM appointments_appointment AS other "
+    "WHERE other.patient_id = NEW.patient_id "
+    f"AND other.status IN {ACTIVE_STATUSES} "
+    "AND other.start_at < NEW.end_at AND other.end_at > NEW.start_at{extra})"
+)
+TRIGGER_GUARD = [
+    "CREATE TRIGGER appointment_patient_no_overlap_insert "
+    "BEFORE INSERT ON appointments_appointment "
+    f"WHEN NEW.status IN {ACTIVE_STATUSES} AND {OVERLAPPING.format(extra='')} "
+    "BEGIN SELECT RAISE(ABORT, 'appointment_patient_no_overlap'); END",
+    "CREATE TRIGGER appointment_patient_no_overlap_update "
+    "BEFORE UPDATE OF patient_id, status, start_at, end_at "
+    "ON appointments_appointment "
+    f"WHEN NEW.status IN {ACTIVE_STATUSES} "
+    f"AND {OVERLAPPING.format(extra=' AND other.id <> NEW.id')} "
+    "BEGIN SELECT RAISE(ABORT, 'appointment_patient_no_overlap'); END",
+]
+TRIGGER_GUARD_REMOVE = [
+    "DROP TRIGGER IF EXISTS appointment_patient_no_overlap_insert",
+    "DROP TRIGGER IF EXISTS appointment_patient_no_overlap_update",
+]
+
+
+def backfill_start_end_at(apps, schema_editor):
+    """Copy the slot times in pk ranges, one UPDATE and transaction per chunk."""
+    Appointment = apps.get_model("appointments", "Appointment")
+    TimeSlot = apps.get_model("appointments", "TimeSlot")
+    slot = TimeSlot.objects.filter(pk=OuterRef("time_slot_id"))
+    last_pk = Appointment.objects.order_by("-pk").values_list("pk", flat=True).first()
+    for start in range(0, (last_pk or 0) + 1, BATCH_SIZE):
+        with transaction.atomic():
+            Appointment.objects.filter(pk__gt=start, pk__lte=start + BATCH_SIZE).update(
+                start_at=Subquery(slot.values("start_at")[:1]),
+                end_at=Subquery(slot.values("end_at")[:1]),
+            )
+
+
+def add_overlap_guard(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        statements = POSTGRESQL_GUARD
+    else:
+        statements = TRIGGER_GUARD
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def remove_overlap_guard(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        statements = POSTGRESQL_GUARD_REMOVE
+    else:
+        statements = TRIGGER_GUARD_REMOVE
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    # Each backfill chunk commits on its own instead of holding one
+    # transaction (and its locks) across the whole table
+    atomic = False
+
+    dependencies = [
+        ("appointments", "0008_waitlistentry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="appointment",
+            name="end_at",
+            field=models.DateTimeField(
+                editable=False, null=True, verbose_name="Ends At"
+            ),
+        ),
+        migrations.AddField(
+            model_name="appointment",
+            name="start_at",
+            field=models.DateTimeField(
+                editable=False, null=True, verbose_name="Starts At"
+            ),
+        ),
+        migrations.RunPython(backfill_start_end_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="appointment",
+            name="end_at",
+            field=models.DateTimeField(editable=False, verbose_name="Ends At"),
+        ),
+        migrations.AlterField(
+            model_name="appointment",
+            name="start_at",
+            field=models.DateTimeField(editable=False, verbose_name="Starts At"),
+        ),
+        migrations.AddIndex(
+            model_name="appointment",
+            index=models.Index(
+                fields=["patient", "end_at", "start_at"],
+                name="appointment_patient_range",
+            ),
+        ),
+        # Fails if patients already hold overlapping active appointments;
+        # cancel or move those first
+        migrations.RunPython(add_overlap_guard, remove_overlap_guard),
+    ]
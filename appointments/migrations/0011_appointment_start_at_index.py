@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-19 13:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0010_calendarfeed"),
+        ("doctors", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="appointment",
+            index=models.Index(
+                fields=["start_at"], name="appointment_start_a_c0d05a_idx"
+            ),
+        ),
+    ]
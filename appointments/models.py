@@ -1,9 +1,52 @@
-from django.db import models
+import secrets
+from datetime import datetime
+
+from django.db import models, transaction
+from django.db.models import Exists, OuterRef, Q
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
 
+class TimeSlotQuerySet(models.QuerySet):
+    def available(self, now=None):
+        """
+        Slots that can be booked right now.
+
+        A slot held by a PENDING appointment whose hold has expired counts as
+        free even before ``release_expired_holds`` has flipped it back.
+        """
+        now = now or timezone.now()
+        expired_hold = Appointment.objects.filter(
+            time_slot=OuterRef("pk"),
+            status="PENDING",
+            hold_expires_at__lte=now,
+        )
+        return self.filter(Q(is_available=True) | Exists(expired_hold))
+
+    def upcoming(self, now=None):
+        """Slots that have not started yet."""
+        return self.filter(start_at__gt=now or timezone.now())
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for slot in objs:
+            slot.sync_datetimes()
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+class AppointmentQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        # Users read first, while the filter still matches the rows being
+        # changed; their feeds are bumped once the update commits
+        if Appointment.CALENDAR_FIELDS.intersection(kwargs):
+            users = set()
+            for row in self.values_list("patient_id", "doctor__user_id").distinct():
+                users.update(row)
+            CalendarFeed.touch_on_commit(Q(user__in=users))
+        return super().update(**kwargs)
+
+
 class TimeSlot(models.Model):
     doctor = models.ForeignKey(
         "doctors.Doctor", on_delete=models.CASCADE, related_name="time_slots"
@@ -16,6 +59,11 @@ class TimeSlot(models.Model):
 
     is_available = models.BooleanField(default=True, verbose_name="Available")
 
+    # Aware copies of date + start_time/end_time in TIME_ZONE, kept in sync
+    # on save, so time ranges are a single indexed comparison
+    start_at = models.DateTimeField(editable=False, verbose_name="Starts At")
+    end_at = models.DateTimeField(editable=False, verbose_name="Ends At")
+
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -26,15 +74,38 @@ class TimeSlot(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
 
+    objects = TimeSlotQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Time Slot"
         verbose_name_plural = "Time Slots"
         unique_together = [["doctor", "date", "start_time", "end_time"]]
         ordering = ["date", "start_time"]
+        indexes = [
+            models.Index(fields=["date", "start_time"]),
+            # Lets rollup_stats find slots created since its watermark
+            models.Index(fields=["created_at"]),
+            # Upcoming slots, reminder windows and per-doctor ranges
+            models.Index(fields=["start_at"]),
+            models.Index(fields=["doctor", "start_at"]),
+        ]
 
     def __str__(self):
         return f"Dr. {self.doctor.user.get_full_name()} - {self.date} ({self.start_time} - {self.end_time})"
 
+    @staticmethod
+    def local_datetime(day, moment):
+        """Combine a slot's naive local date and time into an aware datetime."""
+        return timezone.make_aware(
+            datetime.combine(day, moment), timezone.get_default_timezone()
+        )
+
+    def sync_datetimes(self):
+        """Recompute start_at/end_at from date, start_time and end_time."""
+        if self.date and self.start_time and self.end_time:
+            self.start_at = self.local_datetime(self.date, self.start_time)
+            self.end_at = self.local_datetime(self.date, self.end_time)
+
     def clean(self):
 
         if self.start_time and self.end_time and self.start_time >= self.end_time:
@@ -43,11 +114,16 @@ class TimeSlot(models.Model):
         if self.date and self.date < timezone.now().date():
             raise ValidationError("Cannot create time slots for past dates.")
 
+        self.sync_datetimes()
+        if self.start_at is None:
+            # Missing date or times are reported by the field validation
+            return
+
         # Check for actual overlapping slots (not just adjacent ones)
         overlapping = (
-            TimeSlot.objects.filter(doctor=self.doctor, date=self.date)
+            TimeSlot.objects.filter(doctor=self.doctor)
             .exclude(pk=self.pk)
-            .filter(start_time__lt=self.end_time, end_time__gt=self.start_time)
+            .filter(start_at__lt=self.end_at, end_at__gt=self.start_at)
         )
         if overlapping.exists():
             raise ValidationError(
@@ -55,16 +131,64 @@ class TimeSlot(models.Model):
             )
 
     def save(self, *args, **kwargs):
+        self.sync_datetimes()
+        update_fields = kwargs.get("update_fields")
+        moved = update_fields is None or bool(
+            {"date", "start_time", "end_time"} & set(update_fields)
+        )
+        if update_fields is not None and moved:
+            kwargs["update_fields"] = {*update_fields, "start_at", "end_at"}
+        adding = self._state.adding
         self.full_clean()
+        previous = None
+        if moved and not adding:
+            previous = (
+                TimeSlot.objects.filter(pk=self.pk)
+                .values_list("doctor_id", "date")
+                .first()
+            )
         super().save(*args, **kwargs)
+        if previous is not None and previous != (self.doctor_id, self.date):
+            from analytics.services import RollupService
+
+            # Neither day is seen as changed by the incremental rollup run
+            RollupService.recompute_on_commit([previous, (self.doctor_id, self.date)])
+        if moved and not adding:
+            # Appointments keep their own copy of the range for the overlap
+            # guard and calendar feeds; update() also bumps those feeds
+            Appointment.objects.filter(time_slot=self).exclude(
+                start_at=self.start_at, end_at=self.end_at
+            ).update(
+                start_at=self.start_at, end_at=self.end_at, updated_at=timezone.now()
+            )
+
+    @property
+    def active_appointment(self):
+        """The appointment currently occupying this slot, if any."""
+        if hasattr(self, "active_appointments"):
+            # Populated by Prefetch(..., to_attr="active_appointments")
+            return self.active_appointments[0] if self.active_appointments else None
+        return self.appointments.filter(status__in=Appointment.ACTIVE_STATUSES).first()
 
 
 class Appointment(models.Model):
     STATUS_CHOICES = [
         ("PENDING", "Pending"),
+        ("PENDING_PAYMENT", "Processing payment"),
         ("CONFIRMED", "Confirmed"),
         ("CANCELLED", "Cancelled"),
         ("COMPLETED", "Completed"),
+        ("EXPIRED", "Expired"),
+    ]
+
+    # Statuses that keep the time slot occupied. PENDING_PAYMENT is a card
+    # payment the gateway has not confirmed yet; its hold does not lapse.
+    ACTIVE_STATUSES = ["PENDING", "PENDING_PAYMENT", "CONFIRMED", "COMPLETED"]
+
+    REMINDER_CHOICES = [
+        ("", "None"),
+        ("24h", "24 hours before"),
+        ("1h", "1 hour before"),
     ]
 
     patient = models.ForeignKey(
@@ -73,18 +197,67 @@ class Appointment(models.Model):
     doctor = models.ForeignKey(
         "doctors.Doctor", on_delete=models.CASCADE, related_name="appointments"
     )
-    time_slot = models.OneToOneField(
-        "appointments.TimeSlot", on_delete=models.CASCADE, related_name="appointment"
+    time_slot = models.ForeignKey(
+        "appointments.TimeSlot", on_delete=models.CASCADE, related_name="appointments"
     )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="PENDING")
     consultation_fee = models.DecimalField(max_digits=10, decimal_places=2)
     notes = models.TextField(blank=True, null=True)
     confirmation_sent = models.BooleanField(default=False)
+    last_reminder_sent = models.CharField(
+        max_length=3, choices=REMINDER_CHOICES, blank=True, default=""
+    )
+    reminder_sent_at = models.DateTimeField(null=True, blank=True)
+    hold_expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When an unpaid PENDING reservation releases its slot",
+    )
+    # Copies of the slot's start_at/end_at, so a patient's overlapping
+    # appointments are found without joining time_slot; see OVERLAP_GUARD
+    start_at = models.DateTimeField(editable=False, verbose_name="Starts At")
+    end_at = models.DateTimeField(editable=False, verbose_name="Ends At")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Name of the database guard (an exclusion constraint on PostgreSQL,
+    # triggers elsewhere; installed by migration 0009) that rejects a second
+    # active appointment overlapping one the patient already holds
+    OVERLAP_GUARD = "appointment_patient_no_overlap"
+
+    # Fields shown in calendar feeds; writing any of them bumps the feed
+    # version of the patient and the doctor
+    CALENDAR_FIELDS = {"status", "time_slot", "start_at", "end_at", "notes"}
+
+    objects = AppointmentQuerySet.as_manager()
+
     class Meta:
         ordering = ["-created_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["time_slot"],
+                condition=Q(
+                    status__in=["PENDING", "PENDING_PAYMENT", "CONFIRMED", "COMPLETED"]
+                ),
+                name="unique_active_appointment_per_slot",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["status", "hold_expires_at"]),
+            models.Index(fields=["status", "last_reminder_sent"]),
+            # Lets rollup_stats find appointments changed since its watermark
+            models.Index(fields=["updated_at"]),
+            # Admin date hierarchy
+            models.Index(fields=["start_at"]),
+            # A patient's appointments overlapping a time range. Led by end_at
+            # so the check seeks past the patient's finished history instead
+            # of scanning it. Not partial: SQLite only uses partial indexes
+            # when the status values are literals, not query parameters.
+            models.Index(
+                fields=["patient", "end_at", "start_at"],
+                name="appointment_patient_range",
+            ),
+        ]
 
     def __str__(self):
         patient_name = (
@@ -96,9 +269,202 @@ class Appointment(models.Model):
         slot_info = str(self.time_slot) if self.time_slot_id else "No Slot"
         return f"Appointment: {patient_name} with {doctor_name} on {slot_info}"
 
+    def sync_range(self):
+        """Copy start_at/end_at from the time slot."""
+        self.start_at = self.time_slot.start_at
+        self.end_at = self.time_slot.end_at
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            if "time_slot" in update_fields:
+                self.sync_range()
+                kwargs["update_fields"] = {*update_fields, "start_at", "end_at"}
+        elif self._state.adding or Appointment.time_slot.is_cached(self):
+            # An unloaded slot cannot have been changed, so no query for it
+            self.sync_range()
+        super().save(*args, **kwargs)
+        if update_fields is None or self.CALENDAR_FIELDS.intersection(update_fields):
+            CalendarFeed.touch_on_commit(
+                Q(user=self.patient_id) | Q(user__doctor_profile=self.doctor_id)
+            )
+
+    @classmethod
+    def is_overlap_error(cls, error):
+        """True if an IntegrityError came from the patient overlap guard."""
+        return cls.OVERLAP_GUARD in str(error)
+
     def clean(self):
         if self.time_slot_id:
             if not self.time_slot.is_available:
                 raise ValidationError(
                     "This time slot is already booked or unavailable."
                 )
+
+    @property
+    def hold_expired(self):
+        """True when this is an unpaid reservation whose hold has lapsed."""
+        return (
+            self.status == "PENDING"
+            and self.hold_expires_at is not None
+            and self.hold_expires_at <= timezone.now()
+        )
+
+
+class AppointmentStatusChange(models.Model):
+    """One status transition of an appointment; batch jobs write them in bulk."""
+
+    appointment = models.ForeignKey(
+        Appointment, on_delete=models.CASCADE, related_name="status_changes"
+    )
+    from_status = models.CharField(max_length=20, choices=Appointment.STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=Appointment.STATUS_CHOICES)
+    changed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        help_text="Empty when a scheduled job made the change",
+    )
+    reason = models.CharField(max_length=50, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["appointment", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.appointment_id}: {self.from_status} -> {self.to_status}"
+
+
+class WaitlistEntry(models.Model):
+    """
+    A patient waiting for any slot of a doctor between two dates.
+
+    When a matching slot frees up, the oldest waiting entry is offered it
+    as a PENDING appointment with a short hold; see WaitlistService.
+    """
+
+    WAITING = "waiting"
+    OFFERED = "offered"
+    CANCELLED = "cancelled"
+    STATUS_CHOICES = [
+        (WAITING, "Waiting"),
+        (OFFERED, "Offered a slot"),
+        (CANCELLED, "Cancelled"),
+    ]
+
+    patient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="waitlist_entries",
+    )
+    doctor = models.ForeignKey(
+        "doctors.Doctor", on_delete=models.CASCADE, related_name="waitlist_entries"
+    )
+    date_from = models.DateField()
+    date_to = models.DateField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=WAITING)
+    appointment = models.ForeignKey(
+        Appointment,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        help_text="The held appointment the patient was offered",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["created_at", "id"]
+        verbose_name_plural = "Waitlist entries"
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(date_from__lte=models.F("date_to")),
+                name="waitlist_entry_date_range",
+            ),
+        ]
+        indexes = [
+            # Matching a freed slot walks a doctor's waiting entries in FIFO
+            # order and stops at the first whose range covers the slot
+            models.Index(
+                fields=["doctor", "created_at", "id"],
+                condition=Q(status="waiting"),
+                name="waitlist_waiting_fifo",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.patient} for {self.doctor} ({self.date_from} - {self.date_to})"
+
+
+class CalendarFeed(models.Model):
+    """
+    A user's iCalendar feed of appointments, authenticated by its token.
+
+    ``version`` goes up whenever one of the user's appointments changes, or
+    a name shown in them does; it is the feed's ETag and part of its cache
+    key. Users without a feed row have nothing to bump.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="calendar_feed",
+    )
+    token = models.CharField(max_length=64, unique=True)
+    version = models.PositiveIntegerField(default=0)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Calendar feed of {self.user_id} (v{self.version})"
+
+    @staticmethod
+    def new_token():
+        return secrets.token_urlsafe(32)
+
+    @classmethod
+    def reset(cls, user):
+        """
+        Create ``user``'s feed, or give it a new token so the old URL stops working.
+
+        Returns:
+            tuple: (CalendarFeed, True if it was created)
+        """
+        feed, created = cls.objects.get_or_create(
+            user=user, defaults={"token": cls.new_token()}
+        )
+        if not created:
+            feed.token = cls.new_token()
+            feed.save(update_fields=["token"])
+        return feed, created
+
+    @classmethod
+    def touch(cls, condition):
+        """Bump the version of the feeds matching ``condition`` in one UPDATE."""
+        return cls.objects.filter(condition).update(
+            version=models.F("version") + 1, changed_at=timezone.now()
+        )
+
+    @classmethod
+    def touch_on_commit(cls, condition):
+        """
+        ``touch`` once the current transaction commits.
+
+        Keeps the feed row lock out of booking transactions, so concurrent
+        bookings with the same doctor do not queue on the doctor's feed. A
+        feed read in between serves the old version, which the bump then
+        replaces.
+        """
+        transaction.on_commit(lambda: cls.touch(condition))
+
+    @classmethod
+    def touch_listing(cls, appointments):
+        """Bump, once committed, the feeds of both sides of ``appointments``."""
+        cls.touch_on_commit(
+            Q(user__in=appointments.values("patient_id"))
+            | Q(user__in=appointments.values("doctor__user_id"))
+        )
@@ -1,9 +1,863 @@
-from django.core.mail import send_mail
+import hashlib
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection, send_mail
 from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, Max, OuterRef, Prefetch, Q
 from django.template.loader import render_to_string
+from django.utils import timezone
 from django.utils.html import strip_tags
 from django.urls import reverse
 
+from analytics.services import RollupService
+from notifications.models import Notification
+from notifications.services import NotificationService
+from .ics import merge_intervals
+from .models import Appointment, AppointmentStatusChange, TimeSlot, WaitlistEntry
+from .workers import WaitlistWorker
+
+
+class AppointmentHoldService:
+    """Service for the expiring slot holds of unpaid PENDING appointments."""
+
+    @staticmethod
+    def hold_expiry(now=None):
+        """Return the expiry timestamp for a hold placed at ``now``."""
+        now = now or timezone.now()
+        return now + timedelta(minutes=settings.APPOINTMENT_HOLD_MINUTES)
+
+    @staticmethod
+    def release_expired_holds(now=None):
+        """
+        Expire every lapsed hold and free its slot.
+
+        Runs one UPDATE per table regardless of how many holds have lapsed.
+        Appointments are flipped first so a payment that commits concurrently
+        (and therefore leaves its row CONFIRMED) never has its slot reopened.
+
+        Returns:
+            tuple: (expired appointment count, released slot count)
+        """
+        now = now or timezone.now()
+
+        with transaction.atomic():
+            expired_count = len(
+                AppointmentTransitionService.expire_holds(
+                    Appointment.objects.all(), now, reason="hold_expired"
+                )
+            )
+
+            # Only slots whose hold lapsed in this run, so slots an admin
+            # closed by hand after an older expiry stay closed.
+            expired = Appointment.objects.filter(
+                time_slot=OuterRef("pk"), status="EXPIRED", updated_at=now
+            )
+            active = Appointment.objects.filter(
+                time_slot=OuterRef("pk"), status__in=Appointment.ACTIVE_STATUSES
+            )
+            released_count = TimeSlot.objects.filter(
+                Exists(expired), ~Exists(active), is_available=False
+            ).update(is_available=True)
+
+        return expired_count, released_count
+
+
+class AppointmentTransitionService:
+    """
+    The appointment status state machine.
+
+    Transitions are applied set-wise: one locking read, one
+    ``UPDATE ... WHERE status IN (allowed sources)`` and one statement per
+    side effect, however many appointments are moved.
+    """
+
+    # Target status -> statuses it may be reached from. Payments move
+    # appointments into CONFIRMED themselves and PENDING_PAYMENT is left to
+    # the card gateway; those paths, hold expiry and day cancellations still
+    # log their changes through record(). EXPIRED is not a manual target:
+    # only a lapsed hold expires, through expire_holds() or the sweeper.
+    TRANSITIONS = {
+        "CONFIRMED": ("PENDING",),
+        "COMPLETED": ("CONFIRMED",),
+        "CANCELLED": ("PENDING", "CONFIRMED"),
+    }
+    # Target statuses that give the slot back
+    RELEASES_SLOT = ("CANCELLED",)
+
+    UPDATED = "updated"
+    NOT_ALLOWED = "not_allowed"
+    NOT_FOUND = "not_found"
+
+    @classmethod
+    def can_transition(cls, source, target):
+        return source in cls.TRANSITIONS.get(target, ())
+
+    @classmethod
+    def targets(cls, source):
+        """Statuses an appointment in ``source`` may be moved to."""
+        return [
+            target for target, sources in cls.TRANSITIONS.items() if source in sources
+        ]
+
+    @classmethod
+    def transition(cls, appointment_ids, target, user=None, queryset=None, reason=""):
+        """
+        Move appointments to ``target`` where the state machine allows it.
+
+        Args:
+            appointment_ids: IDs to transition
+            target: The new status
+            user: Who made the change, recorded with each transition
+            queryset: Appointments the caller may touch; IDs outside it are
+                reported as not found
+            reason: Short label stored with each transition
+
+        Returns:
+            dict: appointment id -> UPDATED, NOT_ALLOWED or NOT_FOUND
+
+        Raises:
+            ValueError: ``target`` is not a status any transition leads to
+        """
+        if target not in cls.TRANSITIONS:
+            raise ValueError(f"No transition leads to {target!r}.")
+        sources = cls.TRANSITIONS[target]
+        ids = {int(appointment_id) for appointment_id in appointment_ids}
+        if queryset is None:
+            queryset = Appointment.objects.all()
+        now = timezone.now()
+
+        with transaction.atomic():
+            current = dict(
+                queryset.filter(id__in=ids)
+                .select_for_update(of=("self",))
+                .order_by("id")
+                .values_list("id", "status")
+            )
+            moved = [pk for pk, status in current.items() if status in sources]
+            if moved:
+                Appointment.objects.filter(id__in=moved, status__in=sources).update(
+                    status=target, updated_at=now
+                )
+                cls._after_transition(
+                    [(pk, current[pk]) for pk in moved], target, user, reason, now
+                )
+
+        return {
+            pk: (
+                cls.UPDATED
+                if pk in moved
+                else cls.NOT_ALLOWED if pk in current else cls.NOT_FOUND
+            )
+            for pk in sorted(ids)
+        }
+
+    @classmethod
+    def _after_transition(cls, moved, target, user, reason, now):
+        """Record the transitions and queue their side effects in bulk."""
+        cls.record(moved, target, user, reason, now)
+        ids = [pk for pk, _source in moved]
+
+        if target in cls.RELEASES_SLOT:
+            slot_ids = list(
+                Appointment.objects.filter(id__in=ids).values_list(
+                    "time_slot_id", flat=True
+                )
+            )
+            active = Appointment.objects.filter(
+                time_slot=OuterRef("pk"), status__in=Appointment.ACTIVE_STATUSES
+            )
+            TimeSlot.objects.filter(id__in=slot_ids, is_available=False).exclude(
+                Exists(active)
+            ).update(is_available=True)
+            transaction.on_commit(lambda: WaitlistWorker.submit(slot_ids))
+
+        if target == "COMPLETED":
+            cls.invite_reviews(ids)
+        elif target in ("CONFIRMED", "CANCELLED"):
+            cls._notify(ids, target, user)
+        if target == "CANCELLED":
+            transaction.on_commit(lambda: cls._send_cancellation_emails(ids))
+
+    @classmethod
+    def expire_holds(cls, queryset, now, reason, user=None):
+        """
+        Expire the lapsed PENDING holds in ``queryset`` and record it.
+
+        Returns:
+            list: IDs of the expired appointments
+        """
+        ids = list(
+            queryset.filter(status="PENDING", hold_expires_at__lte=now)
+            .select_for_update(of=("self",))
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        if ids:
+            Appointment.objects.filter(id__in=ids).update(
+                status="EXPIRED", updated_at=now
+            )
+            cls.record([(pk, "PENDING") for pk in ids], "EXPIRED", user, reason, now)
+        return ids
+
+    @staticmethod
+    def record(moved, target, user=None, reason="", now=None):
+        """Insert one AppointmentStatusChange per (appointment id, old status)."""
+        AppointmentStatusChange.objects.bulk_create(
+            AppointmentStatusChange(
+                appointment_id=appointment_id,
+                from_status=source,
+                to_status=target,
+                changed_by=user,
+                reason=reason,
+                created_at=now or timezone.now(),
+            )
+            for appointment_id, source in moved
+        )
+
+    @staticmethod
+    def invite_reviews(appointment_ids):
+        """Invite the patients of completed appointments to leave a review."""
+        rows = Appointment.objects.filter(id__in=appointment_ids).values_list(
+            "id", "patient_id", "doctor__user__first_name", "doctor__user__last_name"
+        )
+        NotificationService.bulk_notify(
+            Notification(
+                user_id=patient_id,
+                kind="review_invitation",
+                message=f"How was your visit with Dr. {first} {last}? Leave a review.",
+                link=reverse("reviews:submit_review", args=[appointment_id]),
+            )
+            for appointment_id, patient_id, first, last in rows
+        )
+
+    @staticmethod
+    def _notify(appointment_ids, target, user):
+        # Patients are not told about changes they made themselves
+        appointments = (
+            Appointment.objects.filter(id__in=appointment_ids)
+            .exclude(patient_id=getattr(user, "pk", None))
+            .select_related("doctor__user", "time_slot")
+        )
+        verb = "confirmed" if target == "CONFIRMED" else "cancelled"
+        link = reverse("appointments:appointment_list")
+        NotificationService.bulk_notify(
+            Notification(
+                user_id=appointment.patient_id,
+                kind="appointment_cancelled" if target == "CANCELLED" else "general",
+                message=(
+                    f"Your appointment with Dr. {appointment.doctor.user.get_full_name()} "
+                    f"on {appointment.time_slot.date.strftime('%B %d, %Y')} at "
+                    f"{appointment.time_slot.start_time.strftime('%I:%M %p')} "
+                    f"was {verb}."
+                ),
+                link=link,
+            )
+            for appointment in appointments
+        )
+
+    @staticmethod
+    def _send_cancellation_emails(appointment_ids):
+        """Send the cancellation emails over a single SMTP connection."""
+        messages = [
+            AppointmentEmailService.build_cancellation_email(appointment)
+            for appointment in Appointment.objects.filter(
+                id__in=appointment_ids
+            ).select_related(
+                "patient", "doctor__user", "doctor__specialty", "time_slot"
+            )
+        ]
+        try:
+            get_connection().send_messages(messages)
+        except Exception as e:
+            # Don't fail the transition if email fails
+            print(f"Warning: Could not send cancellation emails: {str(e)}")
+
+
+class AppointmentCompletionService:
+    """Service for the sweep that closes out appointments whose slot has ended."""
+
+    BATCH_SIZE = 500
+    # (from status, to status) applied to appointments whose slot has ended
+    SWEEPS = [("CONFIRMED", "COMPLETED"), ("PENDING", "EXPIRED")]
+    REASON = "sweeper"
+
+    @classmethod
+    def sweep(cls, now=None, batch_size=None):
+        """
+        Complete past CONFIRMED appointments and expire past PENDING ones.
+
+        Works through each status in chunks of ``batch_size`` ordered by
+        slot start. Each chunk locks its rows, flips them with one UPDATE,
+        records the transitions with one bulk insert and, for completions,
+        sends the review invitations with one bulk notification, so a
+        backlog of any size is cleared in short transactions.
+
+        Returns:
+            dict: Number of appointments moved into each target status
+        """
+        now = now or timezone.now()
+        batch_size = batch_size or cls.BATCH_SIZE
+        moved = {}
+        for source, target in cls.SWEEPS:
+            moved[target] = 0
+            while True:
+                count = cls._sweep_chunk(source, target, now, batch_size)
+                moved[target] += count
+                if count < batch_size:
+                    break
+        return moved
+
+    @classmethod
+    def _sweep_chunk(cls, source, target, now, batch_size):
+        with transaction.atomic():
+            ids = list(
+                Appointment.objects.select_for_update(skip_locked=True, of=("self",))
+                .filter(status=source, time_slot__end_at__lte=now)
+                .order_by("time_slot__start_at", "id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                return 0
+            Appointment.objects.filter(id__in=ids).update(status=target, updated_at=now)
+            AppointmentTransitionService.record(
+                [(appointment_id, source) for appointment_id in ids],
+                target,
+                reason=cls.REASON,
+                now=now,
+            )
+            if target == "COMPLETED":
+                AppointmentTransitionService.invite_reviews(ids)
+        return len(ids)
+
+
+class RescheduleError(Exception):
+    """An appointment that cannot be moved; the message is shown to the user."""
+
+
+class AppointmentRescheduleService:
+    """Service for moving an appointment to another slot of the same doctor."""
+
+    # PENDING_PAYMENT is left alone while the gateway is charging it
+    MOVABLE_STATUSES = ("PENDING", "CONFIRMED")
+
+    @classmethod
+    def reschedule(cls, appointment_id, slot_id):
+        """
+        Move an appointment onto ``slot_id`` in one short transaction.
+
+        The appointment is locked first, as payments and status transitions
+        do, then both slots in id order, so concurrent reschedules, bookings
+        and cancellations touching the same slots cannot deadlock. The
+        appointment keeps its id, its payments and, while unpaid, its hold;
+        reminders start over for the new time. The patient gets one
+        notification once the move commits, and the rollup of the day it
+        left is recomputed.
+
+        Args:
+            appointment_id: ID of the appointment to move
+            slot_id: ID of the slot to move it to
+
+        Returns:
+            Appointment: The moved appointment
+
+        Raises:
+            RescheduleError: The appointment cannot be moved, the slot
+                cannot be taken or the patient is busy at that time
+        """
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                appointment = (
+                    Appointment.objects.select_for_update()
+                    .filter(pk=appointment_id)
+                    .first()
+                )
+                if appointment is None:
+                    raise RescheduleError("This appointment does not exist.")
+                if appointment.status not in cls.MOVABLE_STATUSES:
+                    raise RescheduleError(
+                        "This appointment can no longer be rescheduled."
+                    )
+                if appointment.hold_expired:
+                    raise RescheduleError(
+                        "Your reservation has expired. Please book again."
+                    )
+                if appointment.time_slot_id == int(slot_id):
+                    raise RescheduleError("The appointment is already at this time.")
+
+                slots = {
+                    slot.id: slot
+                    for slot in TimeSlot.objects.select_for_update()
+                    .filter(id__in=[appointment.time_slot_id, slot_id])
+                    .order_by("id")
+                }
+                old_slot = slots[appointment.time_slot_id]
+                new_slot = slots.get(int(slot_id))
+                if new_slot is None or new_slot.doctor_id != appointment.doctor_id:
+                    raise RescheduleError("Choose another time with the same doctor.")
+                if old_slot.start_at <= now:
+                    raise RescheduleError("Appointments that have started cannot move.")
+                if new_slot.start_at <= now:
+                    raise RescheduleError("This time slot has already started.")
+
+                # A lapsed hold on the new slot gives way, as it does for bookings
+                current = new_slot.active_appointment
+                if current is not None and not current.hold_expired:
+                    raise RescheduleError("This time slot is no longer available.")
+                if current is None and not new_slot.is_available:
+                    raise RescheduleError("This time slot is no longer available.")
+                if current is not None:
+                    AppointmentTransitionService.expire_holds(
+                        Appointment.objects.filter(pk=current.pk),
+                        now,
+                        reason="hold_taken_over",
+                    )
+
+                appointment.time_slot = new_slot
+                appointment.last_reminder_sent = ""
+                appointment.reminder_sent_at = None
+                appointment.save(
+                    update_fields=[
+                        "time_slot",
+                        "last_reminder_sent",
+                        "reminder_sent_at",
+                        "updated_at",
+                    ]
+                )
+                TimeSlot.objects.filter(pk=new_slot.pk).update(is_available=False)
+                TimeSlot.objects.filter(pk=old_slot.pk).update(is_available=True)
+                transaction.on_commit(lambda: WaitlistWorker.submit([old_slot.pk]))
+                if old_slot.date != new_slot.date:
+                    RollupService.recompute_on_commit(
+                        [(appointment.doctor_id, old_slot.date)]
+                    )
+
+                transaction.on_commit(
+                    lambda: NotificationService.notify(
+                        appointment.patient,
+                        f"Your appointment with Dr. {appointment.doctor.user.get_full_name()} "
+                        f"was moved to {new_slot.date:%B %d, %Y} at "
+                        f"{new_slot.start_time:%I:%M %p}.",
+                        kind="appointment_rescheduled",
+                        link=reverse("appointments:appointment_list"),
+                    )
+                )
+        except IntegrityError as e:
+            if not Appointment.is_overlap_error(e):
+                raise
+            raise RescheduleError("You already have another appointment at that time.")
+        return appointment
+
+
+class WaitlistService:
+    """Service for the per-doctor waitlist and the slots offered from it."""
+
+    @staticmethod
+    def next_entry(slot):
+        """
+        Lock and return the oldest waiting entry whose dates cover ``slot``.
+
+        Walks the partial FIFO index on the doctor's waiting entries and
+        stops at the first match; entries another worker is offering are
+        skipped rather than waited for, and so are patients who already
+        have an appointment at that time.
+        """
+        busy = Appointment.objects.filter(
+            patient=OuterRef("patient_id"),
+            status__in=Appointment.ACTIVE_STATUSES,
+            start_at__lt=slot.end_at,
+            end_at__gt=slot.start_at,
+        )
+        return (
+            WaitlistEntry.objects.select_for_update(skip_locked=True)
+            .filter(
+                doctor_id=slot.doctor_id,
+                status=WaitlistEntry.WAITING,
+                date_from__lte=slot.date,
+                date_to__gte=slot.date,
+            )
+            .exclude(Exists(busy))
+            .order_by("created_at", "id")
+            .first()
+        )
+
+    @classmethod
+    def offer_slot(cls, slot_id, now=None):
+        """
+        Offer a free slot to the next patient on the doctor's waitlist.
+
+        The patient gets a PENDING appointment holding the slot for
+        WAITLIST_OFFER_MINUTES and a notification linking to the payment
+        page. An unpaid offer lapses like any other hold, and the sweep
+        then offers the slot to the next patient in line.
+
+        Returns:
+            Appointment: The offered appointment, or None if the slot is
+            taken, past or nobody is waiting for it
+        """
+        now = now or timezone.now()
+        with transaction.atomic():
+            slot = (
+                TimeSlot.objects.select_for_update(of=("self",))
+                .select_related("doctor__user")
+                .filter(pk=slot_id, is_available=True, start_at__gt=now)
+                .first()
+            )
+            if slot is None or slot.active_appointment is not None:
+                return None
+            entry = cls.next_entry(slot)
+            if entry is None:
+                return None
+
+            appointment = Appointment.objects.create(
+                patient_id=entry.patient_id,
+                doctor=slot.doctor,
+                time_slot=slot,
+                status="PENDING",
+                consultation_fee=slot.doctor.consultation_fee,
+                hold_expires_at=now
+                + timedelta(minutes=settings.WAITLIST_OFFER_MINUTES),
+            )
+            TimeSlot.objects.filter(pk=slot.pk).update(is_available=False)
+            entry.status = WaitlistEntry.OFFERED
+            entry.appointment = appointment
+            entry.save(update_fields=["status", "appointment"])
+
+            held_until = timezone.localtime(appointment.hold_expires_at)
+            transaction.on_commit(
+                lambda: NotificationService.notify(
+                    entry.patient,
+                    f"A slot with Dr. {slot.doctor.user.get_full_name()} on "
+                    f"{slot.date:%B %d, %Y} at {slot.start_time:%I:%M %p} opened up. "
+                    f"It is held for you until {held_until:%I:%M %p}; pay to confirm it.",
+                    kind="waitlist_offer",
+                    link=reverse("payments:process_payment", args=[appointment.pk]),
+                )
+            )
+        return appointment
+
+    @classmethod
+    def offer_slots(cls, slot_ids, now=None):
+        """
+        Offer each slot in ``slot_ids`` in its own short transaction.
+
+        Returns:
+            int: Number of slots offered
+        """
+        return sum(cls.offer_slot(slot_id, now) is not None for slot_id in slot_ids)
+
+    @classmethod
+    def offer_open_slots(cls, now=None, batch_size=500):
+        """
+        Offer upcoming free slots that someone is waiting for.
+
+        Catches what the WaitlistWorker did not: slots whose offer lapsed,
+        slots opened by admins and work lost to a full queue or a restart.
+
+        Returns:
+            int: Number of slots offered
+        """
+        now = now or timezone.now()
+        waiting = WaitlistEntry.objects.filter(
+            doctor_id=OuterRef("doctor_id"),
+            status=WaitlistEntry.WAITING,
+            date_from__lte=OuterRef("date"),
+            date_to__gte=OuterRef("date"),
+        )
+        slot_ids = list(
+            TimeSlot.objects.upcoming(now)
+            .filter(Exists(waiting), is_available=True)
+            .order_by("start_at")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        return cls.offer_slots(slot_ids, now)
+
+
+class DoctorAgendaService:
+    """
+    A doctor's day-by-day agenda: slots, appointments, patients and payments.
+
+    Each day is cached on its own under a key carrying a version of that
+    day's data, so a booking, payment, cancellation or sweep gives the day
+    a new key and the stale entry is simply never read again. Bulk status
+    updates bypass signals but always set ``updated_at``, which is what
+    the version is built from.
+    """
+
+    CACHE_PREFIX = "doctor-agenda"
+
+    @staticmethod
+    def cache_key(doctor_id, day, version):
+        return (
+            f"{DoctorAgendaService.CACHE_PREFIX}:{doctor_id}:{day:%Y-%m-%d}:{version}"
+        )
+
+    @staticmethod
+    def versions(doctor_id, days):
+        """
+        Return a version for each day in ``days`` that has slots.
+
+        One grouped aggregate over the window. The version changes when a
+        slot is added, removed or opened/closed, and when an appointment or
+        payment on the day is created, changed or deleted.
+
+        Returns:
+            dict: date -> version string
+        """
+        rows = (
+            TimeSlot.objects.filter(doctor_id=doctor_id, date__in=days)
+            .order_by()
+            .values("date")
+            .annotate(
+                slot_count=Count("id", distinct=True),
+                free_count=Count("id", filter=Q(is_available=True), distinct=True),
+                latest_slot=Max("created_at"),
+                appointment_count=Count("appointments", distinct=True),
+                latest_change=Max("appointments__updated_at"),
+                payment_count=Count("appointments__payment", distinct=True),
+            )
+        )
+        versions = {}
+        for row in rows:
+            day = row.pop("date")
+            fingerprint = repr(sorted(row.items())).encode()
+            versions[day] = hashlib.md5(fingerprint).hexdigest()[:16]
+        return versions
+
+    @classmethod
+    def agenda(cls, doctor_id, start, days=1):
+        """
+        Build the agenda of ``days`` consecutive days starting at ``start``.
+
+        Costs one query when every day is cached and four otherwise (the
+        version aggregate, then slots, appointments with their patients
+        and payments for the uncached days), however many days or slots
+        the window holds.
+
+        Args:
+            doctor_id: ID of the doctor
+            start: First day of the window
+            days: Number of days in the window
+
+        Returns:
+            list: One dict per day with date, slots, booked, free and
+            collected (the sum of successful payments)
+        """
+        window = [start + timedelta(days=offset) for offset in range(days)]
+        versions = cls.versions(doctor_id, window)
+        keys = {
+            day: cls.cache_key(doctor_id, day, version)
+            for day, version in versions.items()
+        }
+        cached = cache.get_many(list(keys.values()))
+        missing = [day for day, key in keys.items() if key not in cached]
+        built = cls._build(doctor_id, missing) if missing else {}
+        if built:
+            cache.set_many(
+                {keys[day]: built[day] for day in missing},
+                settings.AGENDA_CACHE_TIMEOUT,
+            )
+
+        agenda = []
+        for day in window:
+            if day in built:
+                agenda.append(built[day])
+            elif day in keys:
+                agenda.append(cached[keys[day]])
+            else:
+                agenda.append(cls._day(day, []))
+        return agenda
+
+    @classmethod
+    def _build(cls, doctor_id, days):
+        from payments.models import Payment
+
+        slots = (
+            TimeSlot.objects.filter(doctor_id=doctor_id, date__in=days)
+            .order_by("start_at")
+            .prefetch_related(
+                Prefetch(
+                    "appointments",
+                    queryset=Appointment.objects.filter(
+                        status__in=Appointment.ACTIVE_STATUSES
+                    )
+                    .select_related("patient")
+                    .prefetch_related(
+                        Prefetch(
+                            "payment_set",
+                            queryset=Payment.objects.order_by("-created_at", "-id"),
+                            to_attr="agenda_payments",
+                        )
+                    ),
+                    to_attr="agenda_appointments",
+                )
+            )
+        )
+        by_day = {day: [] for day in days}
+        for slot in slots:
+            by_day[slot.date].append(slot)
+        return {day: cls._day(day, day_slots) for day, day_slots in by_day.items()}
+
+    @staticmethod
+    def _day(day, slots):
+        # Plain values only, so cached days do not drag model instances along
+        entries = []
+        collected = Decimal("0.00")
+        for slot in slots:
+            appointment = None
+            if slot.agenda_appointments:
+                booked = slot.agenda_appointments[0]
+                payment = None
+                if booked.agenda_payments:
+                    latest = booked.agenda_payments[0]
+                    payment = {
+                        "amount": latest.amount,
+                        "status": latest.status,
+                        "status_display": latest.get_status_display(),
+                    }
+                    if latest.status == latest.SUCCESS:
+                        collected += latest.amount
+                appointment = {
+                    "id": booked.id,
+                    "status": booked.status,
+                    "status_display": booked.get_status_display(),
+                    "patient_name": booked.patient.get_full_name()
+                    or booked.patient.username,
+                    "patient_email": booked.patient.email,
+                    "patient_phone": booked.patient.phone_number,
+                    "notes": booked.notes or "",
+                    "consultation_fee": booked.consultation_fee,
+                    "payment": payment,
+                }
+            entries.append(
+                {
+                    "slot_id": slot.id,
+                    "start_time": slot.start_time,
+                    "end_time": slot.end_time,
+                    "is_available": slot.is_available,
+                    "appointment": appointment,
+                }
+            )
+        booked_count = sum(1 for entry in entries if entry["appointment"])
+        return {
+            "date": day,
+            "slots": entries,
+            "booked": booked_count,
+            "free": sum(1 for entry in entries if entry["is_available"]),
+            "collected": collected,
+        }
+
+
+class BusyTimeImportService:
+    """
+    Service for clearing a doctor's slots that clash with busy time elsewhere.
+
+    The busy intervals of an uploaded calendar are merged, then swept
+    against the doctor's future slots in start order, so a file of
+    thousands of events costs one sort, one slot query and a few set-based
+    statements per chunk of clashing slots.
+    """
+
+    DELETE = "delete"
+    CLOSE = "close"
+    # Slot IDs per DELETE/UPDATE, below SQLite's bound parameter limit
+    CHUNK_SIZE = 500
+
+    @staticmethod
+    def clashing_slots(doctor_id, intervals, now=None):
+        """
+        Return the IDs of ``doctor_id``'s future slots overlapping ``intervals``.
+
+        Args:
+            doctor_id: The doctor whose slots are checked
+            intervals: Disjoint (start, end) intervals in start order, as
+                returned by ``merge_intervals``
+            now: Slots starting before this are left alone
+        """
+        if not intervals:
+            return []
+        slots = (
+            TimeSlot.objects.filter(
+                doctor_id=doctor_id,
+                start_at__gt=now or timezone.now(),
+                start_at__lt=intervals[-1][1],
+                end_at__gt=intervals[0][0],
+            )
+            .order_by("start_at")
+            .values_list("id", "start_at", "end_at")
+        )
+        clashing = []
+        index = 0
+        for slot_id, start_at, end_at in slots:
+            # Slot starts only grow, so intervals ending before this slot
+            # cannot clash with any later one either
+            while index < len(intervals) and intervals[index][1] <= start_at:
+                index += 1
+            if index == len(intervals):
+                break
+            if intervals[index][0] < end_at:
+                clashing.append(slot_id)
+        return clashing
+
+    @classmethod
+    def apply(cls, doctor_id, intervals, action=DELETE, now=None):
+        """
+        Delete or close the free slots clashing with ``intervals``.
+
+        Slots holding an active appointment are never touched; they are
+        reported so an admin can move or cancel those appointments. With
+        ``DELETE``, slots that keep (cancelled) appointment history are
+        closed instead, as when a whole day is cleared.
+
+        Args:
+            doctor_id: The doctor whose slots are cleared
+            intervals: Busy (start, end) intervals, in any order
+            action: DELETE or CLOSE
+            now: Slots starting before this are left alone
+
+        Returns:
+            dict: Counts of "intervals" (after merging), "deleted" and
+            "closed" slots, and "booked", the clashing active appointments
+        """
+        intervals = merge_intervals(intervals)
+        clashing = cls.clashing_slots(doctor_id, intervals, now)
+        deleted = closed = 0
+        booked = []
+        active = Appointment.objects.filter(
+            time_slot=OuterRef("pk"), status__in=Appointment.ACTIVE_STATUSES
+        )
+
+        with transaction.atomic():
+            for start in range(0, len(clashing), cls.CHUNK_SIZE):
+                chunk = TimeSlot.objects.filter(
+                    id__in=clashing[start : start + cls.CHUNK_SIZE]
+                )
+                # Each statement re-checks the slot, so one booked since
+                # the sweep is reported rather than cleared
+                if action == cls.DELETE:
+                    deleted += chunk.filter(appointments__isnull=True).delete()[0]
+                closed += (
+                    chunk.filter(is_available=True)
+                    .exclude(Exists(active))
+                    .update(is_available=False)
+                )
+                booked.extend(
+                    Appointment.objects.filter(
+                        time_slot__in=chunk, status__in=Appointment.ACTIVE_STATUSES
+                    ).select_related("patient", "time_slot")
+                )
+
+        booked.sort(key=lambda appointment: appointment.start_at)
+        return {
+            "intervals": len(intervals),
+            "deleted": deleted,
+            "closed": closed,
+            "booked": booked,
+        }
+
 
 class AppointmentEmailService:
     """Service for sending appointment-related emails."""
@@ -143,9 +997,8 @@ Booking System Team"""
             return False
 
     @staticmethod
-    def send_cancellation_notification(appointment):
-        """Send appointment cancellation notification."""
-
+    def build_cancellation_email(appointment):
+        """Render the cancellation email for one appointment."""
         subject = (
             f"Appointment Cancelled - Dr. {appointment.doctor.user.get_full_name()}"
         )
@@ -169,25 +1022,166 @@ Booking System Team"""
         Booking System Team
         """
 
+        return EmailMultiAlternatives(
+            subject=subject,
+            body=plain_message,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[appointment.patient.email],
+        )
+
+    @staticmethod
+    def send_cancellation_notification(appointment):
+        """Send appointment cancellation notification."""
+        email = AppointmentEmailService.build_cancellation_email(appointment)
+
         # Print to terminal
         print("\n" + "=" * 80)
         print("📧 APPOINTMENT CANCELLATION EMAIL")
         print("=" * 80)
         print(f"To: {appointment.patient.email}")
-        print(f"Subject: {subject}")
+        print(f"Subject: {email.subject}")
         print("-" * 80)
-        print(plain_message)
+        print(email.body)
         print("=" * 80 + "\n")
 
         try:
-            send_mail(
-                subject=subject,
-                message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[appointment.patient.email],
-                fail_silently=False,
-            )
+            email.send(fail_silently=False)
             return True
         except Exception as e:
             print(f"❌ Error sending cancellation email: {str(e)}")
             return False
+
+
+def starting_between(start, end, prefix="time_slot__"):
+    """Q matching slots that start in the half-open window (start, end]."""
+    return Q(**{f"{prefix}start_at__gt": start, f"{prefix}start_at__lte": end})
+
+
+class AppointmentReminderService:
+    """Service for sending appointment reminders in batches."""
+
+    # Tightest window first, so an appointment booked at short notice only
+    # gets the reminder that is actually due.
+    REMINDER_WINDOWS = [
+        ("1h", timedelta(hours=1), "in about an hour"),
+        ("24h", timedelta(hours=24), "tomorrow"),
+    ]
+    BATCH_SIZE = 200
+
+    @classmethod
+    def due_reminders(cls, kind, now=None):
+        """Return CONFIRMED appointments that are due the ``kind`` reminder."""
+        now = now or timezone.now()
+        kinds = [window[0] for window in cls.REMINDER_WINDOWS]
+        lead = cls.REMINDER_WINDOWS[kinds.index(kind)][1]
+        # This reminder or a tighter one has already gone out
+        covered = kinds[: kinds.index(kind) + 1]
+
+        return (
+            Appointment.objects.filter(status="CONFIRMED")
+            .exclude(last_reminder_sent__in=covered)
+            .filter(starting_between(now, now + lead))
+        )
+
+    @staticmethod
+    def build_reminder(appointment, lead_text):
+        """Render the reminder email for one appointment."""
+        context = {
+            "patient_name": appointment.patient.get_full_name(),
+            "doctor_name": appointment.doctor.user.get_full_name(),
+            "doctor_specialty": appointment.doctor.specialty.name,
+            "appointment_date": appointment.time_slot.date.strftime("%B %d, %Y"),
+            "appointment_time": appointment.time_slot.start_time.strftime("%I:%M %p"),
+            "lead_text": lead_text,
+        }
+        email = EmailMultiAlternatives(
+            subject=f"Appointment Reminder - Dr. {context['doctor_name']}",
+            body=render_to_string(
+                "appointments/email/appointment_reminder.txt", context
+            ),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[appointment.patient.email],
+        )
+        email.attach_alternative(
+            render_to_string("appointments/email/appointment_reminder.html", context),
+            "text/html",
+        )
+        return email
+
+    @classmethod
+    def send_due_reminders(cls, now=None, batch_size=None):
+        """
+        Send every due reminder over a single SMTP connection.
+
+        Each batch is claimed with one UPDATE that stamps ``reminder_sent_at``;
+        only rows carrying this batch's stamp are sent, so overlapping runs
+        never email the same appointment twice. A batch whose send fails is
+        un-claimed so the next run retries it.
+
+        Returns:
+            dict: reminder kind -> number of reminders sent
+        """
+        now = now or timezone.now()
+        batch_size = batch_size or cls.BATCH_SIZE
+        sent = {}
+
+        connection = get_connection()
+        connection.open()
+        try:
+            for kind, _lead, lead_text in cls.REMINDER_WINDOWS:
+                sent[kind] = 0
+                failed_ids = set()
+                while True:
+                    batch = list(
+                        cls.due_reminders(kind, now)
+                        .exclude(id__in=failed_ids)
+                        .select_related(
+                            "patient", "doctor__user", "doctor__specialty", "time_slot"
+                        )
+                        .order_by("id")[:batch_size]
+                    )
+                    if not batch:
+                        break
+
+                    stamp = timezone.now()
+                    previous = {
+                        a.id: (a.last_reminder_sent, a.reminder_sent_at) for a in batch
+                    }
+                    cls.due_reminders(kind, now).filter(id__in=previous).update(
+                        last_reminder_sent=kind, reminder_sent_at=stamp
+                    )
+                    claimed_ids = set(
+                        Appointment.objects.filter(
+                            id__in=previous, reminder_sent_at=stamp
+                        ).values_list("id", flat=True)
+                    )
+                    messages = [
+                        cls.build_reminder(appointment, lead_text)
+                        for appointment in batch
+                        if appointment.id in claimed_ids
+                    ]
+
+                    try:
+                        connection.send_messages(messages)
+                    except Exception as e:
+                        print(f"❌ Error sending appointment reminders: {str(e)}")
+                        # At most one UPDATE per distinct prior state
+                        for last_sent, sent_at in set(previous.values()):
+                            Appointment.objects.filter(
+                                id__in=[
+                                    i
+                                    for i in claimed_ids
+                                    if previous[i] == (last_sent, sent_at)
+                                ],
+                                reminder_sent_at=stamp,
+                            ).update(
+                                last_reminder_sent=last_sent, reminder_sent_at=sent_at
+                            )
+                        failed_ids.update(previous)
+                        continue
+
+                    sent[kind] += len(messages)
+        finally:
+            connection.close()
+
+        return sent
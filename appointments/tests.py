@@ -1,3 +1,1255 @@
-from django.test import TestCase
+import threading
+from datetime import date, datetime, time, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from doctors.models import Doctor, Specialty
+from notifications.models import Notification
+from payments.models import Payment
+from .models import (
+    Appointment,
+    AppointmentStatusChange,
+    CalendarFeed,
+    TimeSlot,
+    WaitlistEntry,
+)
+from .services import (
+    AppointmentCompletionService,
+    AppointmentHoldService,
+    AppointmentReminderService,
+    AppointmentRescheduleService,
+    AppointmentTransitionService,
+    BusyTimeImportService,
+    DoctorAgendaService,
+    RescheduleError,
+    WaitlistService,
+)
+from .ics import busy_intervals, merge_intervals
+from .workers import WaitlistWorker
+
+User = get_user_model()
+
+
+class AppointmentTestMixin:
+    """Shared fixtures for appointment tests."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.specialty = Specialty.objects.create(
+            name="Cardiology", description="Heart specialist"
+        )
+        self.admin_user = User.objects.create_user(
+            username="admin",
+            email="admin@test.com",
+            password="testpass123",
+            user_type="admin",
+            is_superuser=True,
+        )
+        doctor_user = User.objects.create_user(
+            username="dr_smith",
+            email="dr.smith@test.com",
+            password="testpass123",
+            first_name="John",
+            last_name="Smith",
+            user_type="doctor",
+        )
+        self.doctor = Doctor.objects.create(
+            user=doctor_user,
+            specialty=self.specialty,
+            license_number="LIC123456",
+            experience_years=5,
+            bio="Experienced cardiologist",
+            consultation_fee=Decimal("100.00"),
+            created_by=self.admin_user,
+        )
+        self.patient = User.objects.create_user(
+            username="patient",
+            email="patient@test.com",
+            password="testpass123",
+            first_name="Jane",
+            last_name="Doe",
+            wallet_balance=Decimal("500.00"),
+            is_verified=True,
+        )
+        self.other_patient = User.objects.create_user(
+            username="other",
+            email="other@test.com",
+            password="testpass123",
+            is_verified=True,
+        )
+        self.slot = self.create_slot(time(9, 0))
+
+    def tearDown(self):
+        # A test that lets cancellations commit may have started the worker
+        WaitlistWorker.shutdown()
+        super().tearDown()
+
+    def create_slot(self, start, day=None):
+        day = day or date.today() + timedelta(days=1)
+        end = (datetime.combine(day, start) + timedelta(minutes=15)).time()
+        return TimeSlot.objects.create(
+            doctor=self.doctor, date=day, start_time=start, end_time=end
+        )
+
+    def create_appointment(self, slot=None, patient=None, **kwargs):
+        slot = slot or self.slot
+        kwargs.setdefault("status", "PENDING")
+        appointment = Appointment.objects.create(
+            patient=patient or self.patient,
+            doctor=self.doctor,
+            time_slot=slot,
+            consultation_fee=self.doctor.consultation_fee,
+            **kwargs,
+        )
+        slot.is_available = False
+        slot.save()
+        return appointment
+
+
+class SlotHoldTest(AppointmentTestMixin, TestCase):
+    """Test cases for expiring holds on PENDING appointments."""
+
+    def test_reservation_sets_hold_expiry(self):
+        """Test that reserving a slot places a hold with an expiry."""
+        self.client.login(username="patient", password="testpass123")
+        before = timezone.now()
+
+        self.client.post(reverse("appointments:reserve_slot", args=[self.slot.id]))
+
+        appointment = Appointment.objects.get(time_slot=self.slot)
+        self.assertEqual(appointment.status, "PENDING")
+        self.assertGreater(appointment.hold_expires_at, before)
+
+    def test_available_includes_expired_holds(self):
+        """Test that lapsed holds count as free before the sweeper runs."""
+        self.create_appointment(
+            hold_expires_at=timezone.now() - timedelta(minutes=1)
+        )
+
+        self.assertIn(self.slot, TimeSlot.objects.available())
+
+    def test_available_excludes_live_holds(self):
+        """Test that live holds keep the slot unavailable."""
+        self.create_appointment(hold_expires_at=AppointmentHoldService.hold_expiry())
+
+        self.assertNotIn(self.slot, TimeSlot.objects.available())
+
+    def test_release_expired_holds(self):
+        """Test that the sweeper expires lapsed holds and frees their slots."""
+        expired = self.create_appointment(
+            hold_expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        live_slot = self.create_slot(time(9, 15))
+        live = self.create_appointment(
+            slot=live_slot, hold_expires_at=AppointmentHoldService.hold_expiry()
+        )
+
+        expired_count, released_count = AppointmentHoldService.release_expired_holds()
+
+        self.assertEqual((expired_count, released_count), (1, 1))
+        expired.refresh_from_db()
+        live.refresh_from_db()
+        self.slot.refresh_from_db()
+        live_slot.refresh_from_db()
+        self.assertEqual(expired.status, "EXPIRED")
+        self.assertEqual(live.status, "PENDING")
+        self.assertTrue(self.slot.is_available)
+        self.assertFalse(live_slot.is_available)
+        self.assertEqual(
+            list(
+                expired.status_changes.values_list("from_status", "to_status", "reason")
+            ),
+            [("PENDING", "EXPIRED", "hold_expired")],
+        )
+
+    def test_release_expired_holds_command(self):
+        """Test the release_expired_holds management command."""
+        self.create_appointment(
+            hold_expires_at=timezone.now() - timedelta(minutes=1)
+        )
+
+        call_command("release_expired_holds", stdout=StringIO())
+
+        self.slot.refresh_from_db()
+        self.assertTrue(self.slot.is_available)
+
+    def test_reserve_takes_over_expired_hold(self):
+        """Test that a lapsed hold can be booked by another patient."""
+        stale = self.create_appointment(
+            patient=self.other_patient,
+            hold_expires_at=timezone.now() - timedelta(minutes=1),
+        )
+        self.client.login(username="patient", password="testpass123")
+
+        self.client.post(reverse("appointments:reserve_slot", args=[self.slot.id]))
+
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, "EXPIRED")
+        self.assertTrue(
+            Appointment.objects.filter(
+                time_slot=self.slot, patient=self.patient, status="PENDING"
+            ).exists()
+        )
+
+    def test_reserve_rejects_live_hold(self):
+        """Test that a live hold blocks other patients."""
+        self.create_appointment(
+            patient=self.other_patient,
+            hold_expires_at=AppointmentHoldService.hold_expiry(),
+        )
+        self.client.login(username="patient", password="testpass123")
+
+        self.client.post(reverse("appointments:reserve_slot", args=[self.slot.id]))
+
+        self.assertFalse(
+            Appointment.objects.filter(patient=self.patient).exists()
+        )
+
+    def test_payment_rejected_after_hold_expires(self):
+        """Test that an expired hold cannot be paid for."""
+        appointment = self.create_appointment(
+            hold_expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        self.client.login(username="patient", password="testpass123")
+
+        self.client.post(
+            reverse("payments:process_payment", args=[appointment.id]),
+            {"payment_method": "wallet"},
+        )
+
+        appointment.refresh_from_db()
+        self.patient.refresh_from_db()
+        self.assertEqual(appointment.status, "PENDING")
+        self.assertEqual(self.patient.wallet_balance, Decimal("500.00"))
+
+    def test_cancelled_slot_can_be_rebooked(self):
+        """Test that a cancelled appointment no longer occupies its slot."""
+        self.create_appointment(patient=self.other_patient, status="CANCELLED")
+        self.slot.is_available = True
+        self.slot.save()
+        self.client.login(username="patient", password="testpass123")
+
+        self.client.post(reverse("appointments:reserve_slot", args=[self.slot.id]))
+
+        self.assertEqual(self.slot.appointments.count(), 2)
+        self.assertEqual(self.slot.active_appointment.patient, self.patient)
+
+
+class AppointmentReminderTest(AppointmentTestMixin, TestCase):
+    """Test cases for the batch reminder scheduler."""
+
+    def setUp(self):
+        super().setUp()
+        tomorrow = date.today() + timedelta(days=1)
+        # Pretend it is 08:00 tomorrow; self.slot starts at 09:00 tomorrow
+        self.now = timezone.make_aware(datetime.combine(tomorrow, time(8, 0)))
+        self.soon = self.create_appointment(status="CONFIRMED")
+        self.next_day = self.create_appointment(
+            slot=self.create_slot(time(7, 0), day=tomorrow + timedelta(days=1)),
+            status="CONFIRMED",
+        )
+        self.far = self.create_appointment(
+            slot=self.create_slot(time(9, 0), day=tomorrow + timedelta(days=2)),
+            status="CONFIRMED",
+        )
+
+    def test_due_reminders_windows(self):
+        """Test that each window selects only appointments starting within it."""
+        self.assertEqual(
+            list(AppointmentReminderService.due_reminders("1h", self.now)),
+            [self.soon],
+        )
+        self.assertCountEqual(
+            AppointmentReminderService.due_reminders("24h", self.now),
+            [self.soon, self.next_day],
+        )
+
+    def test_send_due_reminders(self):
+        """Test that due reminders are sent once and marked in bulk."""
+        sent = AppointmentReminderService.send_due_reminders(now=self.now)
+
+        self.assertEqual(sent, {"1h": 1, "24h": 1})
+        self.assertEqual(len(mail.outbox), 2)
+        self.soon.refresh_from_db()
+        self.next_day.refresh_from_db()
+        self.far.refresh_from_db()
+        self.assertEqual(self.soon.last_reminder_sent, "1h")
+        self.assertEqual(self.next_day.last_reminder_sent, "24h")
+        self.assertEqual(self.far.last_reminder_sent, "")
+
+    def test_send_due_reminders_is_idempotent(self):
+        """Test that a second run sends nothing new."""
+        AppointmentReminderService.send_due_reminders(now=self.now)
+        sent = AppointmentReminderService.send_due_reminders(now=self.now)
+
+        self.assertEqual(sent, {"1h": 0, "24h": 0})
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_unconfirmed_appointments_are_skipped(self):
+        """Test that only CONFIRMED appointments get reminders."""
+        Appointment.objects.update(status="CANCELLED")
+
+        sent = AppointmentReminderService.send_due_reminders(now=self.now)
+
+        self.assertEqual(sent, {"1h": 0, "24h": 0})
+
+
+class TimeSlotDatetimeTest(AppointmentTestMixin, TestCase):
+    """Test cases for the denormalised start_at/end_at columns."""
+
+    def test_start_and_end_follow_local_fields(self):
+        """Test that start_at/end_at are aware copies kept in sync on save."""
+        day = self.slot.date
+        self.assertEqual(
+            self.slot.start_at, timezone.make_aware(datetime.combine(day, time(9, 0)))
+        )
+        self.assertEqual(self.slot.end_at - self.slot.start_at, timedelta(minutes=15))
+
+        self.slot.date = day + timedelta(days=3)
+        self.slot.start_time = time(14, 0)
+        self.slot.end_time = time(14, 30)
+        self.slot.save(update_fields=["date", "start_time", "end_time"])
+        self.slot.refresh_from_db()
+
+        self.assertEqual(
+            timezone.localtime(self.slot.start_at),
+            timezone.make_aware(datetime.combine(day + timedelta(days=3), time(14, 0))),
+        )
+        self.assertEqual(timezone.localtime(self.slot.end_at).time(), time(14, 30))
+
+    def test_moving_a_booked_slot_moves_its_appointment(self):
+        """Test that an appointment's start_at/end_at follow its slot."""
+        appointment = self.create_appointment(status="CONFIRMED")
+        feed, _created = CalendarFeed.reset(self.patient)
+
+        self.slot.start_time = time(15, 0)
+        self.slot.end_time = time(15, 30)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slot.save()
+
+        appointment.refresh_from_db()
+        self.assertEqual(
+            (appointment.start_at, appointment.end_at),
+            (self.slot.start_at, self.slot.end_at),
+        )
+        self.assertGreater(CalendarFeed.objects.get().version, feed.version)
+
+    def test_started_slots_cannot_be_booked(self):
+        """Test that slots which already started are hidden and rejected."""
+        started = self.create_slot(time(10, 0))
+        TimeSlot.objects.filter(pk=started.pk).update(
+            start_at=timezone.now() - timedelta(minutes=5)
+        )
+        self.client.login(username="patient", password="testpass123")
+
+        response = self.client.get(reverse("appointments:book", args=[self.doctor.id]))
+        self.assertEqual(list(response.context["slots"]), [self.slot])
+
+        response = self.client.post(
+            reverse("appointments:reserve_slot", args=[started.id]), {"notes": ""}
+        )
+        self.assertRedirects(
+            response,
+            reverse("appointments:book", args=[self.doctor.id]),
+            fetch_redirect_response=False,
+        )
+        self.assertFalse(Appointment.objects.filter(time_slot=started).exists())
+
+
+class TimeSlotDeleteTest(AppointmentTestMixin, TestCase):
+    """Test cases for deleting a single time slot."""
+
+    def test_slot_with_history_is_closed_not_deleted(self):
+        """Test that only slots without any appointment are deleted."""
+        self.client.login(username="admin", password="testpass123")
+        free = self.create_slot(time(10, 0))
+        self.create_appointment(status="EXPIRED")
+        self.slot.is_available = True
+        self.slot.save()
+
+        for slot in (free, self.slot):
+            self.client.post(reverse("appointments:delete_time_slot", args=[slot.id]))
+
+        self.assertFalse(TimeSlot.objects.filter(pk=free.pk).exists())
+        self.slot.refresh_from_db()
+        self.assertFalse(self.slot.is_available)
+        self.assertEqual(self.slot.appointments.count(), 1)
+
+
+class AppointmentCompletionTest(AppointmentTestMixin, TestCase):
+    """Test cases for the past appointment sweeper."""
+
+    def setUp(self):
+        super().setUp()
+        self.visited = self.create_appointment(status="CONFIRMED")
+        self.unpaid = self.create_appointment(
+            slot=self.create_slot(time(10, 0)), patient=self.other_patient
+        )
+        self.upcoming = self.create_appointment(
+            slot=self.create_slot(time(9, 0), day=self.slot.date + timedelta(days=1)),
+            status="CONFIRMED",
+        )
+        # Pretend it is just after the 10:00 slot ended
+        self.now = self.unpaid.time_slot.end_at + timedelta(minutes=1)
+
+    def test_sweep_completes_and_expires_past_appointments(self):
+        """Test that only appointments whose slot has ended are moved."""
+        moved = AppointmentCompletionService.sweep(now=self.now, batch_size=1)
+
+        self.assertEqual(moved, {"COMPLETED": 1, "EXPIRED": 1})
+        statuses = dict(Appointment.objects.values_list("id", "status"))
+        self.assertEqual(statuses[self.visited.id], "COMPLETED")
+        self.assertEqual(statuses[self.unpaid.id], "EXPIRED")
+        self.assertEqual(statuses[self.upcoming.id], "CONFIRMED")
+        self.assertCountEqual(
+            AppointmentStatusChange.objects.values_list(
+                "appointment_id", "from_status", "to_status"
+            ),
+            [
+                (self.visited.id, "CONFIRMED", "COMPLETED"),
+                (self.unpaid.id, "PENDING", "EXPIRED"),
+            ],
+        )
+
+    def test_sweep_invites_reviews_once(self):
+        """Test that completed patients get one review invitation."""
+        AppointmentCompletionService.sweep(now=self.now)
+        moved = AppointmentCompletionService.sweep(now=self.now)
+
+        self.assertEqual(moved, {"COMPLETED": 0, "EXPIRED": 0})
+        invitation = Notification.objects.get(kind="review_invitation")
+        self.assertEqual(invitation.user, self.patient)
+        self.assertEqual(
+            invitation.link, reverse("reviews:submit_review", args=[self.visited.id])
+        )
+        self.patient.refresh_from_db()
+        self.assertEqual(self.patient.unread_notification_count, 1)
+
+
+class AppointmentTransitionTest(AppointmentTestMixin, TestCase):
+    """Test cases for validated, bulk status transitions."""
+
+    def setUp(self):
+        super().setUp()
+        self.pending = self.create_appointment()
+        self.confirmed = self.create_appointment(
+            slot=self.create_slot(time(10, 0)),
+            patient=self.other_patient,
+            status="CONFIRMED",
+        )
+        self.url = reverse("appointments:bulk_update_appointment_status")
+
+    def _post(self, status, ids):
+        return self.client.post(self.url, {"status": status, "appointment_ids": ids})
+
+    def test_bulk_transition_reports_each_id(self):
+        """Test that only allowed sources move and every id gets an outcome."""
+        self.client.login(username="dr_smith", password="testpass123")
+
+        response = self._post("CONFIRMED", [self.pending.id, self.confirmed.id, 999999])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["results"],
+            {
+                str(self.pending.id): "updated",
+                str(self.confirmed.id): "not_allowed",
+                "999999": "not_found",
+            },
+        )
+        self.pending.refresh_from_db()
+        self.assertEqual(self.pending.status, "CONFIRMED")
+        change = AppointmentStatusChange.objects.get()
+        self.assertEqual(
+            (change.from_status, change.to_status, change.changed_by),
+            ("PENDING", "CONFIRMED", self.doctor.user),
+        )
+        self.assertTrue(Notification.objects.filter(user=self.patient).exists())
+
+    def test_bulk_cancel_releases_slots_and_batches_emails(self):
+        """Test that cancelling frees the slots and emails once per patient."""
+        with mock.patch("appointments.services.WaitlistWorker.submit") as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                results = AppointmentTransitionService.transition(
+                    [self.pending.id, self.confirmed.id],
+                    "CANCELLED",
+                    user=self.admin_user,
+                )
+
+        self.assertEqual(set(results.values()), {"updated"})
+        submit.assert_called_once()
+        self.assertEqual(TimeSlot.objects.filter(is_available=True).count(), 2)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(
+            Notification.objects.filter(kind="appointment_cancelled").count(), 2
+        )
+
+    def test_bulk_transition_requires_doctor_or_admin(self):
+        """Test that patients and invalid targets are rejected."""
+        self.client.login(username="patient", password="testpass123")
+        self.assertEqual(self._post("CONFIRMED", [self.pending.id]).status_code, 403)
+
+        self.client.login(username="admin", password="testpass123")
+        self.assertEqual(self._post("PENDING", [self.pending.id]).status_code, 400)
+        self.pending.refresh_from_db()
+        self.assertEqual(self.pending.status, "PENDING")
+
+
+    def test_bulk_expire_is_rejected(self):
+        """Test that staff cannot expire a hold and leave its slot closed."""
+        self.client.login(username="admin", password="testpass123")
+
+        response = self._post("EXPIRED", [self.pending.id])
+
+        self.assertEqual(response.status_code, 400)
+        self.pending.refresh_from_db()
+        self.assertEqual(self.pending.status, "PENDING")
+        self.assertFalse(
+            TimeSlot.objects.get(pk=self.pending.time_slot_id).is_available
+        )
+        with self.assertRaises(ValueError):
+            AppointmentTransitionService.transition([self.pending.id], "EXPIRED")
+
+class DoctorAgendaTest(AppointmentTestMixin, TestCase):
+    """Test cases for the doctor agenda."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        today = timezone.localdate()
+        self.monday = today + timedelta(days=7 - today.weekday())
+
+    def book_week(self, slots_per_day):
+        for offset in range(7):
+            day = self.monday + timedelta(days=offset)
+            for number in range(slots_per_day):
+                appointment = self.create_appointment(
+                    slot=self.create_slot(time(9 + number, 0), day=day),
+                    status="CONFIRMED",
+                )
+                Payment.objects.create(
+                    appointment_id=appointment,
+                    amount=appointment.consultation_fee,
+                    status=Payment.SUCCESS,
+                )
+
+    def test_agenda_queries_do_not_grow_with_the_window(self):
+        """Test that a booked week costs the same queries as a booked day."""
+        self.book_week(slots_per_day=6)
+
+        with self.assertNumQueries(4):
+            week = DoctorAgendaService.agenda(self.doctor.id, self.monday, 7)
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                DoctorAgendaService.agenda(self.doctor.id, self.monday, 7), week
+            )
+        self.assertEqual([day["booked"] for day in week], [6] * 7)
+        self.assertEqual(week[0]["collected"], Decimal("600.00"))
+        entry = week[0]["slots"][0]
+        self.assertEqual(entry["appointment"]["patient_name"], "Jane Doe")
+        self.assertEqual(entry["appointment"]["payment"]["status"], Payment.SUCCESS)
+
+        self.client.login(username="dr_smith", password="testpass123")
+        response = self.client.get(
+            reverse("appointments:doctor_agenda"),
+            {"view": "week", "date": self.monday.isoformat()},
+        )
+        self.assertContains(response, "Jane Doe", count=42)
+
+    def test_bulk_changes_invalidate_the_day(self):
+        """Test that a bulk status change is visible on the next read."""
+        self.book_week(slots_per_day=1)
+        DoctorAgendaService.agenda(self.doctor.id, self.monday, 7)
+        cancelled = Appointment.objects.get(time_slot__date=self.monday)
+
+        AppointmentTransitionService.transition([cancelled.id], "CANCELLED")
+
+        # Monday is rebuilt; with no active appointment left it needs no
+        # payments query
+        with self.assertNumQueries(3):
+            week = DoctorAgendaService.agenda(self.doctor.id, self.monday, 7)
+        self.assertIsNone(week[0]["slots"][0]["appointment"])
+        self.assertEqual(week[0]["free"], 1)
+        self.assertEqual([day["booked"] for day in week[1:]], [1] * 6)
+
+    def test_agenda_is_for_doctors_and_admins(self):
+        """Test that patients are turned away and admins choose a doctor."""
+        self.client.login(username="patient", password="testpass123")
+        response = self.client.get(reverse("appointments:doctor_agenda"))
+        self.assertRedirects(response, reverse("core:home"))
+
+        self.client.login(username="admin", password="testpass123")
+        response = self.client.get(
+            reverse("appointments:doctor_agenda"), {"doctor": self.doctor.id}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["agenda"]), 1)
+
+
+class AppointmentRescheduleTest(AppointmentTestMixin, TestCase):
+    """Test cases for moving an appointment to another slot."""
+
+    def test_reschedule_moves_slot_and_keeps_payment(self):
+        """Test that the appointment, its payment and its hold move together."""
+        appointment = self.create_appointment(
+            status="CONFIRMED", last_reminder_sent="24h"
+        )
+        payment = Payment.objects.create(
+            appointment_id=appointment,
+            amount=appointment.consultation_fee,
+            status=Payment.SUCCESS,
+        )
+        target = self.create_slot(time(11, 0))
+        self.client.login(username="patient", password="testpass123")
+
+        with mock.patch("appointments.services.WaitlistWorker.submit") as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    reverse(
+                        "appointments:reschedule_appointment", args=[appointment.id]
+                    ),
+                    {"slot_id": target.id},
+                )
+
+        self.assertRedirects(response, reverse("appointments:appointment_list"))
+        submit.assert_called_once_with([self.slot.id])
+        appointment.refresh_from_db()
+        self.slot.refresh_from_db()
+        target.refresh_from_db()
+        self.assertEqual(appointment.time_slot, target)
+        self.assertEqual(appointment.status, "CONFIRMED")
+        self.assertEqual(appointment.last_reminder_sent, "")
+        self.assertEqual(list(appointment.payment_set.all()), [payment])
+        self.assertTrue(self.slot.is_available)
+        self.assertFalse(target.is_available)
+        self.assertEqual(
+            Notification.objects.filter(
+                user=self.patient, kind="appointment_rescheduled"
+            ).count(),
+            1,
+        )
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_reschedule_rejects_taken_and_foreign_slots(self):
+        """Test that booked slots and other doctors' slots are refused."""
+        appointment = self.create_appointment()
+        taken = self.create_slot(time(10, 0))
+        self.create_appointment(slot=taken, patient=self.other_patient)
+        other_doctor = Doctor.objects.create(
+            user=User.objects.create_user(username="dr_other", user_type="doctor"),
+            specialty=self.specialty,
+            license_number="LIC654321",
+            experience_years=3,
+            bio="Cardiologist",
+            consultation_fee=Decimal("100.00"),
+            created_by=self.admin_user,
+        )
+        foreign = TimeSlot.objects.create(
+            doctor=other_doctor,
+            date=self.slot.date,
+            start_time=time(11, 0),
+            end_time=time(11, 15),
+        )
+
+        for slot in (taken, foreign):
+            with self.assertRaises(RescheduleError):
+                AppointmentRescheduleService.reschedule(appointment.id, slot.id)
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.time_slot, self.slot)
+
+
+# Needs real row locks; SQLite test databases reject concurrent writers
+@skipUnlessDBFeature("has_select_for_update")
+class AppointmentRescheduleContentionTest(AppointmentTestMixin, TransactionTestCase):
+    """Test cases for concurrent reschedules competing for the same slots."""
+
+    def test_concurrent_reschedules(self):
+        """Test that racing reschedules neither double-book nor deadlock."""
+        appointments = [self.create_appointment(status="CONFIRMED")]
+        for number in range(1, 12):
+            patient = User.objects.create_user(username=f"racer{number}")
+            appointments.append(
+                self.create_appointment(
+                    slot=self.create_slot(time(9 + number // 4, number % 4 * 15)),
+                    patient=patient,
+                    status="CONFIRMED",
+                )
+            )
+        contested = self.create_slot(time(17, 0))
+        # Half race for one free slot, the others try to swap pairwise
+        moves = [(appointment.id, contested.id) for appointment in appointments[:6]]
+        for first, second in zip(appointments[6::2], appointments[7::2]):
+            moves += [
+                (first.id, second.time_slot_id),
+                (second.id, first.time_slot_id),
+            ]
+        barrier = threading.Barrier(len(moves))
+        outcomes = []
+
+        def move(appointment_id, slot_id):
+            try:
+                barrier.wait()
+                AppointmentRescheduleService.reschedule(appointment_id, slot_id)
+                outcomes.append("moved")
+            except RescheduleError:
+                outcomes.append("rejected")
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=move, args=m) for m in moves]
+        with mock.patch("appointments.services.WaitlistWorker.submit"):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(timeout=30)
+
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+        self.assertEqual(len(outcomes), len(moves))
+        self.assertEqual(outcomes.count("moved"), 1)
+        self.assertEqual(Appointment.objects.filter(time_slot=contested).count(), 1)
+        booked = set(
+            Appointment.objects.filter(
+                status__in=Appointment.ACTIVE_STATUSES
+            ).values_list("time_slot_id", flat=True)
+        )
+        self.assertEqual(len(booked), len(appointments))
+        closed = set(
+            TimeSlot.objects.filter(is_available=False).values_list("id", flat=True)
+        )
+        self.assertEqual(closed, booked)
+
+
+class WaitlistTest(AppointmentTestMixin, TestCase):
+    """Test cases for the waitlist and its backfill of freed slots."""
+
+    def setUp(self):
+        super().setUp()
+        self.third_patient = User.objects.create_user(username="third")
+        day = self.slot.date
+        self.first = WaitlistEntry.objects.create(
+            patient=self.other_patient, doctor=self.doctor, date_from=day, date_to=day
+        )
+        self.second = WaitlistEntry.objects.create(
+            patient=self.third_patient,
+            doctor=self.doctor,
+            date_from=day - timedelta(days=1),
+            date_to=day + timedelta(days=3),
+        )
+
+    def test_cancellation_offers_slot_in_fifo_order(self):
+        """Test that a freed slot is held for the oldest matching entry."""
+        appointment = self.create_appointment(status="CONFIRMED")
+        self.client.login(username="patient", password="testpass123")
+
+        with mock.patch("appointments.services.WaitlistWorker.submit") as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(
+                    reverse("appointments:cancel_appointment", args=[appointment.id])
+                )
+        submit.assert_called_once_with([self.slot.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(WaitlistService.offer_slots([self.slot.id]), 1)
+
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.slot.refresh_from_db()
+        self.assertEqual(self.first.status, WaitlistEntry.OFFERED)
+        self.assertEqual(self.first.appointment.patient, self.other_patient)
+        self.assertEqual(self.first.appointment.status, "PENDING")
+        self.assertIsNotNone(self.first.appointment.hold_expires_at)
+        self.assertFalse(self.slot.is_available)
+        self.assertEqual(self.second.status, WaitlistEntry.WAITING)
+        self.assertTrue(
+            Notification.objects.filter(
+                user=self.other_patient, kind="waitlist_offer"
+            ).exists()
+        )
+
+        # The offer lapses unpaid and the sweep moves on to the next in line
+        later = self.first.appointment.hold_expires_at + timedelta(seconds=1)
+        AppointmentHoldService.release_expired_holds(now=later)
+        self.assertEqual(WaitlistService.offer_open_slots(now=later), 1)
+        self.second.refresh_from_db()
+        self.assertEqual(self.second.status, WaitlistEntry.OFFERED)
+        self.assertEqual(self.second.appointment.time_slot, self.slot)
+
+    def test_matching_is_one_query(self):
+        """Test that entries for other dates or doctors are never matched."""
+        self.first.date_from = self.first.date_to = self.slot.date + timedelta(days=1)
+        self.first.save()
+        self.second.status = WaitlistEntry.CANCELLED
+        self.second.save()
+
+        with self.assertNumQueries(1):
+            self.assertIsNone(WaitlistService.next_entry(self.slot))
+        self.assertEqual(WaitlistService.offer_slots([self.slot.id]), 0)
+
+    def test_join_waitlist(self):
+        """Test that patients can join a doctor's waitlist for future dates."""
+        self.client.login(username="patient", password="testpass123")
+        url = reverse("appointments:join_waitlist", args=[self.doctor.id])
+        tomorrow = self.slot.date
+
+        response = self.client.post(
+            url, {"date_from": tomorrow, "date_to": tomorrow - timedelta(days=1)}
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(url, {"date_from": tomorrow, "date_to": tomorrow})
+        self.assertRedirects(
+            response, reverse("appointments:book", args=[self.doctor.id])
+        )
+        self.assertTrue(
+            WaitlistEntry.objects.filter(
+                patient=self.patient, status=WaitlistEntry.WAITING
+            ).exists()
+        )
+
+
+class PatientOverlapGuardTest(AppointmentTestMixin, TestCase):
+    """Test cases for the guard against a patient's overlapping appointments."""
+
+    def setUp(self):
+        super().setUp()
+        other_doctor = Doctor.objects.create(
+            user=User.objects.create_user(username="dr_other", user_type="doctor"),
+            specialty=self.specialty,
+            license_number="LIC654321",
+            experience_years=3,
+            bio="Cardiologist",
+            consultation_fee=Decimal("80.00"),
+            created_by=self.admin_user,
+        )
+        # Overlaps self.slot (09:00-09:15) with a different doctor
+        self.other_slot = TimeSlot.objects.create(
+            doctor=other_doctor,
+            date=self.slot.date,
+            start_time=time(9, 10),
+            end_time=time(9, 25),
+        )
+        self.client.login(username="patient", password="testpass123")
+
+    def reserve(self, slot):
+        return self.client.post(
+            reverse("appointments:reserve_slot", args=[slot.id]), {"notes": ""}
+        )
+
+    def test_reservation_rejects_overlapping_appointment(self):
+        """Test that a patient cannot book two doctors at the same time."""
+        appointment = self.create_appointment(status="CONFIRMED")
+        self.assertEqual(
+            (appointment.start_at, appointment.end_at),
+            (self.slot.start_at, self.slot.end_at),
+        )
+
+        self.reserve(self.other_slot)
+
+        self.assertFalse(self.other_slot.appointments.exists())
+        self.other_slot.refresh_from_db()
+        self.assertTrue(self.other_slot.is_available)
+
+        # Someone else, or a cancelled appointment, does not count
+        appointment.status = "CANCELLED"
+        appointment.save()
+        self.create_appointment(patient=self.other_patient)
+        self.reserve(self.other_slot)
+        self.assertTrue(
+            self.other_slot.appointments.filter(patient=self.patient).exists()
+        )
+
+    def test_lapsed_hold_gives_way(self):
+        """Test that the patient's own lapsed hold does not block a booking."""
+        lapsed = self.create_appointment(
+            hold_expires_at=timezone.now() - timedelta(minutes=1)
+        )
+
+        self.reserve(self.other_slot)
+
+        lapsed.refresh_from_db()
+        self.assertEqual(lapsed.status, "EXPIRED")
+        self.assertEqual(self.other_slot.appointments.get().patient, self.patient)
+
+    def test_guard_is_enforced_by_the_database(self):
+        """Test that inserts and updates bypassing the views are rejected too."""
+        self.create_appointment(status="CONFIRMED")
+        with self.assertRaises(IntegrityError) as caught, transaction.atomic():
+            Appointment.objects.create(
+                patient=self.patient,
+                doctor=self.other_slot.doctor,
+                time_slot=self.other_slot,
+                consultation_fee=Decimal("80.00"),
+            )
+        self.assertTrue(Appointment.is_overlap_error(caught.exception))
+
+        moved = self.create_appointment(
+            slot=self.create_slot(time(10, 0)), status="CANCELLED"
+        )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Appointment.objects.filter(pk=moved.pk).update(
+                status="CONFIRMED", start_at=self.slot.start_at
+            )
+
+
+class CalendarFeedTest(AppointmentTestMixin, TestCase):
+    """Test cases for the per-user iCalendar feeds."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.appointment = self.create_appointment(
+            status="CONFIRMED", notes="Bring results; fasting, please"
+        )
+        self.feed, _created = CalendarFeed.reset(self.patient)
+        self.url = reverse("appointments:calendar_feed", args=[self.feed.token])
+
+    def fetch(self, url=None, **headers):
+        """GET a feed; the body, streamed or not, is kept on ``response.body``."""
+        response = self.client.get(url or self.url, headers=headers)
+        if response.streaming:
+            response.body = b"".join(response.streaming_content)
+        else:
+            response.body = response.content
+        return response
+
+    def test_feed_lists_appointments_for_patient_and_doctor(self):
+        """Test that both sides of an appointment see it in their feed."""
+        response = self.fetch()
+
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+        body = response.body.decode()
+        self.assertTrue(body.startswith("BEGIN:VCALENDAR\r\n"))
+        self.assertIn(f"UID:appointment-{self.appointment.id}@", body)
+        self.assertIn("SUMMARY:Appointment with Dr. John Smith\r\n", body)
+        self.assertIn("DESCRIPTION:Bring results\\; fasting\\, please\r\n", body)
+        self.assertIn(
+            f"DTSTART:{self.slot.start_at.astimezone(dt_timezone.utc):%Y%m%dT%H%M%SZ}",
+            body,
+        )
+        self.assertIn("STATUS:CONFIRMED", body)
+        self.assertTrue(all(len(line) <= 75 for line in body.split("\r\n")))
+
+        doctor_feed, _created = CalendarFeed.reset(self.doctor.user)
+        response = self.fetch(
+            reverse("appointments:calendar_feed", args=[doctor_feed.token])
+        )
+        self.assertIn(b"SUMMARY:Appointment with Jane Doe", response.body)
+
+        self.assertEqual(
+            self.client.get(
+                reverse("appointments:calendar_feed", args=["wrong"])
+            ).status_code,
+            404,
+        )
+
+    def test_unchanged_feed_is_not_modified(self):
+        """Test that polling with the ETag gets a 304 and a cached body after it."""
+        first = self.fetch()
+        self.assertTrue(first.streaming)
+
+        with self.assertNumQueries(1):
+            response = self.fetch(if_none_match=first["ETag"])
+        self.assertEqual(response.status_code, 304)
+        with self.assertNumQueries(1):
+            response = self.fetch(if_modified_since=first["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+
+        # Only the user lookup; the body comes from the cache
+        with self.assertNumQueries(1):
+            cached = self.fetch()
+        self.assertFalse(cached.streaming)
+        self.assertEqual(cached.body, first.body)
+        self.assertEqual(cached["ETag"], first["ETag"])
+
+    def test_appointment_changes_bump_the_feed(self):
+        """Test that saves and bulk updates give both users a new feed."""
+        first = self.fetch()
+        doctor_feed, _created = CalendarFeed.reset(self.doctor.user)
+        other_feed, _created = CalendarFeed.reset(self.other_patient)
+
+        with mock.patch("appointments.services.WaitlistWorker.submit"):
+            with self.captureOnCommitCallbacks(execute=True):
+                AppointmentTransitionService.transition(
+                    [self.appointment.id], "CANCELLED"
+                )
+
+        response = self.fetch(if_none_match=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], first["ETag"])
+        self.assertIn(b"STATUS:CANCELLED", response.body)
+        doctor_feed.refresh_from_db()
+        self.assertEqual(doctor_feed.version, 1)
+        # Other users' feeds are untouched
+        other_feed.refresh_from_db()
+        self.assertEqual(other_feed.version, 0)
+
+        second = response["ETag"]
+        self.appointment.refresh_from_db()
+        self.appointment.reminder_sent_at = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.appointment.save(update_fields=["reminder_sent_at"])
+        self.assertEqual(self.fetch(if_none_match=second).status_code, 304)
+
+    def test_feed_is_bumped_after_commit(self):
+        """Test that a booking does not lock the feed rows inside its transaction."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.appointment.notes = "Moved"
+            self.appointment.save()
+            self.assertEqual(CalendarFeed.objects.get().version, 0)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(CalendarFeed.objects.get().version, 1)
+
+    def test_name_changes_bump_the_feed(self):
+        """Test that renaming a doctor, patient or specialty rebuilds the feed."""
+        first = self.fetch()
+        doctor_feed, _created = CalendarFeed.reset(self.doctor.user)
+
+        self.doctor.user.last_name = "Smyth"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctor.user.save()
+        response = self.fetch(if_none_match=first["ETag"])
+        self.assertIn(b"SUMMARY:Appointment with Dr. John Smyth", response.body)
+
+        specialty = self.doctor.specialty
+        specialty.name = "Cardiac Surgery"
+        with self.captureOnCommitCallbacks(execute=True):
+            specialty.save()
+        self.assertIn(b"CATEGORIES:Cardiac Surgery", self.fetch().body)
+
+        self.patient.first_name = "Janet"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.patient.save(update_fields=["first_name"])
+        doctor_feed.refresh_from_db()
+        self.assertEqual(doctor_feed.version, 3)
+
+        # Saves that leave the names alone keep the cached feeds
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctor.user.save()
+            self.doctor.save()
+        doctor_feed.refresh_from_db()
+        self.assertEqual(doctor_feed.version, 3)
+
+
+class BusyTimeImportTest(AppointmentTestMixin, TestCase):
+    """Test cases for importing a doctor's busy time from an .ics file."""
+
+    def setUp(self):
+        super().setUp()
+        self.day = date.today() + timedelta(days=2)
+        # 09:00-12:00 in 15-minute slots
+        self.slots = [
+            self.create_slot(time(9 + n // 4, (n % 4) * 15), day=self.day)
+            for n in range(12)
+        ]
+
+    def local(self, hour, minute=0, day=None):
+        return TimeSlot.local_datetime(day or self.day, time(hour, minute))
+
+    def calendar(self, *events):
+        lines = ["BEGIN:VCALENDAR", "VERSION:2.0"]
+        for event in events:
+            lines += ["BEGIN:VEVENT", *event, "END:VEVENT"]
+        return "\r\n".join(lines + ["END:VCALENDAR", ""])
+
+    def test_parse_and_merge(self):
+        """Test that the supported date forms are read and overlaps merged."""
+        utc = self.local(9).astimezone(dt_timezone.utc)
+        text = self.calendar(
+            [f"DTSTART:{utc:%Y%m%dT%H%M%SZ}", "DURATION:PT30M"],
+            # Floating time, overlapping the first event
+            [f"DTSTART:{self.day:%Y%m%d}T092000", f"DTEND:{self.day:%Y%m%d}T100000"],
+            [
+                f"DTSTART;TZID=UTC:{utc + timedelta(hours=2):%Y%m%dT%H%M%S}",
+                f"DTEND;TZID=UTC:{utc + timedelta(hours=3):%Y%m%dT%H%M%S}",
+                "BEGIN:VALARM",
+                "DURATION:PT15M",
+                "END:VALARM",
+            ],
+            [f"DTSTART;VALUE=DATE:{self.day + timedelta(days=1):%Y%m%d}"],
+            [
+                "TRANSP:TRANSPARENT",
+                f"DTSTART:{self.day:%Y%m%d}T130000",
+                "DURATION:PT1H",
+            ],
+            ["STATUS:CANCELLED", f"DTSTART:{self.day:%Y%m%d}T140000", "DURATION:PT1H"],
+            ["DTSTART:not-a-date", "DURATION:PT1H"],
+        )
+
+        intervals, skipped = busy_intervals(text)
+
+        self.assertEqual(skipped, 1)
+        self.assertEqual(
+            merge_intervals(intervals),
+            [
+                (self.local(9), self.local(10)),
+                (self.local(11), self.local(12)),
+                (
+                    self.local(0, day=self.day + timedelta(days=1)),
+                    self.local(0, day=self.day + timedelta(days=2)),
+                ),
+            ],
+        )
+        with self.assertRaises(ValueError):
+            busy_intervals("not a calendar")
+
+    def test_clashing_slots_are_cleared_and_booked_ones_reported(self):
+        """Test that free slots go, history slots close and bookings are listed."""
+        booked = self.create_appointment(slot=self.slots[1], status="CONFIRMED")
+        self.create_appointment(slot=self.slots[2], status="CANCELLED")
+        self.slots[2].is_available = True
+        self.slots[2].save()
+
+        result = BusyTimeImportService.apply(
+            self.doctor.id,
+            [
+                (self.local(9, 10), self.local(9, 40)),
+                (self.local(9, 30), self.local(9, 45)),
+                # Touches 10:00 without overlapping the 10:00 slot
+                (self.local(9, 50), self.local(10)),
+            ],
+        )
+
+        self.assertEqual(result["intervals"], 2)
+        self.assertEqual(result["booked"], [booked])
+        # 09:00 and 09:45 deleted, 09:15 booked, 09:30 keeps its history
+        self.assertEqual(result["deleted"], 2)
+        self.assertEqual(result["closed"], 1)
+        self.assertEqual(
+            list(
+                TimeSlot.objects.filter(date=self.day)
+                .order_by("start_at")
+                .values_list("start_time", "is_available")[:3]
+            ),
+            [(time(9, 15), False), (time(9, 30), False), (time(10, 0), True)],
+        )
+
+        result = BusyTimeImportService.apply(
+            self.doctor.id,
+            [(self.local(10), self.local(10, 30))],
+            BusyTimeImportService.CLOSE,
+        )
+        self.assertEqual((result["deleted"], result["closed"]), (0, 2))
+
+    def test_large_import_is_set_based(self):
+        """Test that thousands of events cost a fixed number of queries."""
+        events = [
+            [
+                f"DTSTART:{self.day:%Y%m%d}T{9 + n % 3:02d}{(n * 7) % 60:02d}00",
+                "DURATION:PT5M",
+            ]
+            for n in range(3000)
+        ]
+        # A busy day with no slots of this doctor
+        events.append([f"DTSTART;VALUE=DATE:{self.day + timedelta(days=30):%Y%m%d}"])
+        intervals, _skipped = busy_intervals(self.calendar(*events))
+        self.assertEqual(len(intervals), 3001)
+
+        # The slot sweep, then one chunk: delete (3), close, booked report,
+        # and the transaction's savepoint pair
+        with self.assertNumQueries(8):
+            result = BusyTimeImportService.apply(self.doctor.id, intervals)
+        self.assertEqual(result["deleted"], 12)
+        self.assertFalse(TimeSlot.objects.filter(date=self.day).exists())
+
+    def test_import_view(self):
+        """Test that doctors import for themselves and patients are turned away."""
+        self.create_appointment(slot=self.slots[0], status="CONFIRMED")
+        upload = SimpleUploadedFile(
+            "busy.ics",
+            self.calendar(
+                [f"DTSTART:{self.day:%Y%m%d}T090000", f"DTEND:{self.day:%Y%m%d}T093000"]
+            ).encode(),
+            content_type="text/calendar",
+        )
+        url = reverse("appointments:import_busy_time", args=[self.doctor.id])
+
+        self.client.login(username="patient", password="testpass123")
+        self.assertRedirects(
+            self.client.post(url, {"calendar_file": upload, "action": "delete"}),
+            reverse("core:home"),
+        )
+
+        upload.seek(0)
+        self.client.login(username="dr_smith", password="testpass123")
+        response = self.client.post(url, {"calendar_file": upload, "action": "delete"})
+        self.assertEqual(response.context["deleted"], 1)
+        self.assertContains(response, "Jane Doe")
+
+
+class AppointmentAdminChangelistTest(AppointmentTestMixin, TestCase):
+    """Test cases for the appointment and time slot admin changelists."""
+
+    def setUp(self):
+        super().setUp()
+        self.admin_user.is_staff = True
+        self.admin_user.save()
+        self.client.login(username="admin", password="testpass123")
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Test that related columns and filters are not loaded per row."""
+        url = reverse("admin:appointments_appointment_changelist")
+        self.create_appointment()
+        baseline = self.changelist_queries(url)
+
+        for hour in range(10, 15):
+            self.create_appointment(
+                slot=self.create_slot(time(hour, 0)), patient=self.other_patient
+            )
+
+        self.assertEqual(self.changelist_queries(url), baseline)
+        slots_url = reverse("admin:appointments_timeslot_changelist")
+        slots_baseline = self.changelist_queries(slots_url)
+        self.create_slot(time(16, 0))
+        self.assertEqual(self.changelist_queries(slots_url), slots_baseline)
+
+    def test_date_hierarchy_uses_appointment_start(self):
+        """Test that drilling down by date filters on the appointment's start_at."""
+        appointment = self.create_appointment()
+        day = timezone.localtime(appointment.start_at).date()
+
+        response = self.client.get(
+            reverse("admin:appointments_appointment_changelist"),
+            {
+                "start_at__year": day.year,
+                "start_at__month": day.month,
+                "start_at__day": day.day,
+            },
+        )
+
+        self.assertEqual(list(response.context["cl"].result_list), [appointment])
+
+    def test_autocomplete_filter(self):
+        """Test that the doctor/patient filters use autocomplete and still filter."""
+        mine = self.create_appointment()
+        self.create_appointment(
+            slot=self.create_slot(time(10, 0)), patient=self.other_patient
+        )
+
+        response = self.client.get(
+            reverse("admin:appointments_appointment_changelist"),
+            {"patient__id__exact": self.patient.pk},
+        )
+
+        self.assertContains(response, 'data-filter-param="patient__id__exact"')
+        self.assertContains(response, "admin-autocomplete")
+        self.assertEqual(list(response.context["cl"].result_list), [mine])
@@ -9,6 +9,7 @@ urlpatterns = [
     path("", views.appointment_list, name="appointment_list"),
     path("my-appointments/", views.my_appointments_view, name="my_appointments"),
     path("book/<int:doctor_id>/", views.book_view, name="book"),
+    path("waitlist/<int:doctor_id>/", views.join_waitlist_view, name="join_waitlist"),
     path(
         "calendar-book/<int:doctor_id>/", views.calendar_book_view, name="calendar_book"
     ),
@@ -23,11 +24,28 @@ urlpatterns = [
         views.cancel_appointment_view,
         name="cancel_appointment",
     ),
+    path(
+        "reschedule/<int:appointment_id>/",
+        views.reschedule_appointment_view,
+        name="reschedule_appointment",
+    ),
     path(
         "mark-completed/<int:appointment_id>/",
         views.mark_completed,
         name="mark_completed",
     ),
+    path(
+        "status/<int:appointment_id>/",
+        views.update_appointment_status,
+        name="update_appointment_status",
+    ),
+    path(
+        "status/bulk/",
+        views.bulk_update_appointment_status,
+        name="bulk_update_appointment_status",
+    ),
+    path("agenda/", views.doctor_agenda_view, name="doctor_agenda"),
+    path("feed/<str:token>.ics", views.calendar_feed_view, name="calendar_feed"),
     path(
         "admin-add-time-slot/<int:doctor_id>/",
         views.admin_add_time_slot_view,
@@ -48,6 +66,11 @@ urlpatterns = [
         views.delete_time_slot_view,
         name="delete_time_slot",
     ),
+    path(
+        "import-busy-time/<int:doctor_id>/",
+        views.import_busy_time_view,
+        name="import_busy_time",
+    ),
     path(
         "delete-day-slots/<int:doctor_id>/",
         views.delete_day_slots_view,
@@ -1,23 +1,42 @@
 from calendar import weekday
 
-from django.db import transaction
-from django.http import HttpResponse, HttpResponseForbidden
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.views.decorators.http import require_POST, require_safe
 from django.utils.dateparse import parse_date
-from datetime import date, timedelta, datetime
+from datetime import date, time, timedelta, datetime
 from doctors.models import Doctor
+from accounts.services import UserSnapshotService
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib import messages
 from django.core.paginator import Paginator
-from .models import TimeSlot, Appointment
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from .ics import CalendarFeedService, busy_intervals
+from .models import TimeSlot, Appointment, CalendarFeed
+from .services import (
+    AppointmentHoldService,
+    AppointmentRescheduleService,
+    AppointmentTransitionService,
+    BusyTimeImportService,
+    DoctorAgendaService,
+    RescheduleError,
+)
 from .forms import (
     AppointmentForm,
     AdminAddTimeSlot,
     BulkTimeSlotForm,
+    BusyTimeImportForm,
     DeleteTimeSlotForm,
     DeleteDayForm,
+    WaitlistForm,
 )
 
+# Most appointments one bulk status request may change
+BULK_TRANSITION_LIMIT = 500
+
 # Imports needed for sending email
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
@@ -54,7 +73,7 @@ def my_appointments_view(request):
     Shows a list of appointments for the currently logged-in patient.
     """
     appointments = Appointment.objects.filter(patient=request.user).order_by(
-        "-time_slot__date", "-time_slot__start_time"
+        "-time_slot__start_at"
     )
     context = {"appointments": appointments}
     return render(request, "appointments/my_appointments.html", context)
@@ -63,13 +82,50 @@ def my_appointments_view(request):
 @login_required
 def book_view(request, doctor_id):
     doctor = get_object_or_404(Doctor, id=doctor_id)
-    slots = TimeSlot.objects.filter(
-        doctor=doctor, is_available=True, date__gte=date.today()
-    ).order_by("date", "start_time")
+    slots = (
+        TimeSlot.objects.available()
+        .upcoming()
+        .filter(doctor=doctor)
+        .order_by("start_at")
+    )
     context = {"doctor": doctor, "slots": slots}
     return render(request, "appointments/book.html", context)
 
 
+@login_required
+def join_waitlist_view(request, doctor_id):
+    """
+    Put the patient on a doctor's waitlist for a range of dates.
+
+    The first slot that frees up in the range is held for the oldest
+    waiting patient and they are notified to pay for it.
+    """
+    doctor = get_object_or_404(Doctor.objects.select_related("user"), id=doctor_id)
+
+    if request.method == "POST":
+        form = WaitlistForm(request.POST)
+        if form.is_valid():
+            entry = form.save(commit=False)
+            entry.patient = request.user
+            entry.doctor = doctor
+            entry.save()
+            messages.success(
+                request,
+                "You are on the waitlist. We will hold the first slot that opens up "
+                "for you and let you know.",
+            )
+            return redirect("appointments:book", doctor_id=doctor.id)
+    else:
+        today = timezone.localdate()
+        form = WaitlistForm(
+            initial={"date_from": today, "date_to": today + timedelta(days=7)}
+        )
+
+    return render(
+        request, "appointments/join_waitlist.html", {"doctor": doctor, "form": form}
+    )
+
+
 @login_required
 def calendar_book_view(request, doctor_id):
     """Calendar-based booking view for selecting appointment dates and times."""
@@ -86,9 +142,12 @@ def calendar_book_view(request, doctor_id):
         selected_date = date.today()
 
     # Get all available slots for the doctor
-    all_slots = TimeSlot.objects.filter(
-        doctor=doctor, is_available=True, date__gte=date.today()
-    ).order_by("date", "start_time")
+    all_slots = (
+        TimeSlot.objects.available()
+        .upcoming()
+        .filter(doctor=doctor)
+        .order_by("start_at")
+    )
 
     # Get slots for the selected date
     available_slots = all_slots.filter(date=selected_date)
@@ -110,17 +169,29 @@ def calendar_book_view(request, doctor_id):
 # appointments/views.py
 
 
+def _slot_is_bookable(slot):
+    """A slot is bookable when it is free or only held by a lapsed reservation."""
+    current = slot.active_appointment
+    if current is not None:
+        return current.hold_expired
+    return slot.is_available
+
+
 @login_required
 def reserve_slot_view(request, slot_id):
     slot = get_object_or_404(TimeSlot, id=slot_id)
 
-    if not slot.is_available:
+    if slot.start_at <= timezone.now():
+        messages.error(request, "This time slot has already started.")
+        return redirect("appointments:book", doctor_id=slot.doctor.id)
+
+    if not slot.is_available and slot.active_appointment is None:
         messages.error(request, "This time slot is no longer available.")
         # CORRECTED THIS REDIRECT
         return redirect("appointments:book", doctor_id=slot.doctor.id)
 
     # Check if slot already has an appointment
-    if hasattr(slot, "appointment"):
+    if not _slot_is_bookable(slot):
         messages.error(request, " This time slot is already booked.")
         return redirect("appointments:book", doctor_id=slot.doctor.id)
 
@@ -130,7 +201,7 @@ def reserve_slot_view(request, slot_id):
             try:
                 with transaction.atomic():
                     slot = TimeSlot.objects.select_for_update().get(id=slot_id)
-                    if not slot.is_available:
+                    if not slot.is_available and slot.active_appointment is None:
                         messages.error(
                             request,
                             "Sorry, this time slot has just been booked by someone else.",
@@ -139,22 +210,41 @@ def reserve_slot_view(request, slot_id):
                         return redirect("appointments:book", doctor_id=slot.doctor.id)
 
                     # Double-check that slot doesn't have an appointment
-                    if hasattr(slot, "appointment"):
+                    if not _slot_is_bookable(slot):
                         messages.error(
                             request,
                             " Sorry, this time slot has just been booked by someone else.",
                         )
                         return redirect("appointments:book", doctor_id=slot.doctor.id)
 
+                    # Take over a lapsed hold the sweeper has not released yet,
+                    # and drop the patient's own lapsed holds at the same time
+                    # so they do not trip the overlap guard
+                    AppointmentTransitionService.expire_holds(
+                        Appointment.objects.filter(
+                            Q(time_slot=slot)
+                            | Q(
+                                patient=request.user,
+                                start_at__lt=slot.end_at,
+                                end_at__gt=slot.start_at,
+                            )
+                        ),
+                        timezone.now(),
+                        reason="hold_taken_over",
+                    )
+
                     appointment = form.save(commit=False)
                     appointment.time_slot = slot
                     appointment.doctor = slot.doctor
                     appointment.patient = request.user
                     appointment.consultation_fee = slot.doctor.consultation_fee
                     appointment.status = "PENDING"
+                    appointment.hold_expires_at = AppointmentHoldService.hold_expiry()
+                    # The overlap guard checks the patient's other
+                    # appointments inside this INSERT
                     appointment.save()
                     slot.is_available = False
-                    slot.save()
+                    slot.save(update_fields=["is_available"])
 
                     # Email Sending Logic
                     subject = "Your Appointment Confirmation"
@@ -211,6 +301,15 @@ def reserve_slot_view(request, slot_id):
                         appointment_id=appointment.id,
                     )
 
+            except IntegrityError as e:
+                if not Appointment.is_overlap_error(e):
+                    messages.error(request, f"An error occurred: {str(e)}")
+                else:
+                    messages.error(
+                        request,
+                        "You already have an appointment that overlaps this time.",
+                    )
+                return redirect("appointments:book", doctor_id=slot.doctor.id)
             except Exception as e:
                 messages.error(request, f"An error occurred: {str(e)}")
                 # CORRECTED THIS REDIRECT
@@ -250,36 +349,54 @@ def cancel_appointment_view(request, appointment_id):
 
     if request.method == "POST":
         # Only allow cancellation of pending or confirmed appointments
-        if appointment.status in ["PENDING", "CONFIRMED"]:
-            with transaction.atomic():
-                # Update appointment status
-                appointment.status = "CANCELLED"
-                appointment.save()
-
-                # Make the time slot available again
-                appointment.time_slot.is_available = True
-                appointment.time_slot.save()
-
-                # Send cancellation email
-                from .services import AppointmentEmailService
-
-                try:
-                    AppointmentEmailService.send_cancellation_notification(appointment)
-                except Exception as e:
-                    # Don't fail the cancellation if email fails
-                    print(f"Warning: Could not send cancellation email: {str(e)}")
-
-                messages.success(request, "Appointment cancelled successfully.")
-                return redirect("appointments:appointment_list")
+        outcome = AppointmentTransitionService.transition(
+            [appointment.id], "CANCELLED", user=request.user, reason="patient"
+        )[appointment.id]
+        if outcome == AppointmentTransitionService.UPDATED:
+            messages.success(request, "Appointment cancelled successfully.")
         else:
             messages.error(request, "This appointment cannot be cancelled.")
-            return redirect("appointments:appointment_list")
+        return redirect("appointments:appointment_list")
 
     return render(
         request, "appointments/cancel_appointment.html", {"appointment": appointment}
     )
 
 
+@login_required
+def reschedule_appointment_view(request, appointment_id):
+    """Move an appointment to another free slot of the same doctor."""
+    appointment = get_object_or_404(
+        Appointment.objects.select_related("doctor__user", "time_slot"),
+        id=appointment_id,
+        patient=request.user,
+    )
+
+    if request.method == "POST":
+        slot_id = request.POST.get("slot_id", "")
+        try:
+            if not slot_id.isdigit():
+                raise RescheduleError("Choose a time slot.")
+            AppointmentRescheduleService.reschedule(appointment.id, slot_id)
+        except RescheduleError as e:
+            messages.error(request, str(e))
+        else:
+            messages.success(request, "Your appointment has been rescheduled.")
+            return redirect("appointments:appointment_list")
+
+    slots = (
+        TimeSlot.objects.available()
+        .upcoming()
+        .filter(doctor=appointment.doctor)
+        .order_by("start_at")
+    )
+    return render(
+        request,
+        "appointments/reschedule_appointment.html",
+        {"appointment": appointment, "slots": slots},
+    )
+
+
 @login_required
 def mark_completed(request, appointment_id):
     """Mark an appointment as completed by the patient."""
@@ -294,8 +411,9 @@ def mark_completed(request, appointment_id):
         return redirect("appointments:appointment_list")
 
     if request.method == "POST":
-        appointment.status = "COMPLETED"
-        appointment.save()
+        AppointmentTransitionService.transition(
+            [appointment.id], "COMPLETED", user=request.user, reason="patient"
+        )
         messages.success(
             request, "Appointment marked as completed! You can now leave a review."
         )
@@ -304,31 +422,132 @@ def mark_completed(request, appointment_id):
     return redirect("appointments:appointment_list")
 
 
+def _transition_scope(request):
+    """Appointments the requesting doctor or admin may change the status of."""
+    snapshot = UserSnapshotService.for_request(request)
+    if snapshot.is_admin:
+        return Appointment.objects.all()
+    if snapshot.doctor_id is not None:
+        return Appointment.objects.filter(doctor_id=snapshot.doctor_id)
+    return None
+
+
 @login_required
+@require_POST
 def update_appointment_status(request, appointment_id):
-    if request.method != "POST":
-        return HttpResponseForbidden("Invalid request method.")
-    appointment = get_object_or_404(Appointment, pk=appointment_id)
-    if (
-        not hasattr(request.user, "doctor_profile")
-        or request.user.doctor_profile != appointment.doctor
-    ):
-        if not request.user.is_superuser:
-            return HttpResponseForbidden("You do not have permission to change this.")
+    scope = _transition_scope(request)
+    if scope is None:
+        return HttpResponseForbidden("You do not have permission to change this.")
+    appointment = get_object_or_404(scope, pk=appointment_id)
     new_status = request.POST.get("status")
-    valid_statuses = [choice[0] for choice in Appointment.STATUS_CHOICES]
-    if new_status in valid_statuses:
-        appointment.status = new_status
-        appointment.save()
-        messages.success(
-            request,
-            f"Appointment status updated to {appointment.get_status_display()}.",
-        )
-    else:
+    if not AppointmentTransitionService.can_transition(appointment.status, new_status):
         messages.error(request, "Invalid status selected.")
+        return redirect("appointments:appointment_list")
+
+    AppointmentTransitionService.transition(
+        [appointment.id], new_status, user=request.user, queryset=scope
+    )
+    messages.success(
+        request,
+        f"Appointment status updated to {dict(Appointment.STATUS_CHOICES)[new_status]}.",
+    )
     return redirect("appointments:appointment_list")
 
 
+@login_required
+@require_POST
+def bulk_update_appointment_status(request):
+    """
+    Apply one status transition to many appointments.
+
+    Expects ``status`` and repeated ``appointment_ids``; answers with the
+    outcome for each id (updated, not_allowed or not_found).
+    """
+    scope = _transition_scope(request)
+    if scope is None:
+        return HttpResponseForbidden("You do not have permission to change this.")
+    new_status = request.POST.get("status")
+    ids = request.POST.getlist("appointment_ids")
+    if new_status not in AppointmentTransitionService.TRANSITIONS:
+        return JsonResponse({"error": "Invalid status selected."}, status=400)
+    if not ids or len(ids) > BULK_TRANSITION_LIMIT or not all(i.isdigit() for i in ids):
+        return JsonResponse(
+            {"error": f"Send between 1 and {BULK_TRANSITION_LIMIT} appointment ids."},
+            status=400,
+        )
+
+    results = AppointmentTransitionService.transition(
+        ids, new_status, user=request.user, queryset=scope
+    )
+    return JsonResponse(
+        {
+            "status": new_status,
+            "updated": sum(
+                outcome == AppointmentTransitionService.UPDATED
+                for outcome in results.values()
+            ),
+            "results": {str(pk): outcome for pk, outcome in results.items()},
+        }
+    )
+
+
+@login_required
+def doctor_agenda_view(request):
+    """
+    A doctor's agenda for one day or one week (Monday to Sunday).
+
+    Doctors see their own; admins pick the doctor with ``?doctor=``.
+    """
+    snapshot = UserSnapshotService.for_request(request)
+    if snapshot.is_admin:
+        doctor_id = request.GET.get("doctor", "")
+        if not doctor_id.isdigit():
+            messages.error(request, "Choose a doctor to see their agenda.")
+            return redirect("doctors:doctor_list")
+    elif snapshot.doctor_id is not None:
+        doctor_id = snapshot.doctor_id
+    else:
+        messages.error(request, "The agenda is only available to doctors and admins.")
+        return redirect("core:home")
+    doctor = get_object_or_404(Doctor.objects.select_related("user"), pk=doctor_id)
+
+    try:
+        day = parse_date(request.GET.get("date", "")) or timezone.localdate()
+    except ValueError:
+        day = timezone.localdate()
+    view = "week" if request.GET.get("view") == "week" else "day"
+    if view == "week":
+        start, length = day - timedelta(days=day.weekday()), 7
+    else:
+        start, length = day, 1
+
+    context = {
+        "doctor": doctor,
+        "agenda": DoctorAgendaService.agenda(doctor.id, start, length),
+        "view": view,
+        "day": day,
+        "start": start,
+        "end": start + timedelta(days=length - 1),
+        "previous": day - timedelta(days=length),
+        "next": day + timedelta(days=length),
+        "today": timezone.localdate(),
+        "show_doctor": snapshot.is_admin,
+    }
+    return render(request, "appointments/doctor_agenda.html", context)
+
+
+@require_safe
+def calendar_feed_view(request, token):
+    """
+    A user's appointments as an iCalendar feed.
+
+    Calendar apps cannot log in, so the secret token in the URL is the
+    authentication; users create and reset it on their profile page.
+    """
+    feed = get_object_or_404(CalendarFeed, token=token)
+    return CalendarFeedService.response(request, feed)
+
+
 def admin_add_time_slot_view(request, doctor_id):
     doctor = get_object_or_404(Doctor, id=doctor_id)
 
@@ -381,9 +600,25 @@ def time_slot_management_view(request, doctor_id):
     start_date = date.today()
     end_date = start_date + timedelta(days=90)
 
-    time_slots = TimeSlot.objects.filter(
-        doctor=doctor, date__range=[start_date, end_date]
-    ).order_by("date", "start_time")
+    time_slots = (
+        TimeSlot.objects.filter(
+            doctor=doctor,
+            start_at__gte=TimeSlot.local_datetime(start_date, time.min),
+            start_at__lt=TimeSlot.local_datetime(
+                end_date + timedelta(days=1), time.min
+            ),
+        )
+        .prefetch_related(
+            Prefetch(
+                "appointments",
+                queryset=Appointment.objects.filter(
+                    status__in=Appointment.ACTIVE_STATUSES
+                ).select_related("patient"),
+                to_attr="active_appointments",
+            )
+        )
+        .order_by("start_at")
+    )
 
     # Paginate time slots
     paginator = Paginator(time_slots, 20)  # 20 slots per page
@@ -447,12 +682,15 @@ def time_slot_management_view(request, doctor_id):
 
     # Calculate statistics
     total_slots = time_slots.count()
-    available_slots = time_slots.filter(appointment__isnull=True).count()
-    booked_slots = time_slots.filter(appointment__isnull=False).count()
+    booked_slots = time_slots.filter(
+        appointments__status__in=Appointment.ACTIVE_STATUSES
+    ).count()
+    available_slots = total_slots - booked_slots
 
     # Initialize forms
     bulk_form = BulkTimeSlotForm()
     delete_day_form = DeleteDayForm()
+    busy_time_form = BusyTimeImportForm()
 
     # Calculate navigation URLs
     prev_month = month - 1
@@ -479,6 +717,7 @@ def time_slot_management_view(request, doctor_id):
         "slots_by_date": slots_by_date,
         "bulk_form": bulk_form,
         "delete_day_form": delete_day_form,
+        "busy_time_form": busy_time_form,
         "start_date": start_date,
         "end_date": end_date,
         "total_slots": total_slots,
@@ -573,20 +812,122 @@ def delete_time_slot_view(request, time_slot_id):
     time_slot = get_object_or_404(TimeSlot, id=time_slot_id)
     doctor_id = time_slot.doctor.id
 
-    # Check if time slot has an appointment
-    if hasattr(time_slot, "appointment"):
+    if time_slot.active_appointment is not None:
         messages.error(request, "Cannot delete time slot that has an appointment.")
-    else:
-        time_slot.delete()
+    elif TimeSlot.objects.filter(pk=time_slot.pk, appointments__isnull=True).delete()[
+        0
+    ]:
         messages.success(request, "Time slot deleted successfully.")
+    else:
+        # Slots that keep (cancelled) history stay, but can no longer be booked
+        TimeSlot.objects.filter(pk=time_slot.pk).update(is_available=False)
+        messages.success(
+            request,
+            "Time slot closed. It keeps its cancelled or expired appointments, "
+            "so it was not deleted.",
+        )
 
     return redirect("appointments:time_slot_management", doctor_id=doctor_id)
 
 
+def _cancel_day(doctor, day, slots, user):
+    """
+    Cancel every open appointment in ``slots`` and delete the free ones.
+
+    Cancellation, its status history, slot closing and patient
+    notifications are each a single set-based statement, however many
+    appointments the day had.
+    """
+    from notifications.models import Notification
+    from notifications.services import NotificationService
+
+    with transaction.atomic():
+        affected = list(
+            Appointment.objects.select_for_update()
+            .filter(time_slot__in=slots, status__in=["PENDING", "CONFIRMED"])
+            .select_related("time_slot")
+        )
+        now = timezone.now()
+        Appointment.objects.filter(id__in=[a.id for a in affected]).update(
+            status="CANCELLED", updated_at=now
+        )
+        AppointmentTransitionService.record(
+            [(appointment.id, appointment.status) for appointment in affected],
+            "CANCELLED",
+            user,
+            reason="day_cancelled",
+            now=now,
+        )
+        # Slots that keep (cancelled) history stay, but can no longer be booked
+        slots.filter(appointments__isnull=False).update(is_available=False)
+        deleted_count = slots.filter(appointments__isnull=True).delete()[0]
+
+        link = reverse("appointments:appointment_list")
+        NotificationService.bulk_notify(
+            Notification(
+                user_id=appointment.patient_id,
+                kind="appointment_cancelled",
+                message=(
+                    f"Dr. {doctor.user.get_full_name()} cancelled your appointment on "
+                    f"{day.strftime('%B %d, %Y')} at "
+                    f"{appointment.time_slot.start_time.strftime('%I:%M %p')}."
+                ),
+                link=link,
+            )
+            for appointment in affected
+        )
+
+    return len(affected), deleted_count
+
+
+@login_required
+def import_busy_time_view(request, doctor_id):
+    """
+    Clear a doctor's free slots that clash with an uploaded calendar.
+
+    Admins can import for any doctor, doctors for themselves. Appointments
+    in clashing slots are listed rather than cancelled.
+    """
+    doctor = get_object_or_404(Doctor.objects.select_related("user"), id=doctor_id)
+    snapshot = UserSnapshotService.for_request(request)
+    if not snapshot.is_admin and snapshot.doctor_id != doctor.id:
+        messages.error(request, "You can only import busy time for your own schedule.")
+        return redirect("core:home")
+    if request.method != "POST":
+        return redirect("appointments:time_slot_management", doctor_id=doctor.id)
+
+    form = BusyTimeImportForm(request.POST, request.FILES)
+    if not form.is_valid():
+        for errors in form.errors.values():
+            messages.error(request, errors[0])
+        return redirect("appointments:time_slot_management", doctor_id=doctor.id)
+
+    content = form.cleaned_data["calendar_file"].read().decode("utf-8", "replace")
+    try:
+        intervals, skipped = busy_intervals(content)
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect("appointments:time_slot_management", doctor_id=doctor.id)
+    result = BusyTimeImportService.apply(
+        doctor.id, intervals, form.cleaned_data["action"]
+    )
+
+    return render(
+        request,
+        "appointments/busy_time_import.html",
+        {"doctor": doctor, "events": len(intervals), "skipped": skipped, **result},
+    )
+
+
 @login_required
 def delete_day_slots_view(request, doctor_id):
     """Delete all time slots for a specific day"""
     doctor = get_object_or_404(Doctor, id=doctor_id)
+    # Cancelling a day cancels other people's bookings: admins and the
+    # doctor who owns the day only
+    snapshot = UserSnapshotService.for_request(request)
+    if not snapshot.is_admin and snapshot.doctor_id != doctor.id:
+        return HttpResponseForbidden("You can only clear days of your own schedule.")
 
     if request.method == "POST":
         form = DeleteDayForm(request.POST)
@@ -597,9 +938,17 @@ def delete_day_slots_view(request, doctor_id):
             slots_to_delete = TimeSlot.objects.filter(doctor=doctor, date=date_to_clear)
 
             # Check if any slots have appointments
-            slots_with_appointments = slots_to_delete.filter(appointment__isnull=False)
+            slots_with_appointments = slots_to_delete.filter(appointments__isnull=False)
 
-            if slots_with_appointments.exists():
+            if form.cleaned_data["cancel_appointments"]:
+                cancelled_count, deleted_count = _cancel_day(
+                    doctor, date_to_clear, slots_to_delete, request.user
+                )
+                messages.success(
+                    request,
+                    f"Cancelled {cancelled_count} appointment(s) and deleted {deleted_count} free time slots for {date_to_clear}.",
+                )
+            elif slots_with_appointments.exists():
                 messages.error(
                     request,
                     f"Cannot delete time slots for {date_to_clear} because some have appointments.",
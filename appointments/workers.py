@@ -0,0 +1,74 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class WaitlistWorker:
+    """
+    Background thread that offers freed slots to waitlisted patients.
+
+    Cancellations hand over the slots they freed once they commit and
+    return straight away. One thread is enough: offers are a few short
+    queries each. Slots that do not fit in the queue, or that were queued
+    by a process that has since exited, are picked up by
+    ``manage.py offer_waitlist_slots``.
+    """
+
+    QUEUE_SIZE = 100
+
+    _executor = None
+    _slots = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def _ensure_started(cls):
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="waitlist-offers"
+                )
+                cls._slots = threading.BoundedSemaphore(cls.QUEUE_SIZE)
+
+    @classmethod
+    def submit(cls, slot_ids):
+        """
+        Queue freed slots for offering without waiting for it.
+
+        Returns:
+            bool: False if the queue is full and the slots were left for
+            the offer_waitlist_slots sweep
+        """
+        slot_ids = list(slot_ids)
+        if not slot_ids:
+            return True
+        cls._ensure_started()
+        if not cls._slots.acquire(blocking=False):
+            logger.warning("Waitlist queue full; slots %s left for the sweep", slot_ids)
+            return False
+        cls._executor.submit(cls._run, slot_ids, cls._slots)
+        return True
+
+    @classmethod
+    def _run(cls, slot_ids, slots):
+        from .services import WaitlistService
+
+        try:
+            WaitlistService.offer_slots(slot_ids)
+        except Exception:
+            logger.exception("Offering slots %s to the waitlist failed", slot_ids)
+        finally:
+            close_old_connections()
+            slots.release()
+
+    @classmethod
+    def shutdown(cls, wait=True):
+        """Stop the worker, e.g. at the end of a test run."""
+        with cls._lock:
+            if cls._executor is not None:
+                cls._executor.shutdown(wait=wait)
+                cls._executor = None
+                cls._slots = None
@@ -10,8 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+from decimal import Decimal
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -53,11 +54,14 @@ INSTALLED_APPS = [
     "payments",
     "reviews",
     "notifications",
+    "analytics",
+    "ledger",
         "widget_tweaks",
 ]
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "core.middleware.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -78,6 +82,7 @@ TEMPLATES = [
             "context_processors": [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
+                "accounts.context_processors.user_snapshot",
                 "django.contrib.messages.context_processors.messages",
             ],
         },
@@ -111,6 +116,44 @@ else:
         }
     }
 
+# Read replicas
+# Comma-separated database URLs, e.g. postgres://reader@replica-1/booking_system.
+# Safe requests read from them unless the client wrote within the last
+# REPLICA_STICKY_SECONDS; see core.routers. Without any, everything uses
+# the primary.
+DATABASE_REPLICA_URLS = config("DATABASE_REPLICA_URLS", default="", cast=Csv())
+if DATABASE_REPLICA_URLS:
+    import dj_database_url
+
+    for index, url in enumerate(DATABASE_REPLICA_URLS, start=1):
+        DATABASES[f"replica_{index}"] = {
+            **dj_database_url.parse(url),
+            # Tests run against the primary's test database only
+            "TEST": {"MIRROR": "default"},
+        }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["core.routers.ReplicaRouter"]
+REPLICA_STICKY_SECONDS = config("REPLICA_STICKY_SECONDS", default=10, cast=int)
+
+# Cache
+# Rate limiting and other shared counters need a cache all workers can see;
+# point CACHE_BACKEND/CACHE_LOCATION at Redis or Memcached in production.
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": config("CACHE_LOCATION", default="booking-system"),
+    }
+}
+
+# Sessions are read on every request; serve them from the cache and fall
+# back to the database only on a miss.
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+
+# Seconds a cached accounts.services.UserSnapshot may live; saves invalidate it
+USER_SNAPSHOT_TIMEOUT = config("USER_SNAPSHOT_TIMEOUT", default=300, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -186,6 +229,60 @@ SITE_URL = config("SITE_URL", default="http://localhost:8000")
 # OTP Configuration
 OTP_EXPIRY_MINUTES = 15
 OTP_LENGTH = 6
+# (max requests, window in seconds) per user and purpose
+OTP_SEND_RATE_LIMIT = (
+    config("OTP_SEND_RATE_LIMIT", default=3, cast=int),
+    config("OTP_SEND_RATE_WINDOW", default=600, cast=int),
+)
+OTP_VERIFY_RATE_LIMIT = (
+    config("OTP_VERIFY_RATE_LIMIT", default=5, cast=int),
+    config("OTP_VERIFY_RATE_WINDOW", default=900, cast=int),
+)
+
+# Exports
+# Rows fetched per round trip when streaming CSV/JSONL exports
+EXPORT_CHUNK_SIZE = config("EXPORT_CHUNK_SIZE", default=2000, cast=int)
+
+# Payments
+# How long the response to a processed payment request is replayed for
+# retries carrying the same idempotency key
+PAYMENT_IDEMPOTENCY_TTL = config("PAYMENT_IDEMPOTENCY_TTL", default=86400, cast=int)
+# Card gateway backend; the mock simulates provider latency and failures
+PAYMENT_GATEWAY = {
+    "BACKEND": config("PAYMENT_GATEWAY_BACKEND", default="payments.gateways.MockGateway"),
+    "OPTIONS": {
+        "latency": config("PAYMENT_GATEWAY_LATENCY", default=0.5, cast=float),
+        "decline_rate": config("PAYMENT_GATEWAY_DECLINE_RATE", default=0.0, cast=float),
+        "error_rate": config("PAYMENT_GATEWAY_ERROR_RATE", default=0.0, cast=float),
+    },
+}
+PAYMENT_WEBHOOK_SECRET = config("PAYMENT_WEBHOOK_SECRET", default=SECRET_KEY)
+# Concurrent gateway calls, and card payments allowed to wait for one
+PAYMENT_CAPTURE_WORKERS = config("PAYMENT_CAPTURE_WORKERS", default=4, cast=int)
+PAYMENT_CAPTURE_QUEUE = config("PAYMENT_CAPTURE_QUEUE", default=100, cast=int)
+
+# Ledger
+# Part of each consultation fee booked as clinic revenue; the rest is owed to the doctor
+LEDGER_CLINIC_SHARE = config("LEDGER_CLINIC_SHARE", default="0.20", cast=Decimal)
+# Seconds a posting must be old before ledger_snapshot includes it; must exceed
+# the longest transaction that writes postings, or one still in flight is skipped
+LEDGER_SNAPSHOT_MARGIN = config("LEDGER_SNAPSHOT_MARGIN", default=300, cast=int)
+
+# Appointment Configuration
+# How long an unpaid PENDING reservation keeps its slot before it is released
+APPOINTMENT_HOLD_MINUTES = config("APPOINTMENT_HOLD_MINUTES", default=15, cast=int)
+# How long a slot offered to a waitlisted patient stays held for them to pay
+WAITLIST_OFFER_MINUTES = config("WAITLIST_OFFER_MINUTES", default=30, cast=int)
+# Seconds a rendered day of a doctor's agenda may stay cached; changes to the
+# day's slots, appointments or payments give it a new cache key anyway
+AGENDA_CACHE_TIMEOUT = config("AGENDA_CACHE_TIMEOUT", default=3600, cast=int)
+# Calendar feeds list appointments that ended up to this many days ago
+CALENDAR_FEED_PAST_DAYS = config("CALENDAR_FEED_PAST_DAYS", default=90, cast=int)
+# Seconds a serialised feed may stay cached; any change to the user's
+# appointments gives it a new cache key anyway
+CALENDAR_FEED_CACHE_TIMEOUT = config(
+    "CALENDAR_FEED_CACHE_TIMEOUT", default=86400, cast=int
+)
 
 # Django Allauth Configuration
 ACCOUNT_LOGIN_METHODS = {"email"}
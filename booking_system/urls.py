@@ -45,6 +45,8 @@ urlpatterns = [
     path("appointments/", include("appointments.urls")),
     path("payments/", include("payments.urls")),
     path("reviews/", include("reviews.urls")),
+    path("notifications/", include("notifications.urls")),
+    path("analytics/", include("analytics.urls")),
 ]
 
 # Serve static files during development
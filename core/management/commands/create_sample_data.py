@@ -10,6 +10,7 @@ from doctors.models import Specialty, Doctor
 from appointments.models import TimeSlot, Appointment
 from payments.models import Payment, WalletTransaction
 from reviews.models import Review
+from ledger.services import LedgerService
 
 User = get_user_model()
 
@@ -30,6 +31,7 @@ class Command(BaseCommand):
             self.create_appointments()
             self.create_payments()
             self.create_wallet_transactions()
+            LedgerService.sync_wallets(description="Sample data opening balance")
             self.create_reviews()
 
         self.stdout.write(
@@ -412,7 +414,7 @@ class Command(BaseCommand):
         # Use only slots from the future to avoid conflicts with live booking
         available_slots = TimeSlot.objects.filter(
             is_available=True,
-            appointment__isnull=True,
+            appointments__isnull=True,
             date__gte=timezone.now().date() + timedelta(days=1),  # Only future dates
         )[:20]
 
@@ -0,0 +1,59 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.exports import EXPORTS, FORMATS, ExportService
+
+
+class Command(BaseCommand):
+    help = "Stream appointments, payments or wallet transactions as CSV or JSONL"
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=sorted(EXPORTS))
+        parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+        parser.add_argument(
+            "--start",
+            type=date.fromisoformat,
+            help="First date to include (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            "--end", type=date.fromisoformat, help="Last date to include (YYYY-MM-DD)"
+        )
+        parser.add_argument(
+            "--status",
+            help="Only export rows with this status (transaction type for wallet)",
+        )
+        parser.add_argument(
+            "--output", "-o", help="File to write to; defaults to standard output"
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            help=f"Rows fetched per round trip (default {settings.EXPORT_CHUNK_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        if options["start"] and options["end"] and options["start"] > options["end"]:
+            raise CommandError("--start must not be after --end")
+
+        dataset = options["dataset"]
+        queryset = ExportService.filtered(
+            dataset,
+            start=options["start"],
+            end=options["end"],
+            status=options["status"],
+        )
+        lines = ExportService.lines(
+            dataset, queryset, options["format"], options["chunk_size"]
+        )
+
+        if options["output"]:
+            with open(options["output"], "w", newline="", encoding="utf-8") as out:
+                out.writelines(lines)
+            self.stderr.write(
+                self.style.SUCCESS(f"Exported {dataset} to {options['output']}.")
+            )
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
@@ -0,0 +1,42 @@
+from django.conf import settings
+
+from .routers import finish_request, start_request
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Decide per request whether reads may go to a read replica.
+
+    Must come before any middleware that reads the database (sessions,
+    authentication), so those reads are routed too.
+    """
+
+    COOKIE_NAME = "pin_primary"
+    SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        use_replica = (
+            request.method in self.SAFE_METHODS
+            and self.COOKIE_NAME not in request.COOKIES
+        )
+        token = start_request(use_replica)
+        try:
+            response = self.get_response(request)
+        finally:
+            state = finish_request(token)
+
+        if state.wrote and settings.DATABASE_REPLICAS:
+            # Read this client's writes from the primary until the
+            # replicas have caught up
+            response.set_cookie(
+                self.COOKIE_NAME,
+                "1",
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -0,0 +1,111 @@
+"""
+Keyset ("cursor") pagination for append-only history tables.
+
+``OFFSET`` pagination makes the database walk every skipped row, so deep
+pages of a long history get slower and slower. A keyset page instead
+starts right after the last row of the previous one, which an index on
+(created_at, id) finds directly whatever the page number.
+"""
+
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class KeysetPage:
+    """One page of rows plus the cursors of its neighbours."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset newest first on (``field``, pk) without OFFSET.
+
+    Cursors are opaque url-safe strings encoding the position of a row;
+    ``page(after=...)`` returns older rows and ``page(before=...)`` newer
+    ones. The pk breaks ties between rows sharing a timestamp.
+    """
+
+    def __init__(self, queryset, per_page, field="created_at"):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.field = field
+
+    def encode(self, obj):
+        value = f"{getattr(obj, self.field).isoformat()}|{obj.pk}"
+        return base64.urlsafe_b64encode(value.encode()).decode().rstrip("=")
+
+    def decode(self, cursor):
+        """Return the (timestamp, pk) position of ``cursor``, or None if invalid."""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            value, pk = base64.urlsafe_b64decode(padded).decode().split("|")
+            return datetime.fromisoformat(value), int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            return None
+
+    def page(self, after=None, before=None):
+        """
+        Return the page after (older than) or before (newer than) a cursor.
+
+        An unknown or malformed cursor yields the first (newest) page.
+        """
+        field = self.field
+        position = self.decode(before) if before else None
+        if position:
+            value, pk = position
+            rows = list(
+                self.queryset.filter(
+                    Q(**{f"{field}__gt": value}) | Q(**{field: value, "pk__gt": pk})
+                ).order_by(field, "pk")[: self.per_page + 1]
+            )
+            has_previous = len(rows) > self.per_page
+            rows = rows[: self.per_page][::-1]
+            has_next = True
+        else:
+            position = self.decode(after) if after else None
+            queryset = self.queryset
+            if position:
+                value, pk = position
+                queryset = queryset.filter(
+                    Q(**{f"{field}__lt": value}) | Q(**{field: value, "pk__lt": pk})
+                )
+            rows = list(queryset.order_by(f"-{field}", "-pk")[: self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            rows = rows[: self.per_page]
+            has_previous = position is not None
+
+        if not rows:
+            return KeysetPage(rows)
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode(rows[-1]) if has_next else None,
+            previous_cursor=self.encode(rows[0]) if has_previous else None,
+        )
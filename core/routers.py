@@ -0,0 +1,95 @@
+"""
+Read-replica routing with read-your-writes stickiness.
+
+Reads go to a replica only inside a request that
+``ReplicaRoutingMiddleware`` marked safe: a GET/HEAD/OPTIONS request from
+a client that has not written within the last ``REPLICA_STICKY_SECONDS``.
+Everything else reads from the primary:
+
+* unsafe requests, and the rest of any request once it has written;
+* reads inside a transaction, so ``select_for_update`` and
+  read-then-write logic see the rows they lock;
+* code outside a request (management commands, background workers);
+* reads inside ``primary_reads()``, for results cached under a key that
+  carries no version, which a lagging replica would leave stale.
+
+A replica lags behind the primary, so a client that just booked or paid
+would otherwise not see its own change on the next page. The middleware
+sets a short-lived cookie when a request writes, and requests carrying it
+stay on the primary until it expires.
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_routing = ContextVar("replica_routing", default=None)
+
+
+class RequestRouting:
+    """Routing state of the request being handled."""
+
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.wrote = False
+
+
+def start_request(use_replica):
+    """Begin routing a request; returns the token for ``finish_request``."""
+    return _routing.set(RequestRouting(use_replica))
+
+
+def finish_request(token):
+    """Stop routing the current request and return its RequestRouting."""
+    state = _routing.get()
+    _routing.reset(token)
+    return state
+
+
+@contextmanager
+def primary_reads():
+    """Send the reads of the current request to the primary inside the block."""
+    state = _routing.get()
+    if state is None or not state.use_replica:
+        yield
+        return
+    state.use_replica = False
+    try:
+        yield
+    finally:
+        # A write inside the block keeps the rest of the request on the primary
+        state.use_replica = not state.wrote
+
+
+class ReplicaRouter:
+    """Send safe reads to a replica in DATABASE_REPLICAS, everything else to default."""
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        replicas = settings.DATABASE_REPLICAS
+        if state is None or not state.use_replica or not replicas:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            # Later reads in this request must see the write
+            state.wrote = True
+            state.use_replica = False
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,17 @@
+'use strict';
+{
+    const $ = django.jQuery;
+
+    // Reload the changelist when an AutocompleteFilter selection changes.
+    $(function() {
+        $('select[data-filter-param]').on('change', function() {
+            const params = new URLSearchParams(window.location.search);
+            params.delete(this.dataset.filterParam);
+            params.delete('p');
+            if (this.value) {
+                params.set(this.dataset.filterParam, this.value);
+            }
+            window.location.search = params.toString();
+        });
+    });
+}
@@ -1,3 +1,348 @@
-from django.test import TestCase
+import csv
+import json
+from datetime import date, time, timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from appointments.models import Appointment, TimeSlot
+from doctors.models import Doctor, Specialty
+from payments.models import Payment, WalletTransaction
+from .exports import ExportService
+from .middleware import ReplicaRoutingMiddleware
+from .pagination import KeysetPaginator
+from .routers import ReplicaRouter, finish_request, primary_reads, start_request
+
+User = get_user_model()
+
+
+class ExportServiceTest(TestCase):
+    """Test cases for streaming CSV/JSONL exports."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.admin_user = User.objects.create_user(
+            username="admin",
+            email="admin@test.com",
+            password="testpass123",
+            user_type="admin",
+            is_staff=True,
+            is_superuser=True,
+        )
+        doctor_user = User.objects.create_user(
+            username="dr_smith",
+            email="dr.smith@test.com",
+            first_name="John",
+            last_name="Smith",
+            user_type="doctor",
+        )
+        self.doctor = Doctor.objects.create(
+            user=doctor_user,
+            specialty=Specialty.objects.create(
+                name="Cardiology", description="Heart specialist"
+            ),
+            license_number="LIC123456",
+            experience_years=5,
+            bio="Experienced cardiologist",
+            consultation_fee=Decimal("100.00"),
+            created_by=self.admin_user,
+        )
+        self.patient = User.objects.create_user(
+            username="patient", email="patient@test.com"
+        )
+        self.today = date.today()
+        self.appointments = []
+        for offset, status in ((0, "CONFIRMED"), (1, "CANCELLED"), (5, "CONFIRMED")):
+            slot = TimeSlot.objects.create(
+                doctor=self.doctor,
+                date=self.today + timedelta(days=offset),
+                start_time=time(9, 0),
+                end_time=time(9, 15),
+            )
+            appointment = Appointment.objects.create(
+                patient=self.patient,
+                doctor=self.doctor,
+                time_slot=slot,
+                status=status,
+                consultation_fee=Decimal("100.00"),
+            )
+            self.appointments.append(appointment)
+        Payment.objects.create(
+            appointment_id=self.appointments[0],
+            amount=Decimal("100.00"),
+            status="success",
+        )
+        WalletTransaction.objects.create(
+            user_id=self.patient,
+            transaction_type="withdraw",
+            amount=Decimal("100.00"),
+            description="Appointment payment",
+            balance_after=Decimal("0.00"),
+            appointment_id=self.appointments[0],
+        )
+
+    def test_rows_use_a_single_query(self):
+        """Test that joined columns are fetched without per-row queries."""
+        queryset = ExportService.filtered("appointments")
+
+        with self.assertNumQueries(1):
+            rows = list(ExportService.rows("appointments", queryset, chunk_size=1))
+
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0][6:9], ("John", "Smith", "Cardiology"))
+
+    def test_filters_push_down(self):
+        """Test that the date range and status filter the appointments."""
+        queryset = ExportService.filtered(
+            "appointments",
+            start=self.today,
+            end=self.today + timedelta(days=1),
+            status="CONFIRMED",
+        )
+
+        self.assertEqual(list(queryset), [self.appointments[0]])
+
+    def test_export_command_csv(self):
+        """Test the export_data command writes a CSV with a header row."""
+        out = StringIO()
+
+        call_command("export_data", "appointments", "--status", "CONFIRMED", stdout=out)
+
+        rows = list(csv.DictReader(StringIO(out.getvalue())))
+        self.assertEqual(
+            [int(row["id"]) for row in rows],
+            [self.appointments[0].id, self.appointments[2].id],
+        )
+        self.assertEqual(rows[0]["patient_email"], "patient@test.com")
+
+    def test_export_command_jsonl(self):
+        """Test the export_data command writes one JSON object per line."""
+        out = StringIO()
+
+        call_command(
+            "export_data",
+            "wallet_transactions",
+            "--format",
+            "jsonl",
+            "--start",
+            self.today.isoformat(),
+            stdout=out,
+        )
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 1)
+        record = json.loads(lines[0])
+        self.assertEqual(record["user_email"], "patient@test.com")
+        self.assertEqual(record["amount"], "100.00")
+
+    def test_admin_export_action_streams(self):
+        """Test that the admin action streams the selected payments."""
+        self.client.login(username="admin", password="testpass123")
+
+        response = self.client.post(
+            reverse("admin:payments_payment_changelist"),
+            {
+                "action": "export_csv",
+                "_selected_action": Payment.objects.values_list("pk", flat=True),
+            },
+        )
+
+        self.assertTrue(response.streaming)
+        body = b"".join(response.streaming_content).decode()
+        self.assertIn("patient@test.com", body)
+        self.assertEqual(len(body.splitlines()), 2)
+
+
+class KeysetPaginatorTest(TestCase):
+    """Test cases for KeysetPaginator."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username="owner", email="owner@test.com")
+        moment = timezone.now()
+        self.transactions = []
+        # Pairs of rows share a timestamp so the id has to break the tie
+        for index in range(5):
+            transaction = WalletTransaction.objects.create(
+                user_id=self.user,
+                transaction_type="deposit",
+                amount=Decimal("10.00"),
+                description=f"deposit {index}",
+                balance_after=Decimal("10.00") * (index + 1),
+            )
+            WalletTransaction.objects.filter(pk=transaction.pk).update(
+                created_at=moment + timedelta(minutes=index // 2)
+            )
+            self.transactions.append(transaction)
+        self.newest_first = [t.pk for t in reversed(self.transactions)]
+        self.paginator = KeysetPaginator(
+            WalletTransaction.objects.filter(user_id=self.user), per_page=2
+        )
+
+    def test_walks_forward_and_back(self):
+        """Test that following the cursors visits every row exactly once."""
+        first = self.paginator.page()
+        second = self.paginator.page(after=first.next_cursor)
+        third = self.paginator.page(after=second.next_cursor)
+
+        self.assertEqual(
+            [t.pk for page in (first, second, third) for t in page],
+            self.newest_first,
+        )
+        self.assertFalse(first.has_previous)
+        self.assertFalse(third.has_next)
+
+        back = self.paginator.page(before=second.previous_cursor)
+        self.assertEqual([t.pk for t in back], [t.pk for t in first])
+        self.assertFalse(back.has_previous)
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Test that a tampered cursor falls back to the newest rows."""
+        page = self.paginator.page(after="not-a-cursor")
+
+        self.assertEqual([t.pk for t in page], self.newest_first[:2])
+
+
+@override_settings(DATABASE_REPLICAS=["replica_1"], REPLICA_STICKY_SECONDS=10)
+class ReplicaRouterTest(SimpleTestCase):
+    """Test cases for routing reads to replicas with read-your-writes."""
+
+    databases = {"default"}
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def test_reads_go_to_the_replica_until_the_request_writes(self):
+        """Test that only reads of a safe request outside a transaction move."""
+        self.assertEqual(self.router.db_for_read(User), "default")
+
+        token = start_request(use_replica=True)
+        try:
+            self.assertEqual(self.router.db_for_read(User), "replica_1")
+            with transaction.atomic():
+                self.assertEqual(self.router.db_for_read(User), "default")
+            self.assertEqual(self.router.db_for_write(User), "default")
+            self.assertEqual(self.router.db_for_read(User), "default")
+        finally:
+            state = finish_request(token)
+        self.assertTrue(state.wrote)
+        self.assertFalse(self.router.allow_migrate("replica_1", "accounts"))
+
+    def test_primary_reads_block(self):
+        """Test that reads inside primary_reads() skip the replica."""
+        token = start_request(use_replica=True)
+        try:
+            with primary_reads():
+                self.assertEqual(self.router.db_for_read(User), "default")
+            self.assertEqual(self.router.db_for_read(User), "replica_1")
+            with primary_reads():
+                self.router.db_for_write(User)
+            self.assertEqual(self.router.db_for_read(User), "default")
+        finally:
+            finish_request(token)
+
+    def route(self, request, write=False):
+        """Run ``request`` through the middleware; returns (response, read alias)."""
+        reads = []
+
+        def view(request):
+            reads.append(self.router.db_for_read(User))
+            if write:
+                self.router.db_for_write(User)
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        return response, reads[0]
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        """Test that a write keeps the client's next requests on the primary."""
+        response, alias = self.route(self.factory.get("/"))
+        self.assertEqual(alias, "replica_1")
+        self.assertNotIn(ReplicaRoutingMiddleware.COOKIE_NAME, response.cookies)
+
+        response, alias = self.route(self.factory.post("/"), write=True)
+        self.assertEqual(alias, "default")
+        cookie = response.cookies[ReplicaRoutingMiddleware.COOKIE_NAME]
+        self.assertEqual(cookie["max-age"], 10)
+
+        request = self.factory.get("/")
+        request.COOKIES[ReplicaRoutingMiddleware.COOKIE_NAME] = cookie.value
+        _response, alias = self.route(request)
+        self.assertEqual(alias, "default")
+
+
+class ReplicaReadTest(TransactionTestCase):
+    """
+    Test cases for pages reading from a replica.
+
+    A TransactionTestCase: inside TestCase's transaction every read stays on
+    the primary, as it would in any transaction. Without
+    DATABASE_REPLICA_URLS, a second connection to the test database stands
+    in for the replica.
+    """
+
+    databases = {"default", *settings.DATABASE_REPLICAS}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        if "replica_1" not in connections:
+            primary = connections["default"].settings_dict
+            connections.settings["replica_1"] = {
+                **primary,
+                "TEST": {**primary["TEST"], "MIRROR": "default"},
+            }
+            cls.addClassCleanup(cls._remove_replica)
+            cls.enterClassContext(override_settings(DATABASE_REPLICAS=["replica_1"]))
+            cls.databases = cls.databases | {"replica_1"}
+
+    @classmethod
+    def _remove_replica(cls):
+        connections["replica_1"].close()
+        del connections["replica_1"]
+        del connections.settings["replica_1"]
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="patient", email="patient@test.com", password="testpass123"
+        )
+        self.client.login(username="patient", password="testpass123")
+
+    def test_pages_read_from_the_replica_until_the_client_writes(self):
+        """Test that a write sends the client's next page to the primary."""
+        with CaptureQueriesContext(connections["replica_1"]) as replica:
+            self.client.get(reverse("doctors:doctor_list"))
+        self.assertTrue(replica.captured_queries)
+
+        # Creating a calendar link writes
+        response = self.client.post(reverse("accounts:profile"))
+        self.assertIn(ReplicaRoutingMiddleware.COOKIE_NAME, response.cookies)
+
+        with CaptureQueriesContext(connections["replica_1"]) as replica:
+            response = self.client.get(reverse("accounts:profile"))
+        self.assertEqual(replica.captured_queries, [])
+        self.assertContains(response, "Reset link")
+
+    def test_cached_snapshot_is_read_from_the_primary(self):
+        """Test that the version-less user snapshot never comes from a replica."""
+        from accounts.services import UserSnapshotService
+
+        cache.clear()
+        token = start_request(use_replica=True)
+        try:
+            with CaptureQueriesContext(connections["replica_1"]) as replica:
+                self.assertEqual(UserSnapshotService.get(self.user.pk).id, self.user.pk)
+        finally:
+            finish_request(token)
+        self.assertEqual(replica.captured_queries, [])
@@ -1,9 +1,15 @@
+import csv
+import io
+
 from django.contrib import admin
 from django.core.exceptions import PermissionDenied, ValidationError
 from django.contrib import messages
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 from .models import Doctor, Specialty
-from .forms import DoctorCreationForm
-from .services import DoctorService
+from .forms import DoctorCreationForm, DoctorImportForm
+from .services import DoctorService, SpecialtyService
 
 
 @admin.register(Doctor)
@@ -109,6 +115,48 @@ class DoctorAdmin(admin.ModelAdmin):
             .select_related("user", "specialty", "created_by")
         )
 
+    def get_urls(self):
+        """Add the CSV import view."""
+        return [
+            path(
+                "import-csv/",
+                self.admin_site.admin_view(self.import_csv_view),
+                name="doctors_doctor_import_csv",
+            ),
+        ] + super().get_urls()
+
+    def import_csv_view(self, request):
+        """Bulk import doctors from an uploaded CSV file."""
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+
+        form = DoctorImportForm(request.POST or None, request.FILES or None)
+        result = None
+        if request.method == "POST" and form.is_valid():
+            upload = io.TextIOWrapper(
+                form.cleaned_data["csv_file"], encoding="utf-8-sig"
+            )
+            result = DoctorService.import_doctors(
+                csv.DictReader(upload),
+                request.user,
+                dry_run=form.cleaned_data["dry_run"],
+            )
+            if result["created"] and not form.cleaned_data["dry_run"]:
+                messages.success(request, f"Imported {result['created']} doctor(s).")
+                if not result["errors"]:
+                    return redirect("admin:doctors_doctor_changelist")
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Import doctors from CSV",
+            "form": form,
+            "result": result,
+        }
+        return TemplateResponse(
+            request, "admin/doctors/doctor/import_csv.html", context
+        )
+
 
 @admin.register(Specialty)
 class SpecialtyAdmin(admin.ModelAdmin):
@@ -145,51 +193,53 @@ class SpecialtyAdmin(admin.ModelAdmin):
 
     def doctor_count(self, obj):
         """Display the number of doctors in this specialty."""
-        if obj.pk:
-            return obj.doctor_set.count()
-        return 0
+        if not obj.pk:
+            return 0
+        # Annotated by get_queryset; fall back for instances loaded elsewhere
+        count = getattr(obj, "doctor_count", None)
+        return obj.doctor_set.count() if count is None else count
 
     doctor_count.short_description = "Number of Doctors"
-    doctor_count.admin_order_field = "doctor_set__count"
+    doctor_count.admin_order_field = "doctor_count"
 
     def get_queryset(self, request):
         """Optimize queryset with annotations."""
-        from django.db.models import Count
+        return SpecialtyService.with_doctor_count(super().get_queryset(request))
 
-        return super().get_queryset(request).annotate(doctor_count=Count("doctor"))
+    def changelist_view(self, request, extra_context=None):
+        """Add the per-specialty statistics panel."""
+        extra_context = {
+            **(extra_context or {}),
+            "specialty_stats": SpecialtyService.statistics().order_by("name"),
+        }
+        return super().changelist_view(request, extra_context)
 
     def has_delete_permission(self, request, obj=None):
         """Prevent deletion if specialty has doctors."""
-        if obj and obj.doctor_set.exists():
+        if obj and self.doctor_count(obj):
             return False
         return super().has_delete_permission(request, obj)
 
     def delete_model(self, request, obj):
         """Custom delete with validation."""
-        if obj.doctor_set.exists():
-            from django.contrib import messages
-
+        doctor_count = self.doctor_count(obj)
+        if doctor_count:
             messages.error(
                 request,
-                f"Cannot delete '{obj.name}' because it has {obj.doctor_set.count()} doctor(s) assigned to it.",
+                f"Cannot delete '{obj.name}' because it has {doctor_count} doctor(s) assigned to it.",
             )
             return
         super().delete_model(request, obj)
 
     def delete_queryset(self, request, queryset):
         """Custom bulk delete with validation."""
-        from django.contrib import messages
-
-        deleted_count = 0
-        for obj in queryset:
-            if not obj.doctor_set.exists():
-                obj.delete()
-                deleted_count += 1
-            else:
-                messages.warning(
-                    request,
-                    f"Cannot delete '{obj.name}' because it has {obj.doctor_set.count()} doctor(s) assigned to it.",
-                )
+        deleted_count, blocked = SpecialtyService.delete_unassigned(queryset)
+
+        for name, doctor_count in blocked:
+            messages.warning(
+                request,
+                f"Cannot delete '{name}' because it has {doctor_count} doctor(s) assigned to it.",
+            )
 
         if deleted_count > 0:
             messages.success(
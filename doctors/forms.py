@@ -1,3 +1,5 @@
+import re
+
 from django import forms
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
@@ -7,6 +9,14 @@ from .services import DoctorService
 User = get_user_model()
 
 
+def validate_phone_number(phone_number):
+    """Require at least 10 digits, ignoring spaces and punctuation."""
+    # Basic phone number validation - you can enhance this based on your requirements
+    digits_only = re.sub(r"\D", "", phone_number)
+    if len(digits_only) < 10:
+        raise ValidationError("Phone number must contain at least 10 digits.")
+
+
 class DoctorCreationForm(forms.ModelForm):
     """Custom form for creating doctors with user account creation."""
 
@@ -119,13 +129,7 @@ class DoctorCreationForm(forms.ModelForm):
     def clean_phone_number(self):
         phone_number = self.cleaned_data.get("phone_number")
         if phone_number:
-            # Basic phone number validation - you can enhance this based on your requirements
-            import re
-
-            # Remove all non-digit characters for validation
-            digits_only = re.sub(r"\D", "", phone_number)
-            if len(digits_only) < 10:
-                raise ValidationError("Phone number must contain at least 10 digits.")
+            validate_phone_number(phone_number)
         return phone_number
 
     def clean_wallet_balance(self):
@@ -200,6 +204,47 @@ class DoctorCreationForm(forms.ModelForm):
             return DoctorService.update_doctor(doctor, user_data, doctor_data)
 
 
+class DoctorImportRowForm(forms.Form):
+    """
+    Field-level validation of one row of a doctor CSV import.
+
+    Runs no queries: specialty names and uniqueness of email, username and
+    license number are checked set-wise by DoctorService.import_doctors.
+    """
+
+    first_name = forms.CharField(max_length=150)
+    last_name = forms.CharField(max_length=150)
+    email = forms.EmailField()
+    username = forms.CharField(max_length=150, required=False)
+    phone_number = forms.CharField(max_length=20, validators=[validate_phone_number])
+    specialty = forms.CharField(max_length=255)
+    license_number = forms.CharField(max_length=255)
+    experience_years = forms.IntegerField(min_value=0)
+    bio = forms.CharField()
+    consultation_fee = forms.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    wallet_balance = forms.DecimalField(
+        max_digits=10, decimal_places=2, min_value=0, required=False
+    )
+
+    def clean_username(self):
+        # Same convention as self-registration: the email doubles as username
+        return self.cleaned_data.get("username") or self.cleaned_data.get("email")
+
+
+class DoctorImportForm(forms.Form):
+    """Upload form for the doctor CSV import in the admin."""
+
+    csv_file = forms.FileField(
+        label="CSV file",
+        help_text="Columns: first_name, last_name, email, username (optional), "
+        "phone_number, specialty, license_number, experience_years, bio, "
+        "consultation_fee, wallet_balance (optional)",
+    )
+    dry_run = forms.BooleanField(
+        required=False, help_text="Validate the file without creating anything"
+    )
+
+
 class SpecialtyForm(forms.ModelForm):
     """Form for creating and updating specialties."""
 
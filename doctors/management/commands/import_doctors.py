@@ -0,0 +1,60 @@
+import csv
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from doctors.services import DoctorService
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Bulk import doctors from a CSV file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_file", help="Path to the CSV file")
+        parser.add_argument(
+            "--created-by",
+            required=True,
+            help="Username of the admin recorded as creator of the doctors",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DoctorService.IMPORT_BATCH_SIZE,
+            help="Rows validated and inserted per chunk",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Validate the file without creating anything",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            created_by = User.objects.get(username=options["created_by"])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['created_by']}' does not exist.")
+
+        try:
+            with open(options["csv_file"], newline="", encoding="utf-8-sig") as f:
+                result = DoctorService.import_doctors(
+                    csv.DictReader(f),
+                    created_by,
+                    batch_size=options["batch_size"],
+                    dry_run=options["dry_run"],
+                )
+        except (OSError, ValidationError) as e:
+            raise CommandError(str(e))
+
+        for line, message in result["errors"]:
+            self.stderr.write(f"Line {line}: {message}")
+
+        verb = "Validated" if options["dry_run"] else "Imported"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {result['created']} doctor(s); "
+                f"{len(result['errors'])} row(s) rejected."
+            )
+        )
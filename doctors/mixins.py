@@ -2,19 +2,21 @@ from django.contrib.auth.mixins import UserPassesTestMixin
 from django.contrib import messages
 from django.shortcuts import redirect
 
+from accounts.services import UserSnapshotService
+
 
 def is_admin_user(user):
     """Check if user is admin or superuser."""
-    return user.is_authenticated and (
-        user.is_superuser or getattr(user, "user_type", None) == "admin"
-    )
+    snapshot = UserSnapshotService.for_user(user)
+    return snapshot is not None and snapshot.is_admin
 
 
 class AdminRequiredMixin(UserPassesTestMixin):
     """Mixin to require admin or superuser permissions."""
 
     def test_func(self):
-        return is_admin_user(self.request.user)
+        snapshot = UserSnapshotService.for_request(self.request)
+        return snapshot is not None and snapshot.is_admin
 
     def handle_no_permission(self):
         messages.error(self.request, "You do not have permission to access this page.")
@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 
+from appointments.models import Appointment, CalendarFeed
+
 # Create your models here.
 User = get_user_model()
 
@@ -46,7 +48,22 @@ class Specialty(models.Model):
         self.description = self.description.strip() if self.description else ""
 
         self.clean()
+        update_fields = kwargs.get("update_fields")
+        previous = None
+        if not self._state.adding and (
+            update_fields is None or "name" in update_fields
+        ):
+            previous = (
+                Specialty.objects.filter(pk=self.pk)
+                .values_list("name", flat=True)
+                .first()
+            )
         super().save(*args, **kwargs)
+        if previous is not None and previous != self.name:
+            # Calendar feeds list the specialty of every appointment
+            CalendarFeed.touch_listing(
+                Appointment.objects.filter(doctor__specialty=self.pk)
+            )
 
     class Meta:
         verbose_name = "Specialty"
@@ -103,7 +120,27 @@ class Doctor(models.Model):
     def save(self, *args, **kwargs):
         """Override save to run validation."""
         self.clean()
+        update_fields = kwargs.get("update_fields")
+        previous = None
+        if not self._state.adding and (
+            update_fields is None or "specialty" in update_fields
+        ):
+            previous = (
+                Doctor.objects.filter(pk=self.pk)
+                .values_list("specialty_id", flat=True)
+                .first()
+            )
         super().save(*args, **kwargs)
+        # The user's cached snapshot carries their doctor id
+        User.invalidate_snapshot(self.user_id)
+        if previous is not None and previous != self.specialty_id:
+            CalendarFeed.touch_listing(Appointment.objects.filter(doctor=self.pk))
+
+    def delete(self, *args, **kwargs):
+        user_id = self.user_id
+        result = super().delete(*args, **kwargs)
+        User.invalidate_snapshot(user_id)
+        return result
 
     @classmethod
     def create_doctor(cls, user_data, doctor_data, created_by):
@@ -3,9 +3,15 @@ Service layer for doctor-related business logic.
 This separates business logic from views, forms, and models.
 """
 
+from itertools import islice
+
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
-from .models import Doctor
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Avg, Count, Q
+from ledger.services import LedgerService
+from .models import Doctor, Specialty
 
 User = get_user_model()
 
@@ -13,6 +19,8 @@ User = get_user_model()
 class DoctorService:
     """Service class for doctor-related operations."""
 
+    IMPORT_BATCH_SIZE = 500
+
     @staticmethod
     def validate_admin_permissions(user):
         """
@@ -57,7 +65,14 @@ class DoctorService:
         DoctorService.validate_admin_permissions(created_by)
 
         # Use the model's class method for creation
-        return Doctor.create_doctor(user_data, doctor_data, created_by)
+        with transaction.atomic():
+            doctor = Doctor.create_doctor(user_data, doctor_data, created_by)
+            # An opening wallet balance is booked in the ledger
+            LedgerService.sync_wallets(
+                User.objects.filter(pk=doctor.user_id),
+                description=f"Opening balance set by {created_by}",
+            )
+        return doctor
 
     @staticmethod
     def update_doctor(doctor, user_data, doctor_data):
@@ -82,6 +97,10 @@ class DoctorService:
         user.wallet_balance = user_data["wallet_balance"]
         user.user_type = "doctor"
         user.save()
+        LedgerService.sync_wallets(
+            User.objects.filter(pk=user.pk),
+            description="Balance set on the doctor form",
+        )
 
         # Update doctor profile
         for field, value in doctor_data.items():
@@ -106,3 +125,210 @@ class DoctorService:
             return True
         except ValidationError:
             return False
+
+    @staticmethod
+    def import_doctors(rows, created_by, batch_size=None, dry_run=False):
+        """
+        Create doctors in bulk from CSV rows.
+
+        Rows are validated in chunks: field checks per row, then one query
+        each for taken license numbers, emails and usernames in the chunk.
+        Valid rows of a chunk are written with two ``bulk_create`` calls
+        (users, then doctors); invalid rows are skipped and reported. The
+        whole import runs in one transaction.
+
+        Imported accounts get an unusable password, so doctors set their
+        own through the password reset flow.
+
+        Args:
+            rows: Iterable of dicts, e.g. a ``csv.DictReader``
+            created_by: The admin user running the import
+            batch_size: Rows validated and inserted per chunk
+            dry_run: Validate only; nothing is written
+
+        Returns:
+            dict: ``created`` count and ``errors`` as (line number, message)
+
+        Raises:
+            ValidationError: If created_by lacks admin permissions
+        """
+        from .forms import DoctorImportRowForm
+
+        DoctorService.validate_admin_permissions(created_by)
+        batch_size = batch_size or DoctorService.IMPORT_BATCH_SIZE
+
+        specialties = {
+            name.lower(): pk for pk, name in Specialty.objects.values_list("pk", "name")
+        }
+        seen_licenses, seen_emails, seen_usernames = set(), set(), set()
+        created, errors = 0, []
+        # Line 1 of the file is the header
+        numbered = enumerate(rows, start=2)
+
+        with transaction.atomic():
+            while chunk := list(islice(numbered, batch_size)):
+                valid = []
+                for line, row in chunk:
+                    form = DoctorImportRowForm(row)
+                    if not form.is_valid():
+                        errors.append((line, DoctorService._format_errors(form)))
+                        continue
+                    data = form.cleaned_data
+                    specialty_id = specialties.get(data["specialty"].strip().lower())
+                    if specialty_id is None:
+                        errors.append(
+                            (
+                                line,
+                                f"specialty: Unknown specialty '{data['specialty']}'.",
+                            )
+                        )
+                        continue
+                    valid.append((line, data, specialty_id))
+
+                taken_licenses = set(
+                    Doctor.objects.filter(
+                        license_number__in=[d["license_number"] for _l, d, _s in valid]
+                    ).values_list("license_number", flat=True)
+                )
+                taken_emails = set(
+                    User.objects.filter(
+                        email__in=[d["email"] for _l, d, _s in valid]
+                    ).values_list("email", flat=True)
+                )
+                taken_usernames = set(
+                    User.objects.filter(
+                        username__in=[d["username"] for _l, d, _s in valid]
+                    ).values_list("username", flat=True)
+                )
+
+                users, doctors = [], []
+                for line, data, specialty_id in valid:
+                    problems = []
+                    if (
+                        data["license_number"] in taken_licenses
+                        or data["license_number"] in seen_licenses
+                    ):
+                        problems.append(
+                            "license_number: A doctor with this license number "
+                            "already exists."
+                        )
+                    if data["email"] in taken_emails or data["email"] in seen_emails:
+                        problems.append("email: A user with this email already exists.")
+                    if (
+                        data["username"] in taken_usernames
+                        or data["username"] in seen_usernames
+                    ):
+                        problems.append(
+                            "username: A user with this username already exists."
+                        )
+                    if problems:
+                        errors.append((line, " ".join(problems)))
+                        continue
+
+                    seen_licenses.add(data["license_number"])
+                    seen_emails.add(data["email"])
+                    seen_usernames.add(data["username"])
+                    users.append(
+                        User(
+                            username=data["username"],
+                            email=data["email"],
+                            first_name=data["first_name"],
+                            last_name=data["last_name"],
+                            phone_number=data["phone_number"],
+                            wallet_balance=data["wallet_balance"] or 0,
+                            user_type="doctor",
+                            is_staff=True,
+                            password=make_password(None),
+                        )
+                    )
+                    doctors.append(
+                        Doctor(
+                            specialty_id=specialty_id,
+                            license_number=data["license_number"],
+                            experience_years=data["experience_years"],
+                            bio=data["bio"],
+                            consultation_fee=data["consultation_fee"],
+                            created_by=created_by,
+                        )
+                    )
+
+                if users and not dry_run:
+                    User.objects.bulk_create(users)
+                    for user, doctor in zip(users, doctors):
+                        doctor.user = user
+                    Doctor.objects.bulk_create(doctors)
+                    funded = [user.pk for user in users if user.wallet_balance]
+                    if funded:
+                        LedgerService.sync_wallets(
+                            User.objects.filter(pk__in=funded),
+                            description="Opening balance from doctor import",
+                        )
+                created += len(users)
+
+        return {"created": created, "errors": errors}
+
+    @staticmethod
+    def _format_errors(form):
+        return " ".join(
+            f"{field}: {message}"
+            for field, messages in form.errors.items()
+            for message in messages
+        )
+
+
+class SpecialtyService:
+    """Service class for specialty-related operations."""
+
+    @staticmethod
+    def with_doctor_count(queryset=None):
+        """Annotate ``doctor_count`` on a specialty queryset."""
+        if queryset is None:
+            queryset = Specialty.objects.all()
+        if "doctor_count" in queryset.query.annotations:
+            return queryset
+        return queryset.annotate(doctor_count=Count("doctor"))
+
+    @staticmethod
+    def statistics(queryset=None):
+        """
+        Per-specialty doctor statistics, computed in a single grouped query.
+
+        Returns:
+            QuerySet: Specialties annotated with doctor_count,
+            active_doctor_count, average_fee and average_rating
+        """
+        return SpecialtyService.with_doctor_count(queryset).annotate(
+            active_doctor_count=Count("doctor", filter=Q(doctor__is_active=True)),
+            average_fee=Avg("doctor__consultation_fee"),
+            average_rating=Avg("doctor__average_rating"),
+        )
+
+    @staticmethod
+    def delete_unassigned(queryset):
+        """
+        Delete the specialties in ``queryset`` that have no doctors.
+
+        One grouped query finds which specialties still have doctors; the rest
+        go in a single bulk delete.
+
+        Returns:
+            tuple: (number deleted, list of (name, doctor_count) kept)
+        """
+        counts = SpecialtyService.with_doctor_count(queryset.order_by()).values_list(
+            "pk", "name", "doctor_count"
+        )
+        deletable, blocked = [], []
+        for pk, name, doctor_count in counts:
+            if doctor_count:
+                blocked.append((name, doctor_count))
+            else:
+                deletable.append(pk)
+
+        deleted = 0
+        if deletable:
+            deleted = (
+                Specialty.objects.filter(pk__in=deletable)
+                .delete()[1]
+                .get(Specialty._meta.label, 0)
+            )
+        return deleted, blocked
@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from django.test import TestCase, RequestFactory
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
@@ -387,6 +389,138 @@ class DoctorAdminTest(TestCase):
         self.assertFalse(self.doctor_admin.has_add_permission(request))
 
 
+class DoctorImportTest(TestCase):
+    """Test cases for the bulk doctor CSV import."""
+
+    HEADER = (
+        "first_name,last_name,email,username,phone_number,specialty,"
+        "license_number,experience_years,bio,consultation_fee,wallet_balance\n"
+    )
+
+    def setUp(self):
+        """Set up test data."""
+        self.specialty = Specialty.objects.create(
+            name="Cardiology", description="Heart specialist"
+        )
+        self.admin_user = User.objects.create_user(
+            username="admin",
+            email="admin@test.com",
+            password="testpass123",
+            user_type="admin",
+            is_staff=True,
+            is_superuser=True,
+        )
+        existing = User.objects.create_user(
+            username="existing", email="existing@test.com", user_type="doctor"
+        )
+        Doctor.objects.create(
+            user=existing,
+            specialty=self.specialty,
+            license_number="LIC-TAKEN",
+            experience_years=3,
+            bio="Existing doctor",
+            consultation_fee=Decimal("80.00"),
+            created_by=self.admin_user,
+        )
+
+    def row(self, n, **overrides):
+        values = {
+            "first_name": "Doc",
+            "last_name": f"Number{n}",
+            "email": f"doc{n}@test.com",
+            "username": "",
+            "phone_number": "+1 555 000 0000",
+            "specialty": "cardiology",
+            "license_number": f"LIC-{n}",
+            "experience_years": "4",
+            "bio": "Imported",
+            "consultation_fee": "120.00",
+            "wallet_balance": "",
+        }
+        values.update(overrides)
+        return ",".join(values.values()) + "\n"
+
+    def import_csv(self, body, **kwargs):
+        import csv
+        import io
+
+        return DoctorService.import_doctors(
+            csv.DictReader(io.StringIO(self.HEADER + body)), self.admin_user, **kwargs
+        )
+
+    def test_import_creates_doctors_and_reports_bad_rows(self):
+        """Test that valid rows are imported and invalid rows reported by line."""
+        body = (
+            self.row(1)
+            + self.row(2, license_number="LIC-TAKEN")
+            + self.row(3, specialty="Astrology")
+            + self.row(4, email="doc1@test.com")
+            + self.row(5, phone_number="123")
+            + self.row(6)
+        )
+
+        result = self.import_csv(body, batch_size=2)
+
+        self.assertEqual(result["created"], 2)
+        self.assertEqual([line for line, _msg in result["errors"]], [3, 4, 5, 6])
+        self.assertIn("license_number", result["errors"][0][1])
+        self.assertIn("Unknown specialty", result["errors"][1][1])
+        doctor = Doctor.objects.select_related("user").get(license_number="LIC-1")
+        self.assertEqual(doctor.user.username, "doc1@test.com")
+        self.assertEqual(doctor.user.user_type, "doctor")
+        self.assertEqual(doctor.specialty, self.specialty)
+        self.assertFalse(doctor.user.has_usable_password())
+
+    def test_import_queries_do_not_grow_with_rows(self):
+        """Test that a chunk costs the same number of queries whatever its size."""
+        with self.assertNumQueries(8):
+            self.import_csv(self.row(1))
+        with self.assertNumQueries(8):
+            self.import_csv("".join(self.row(n) for n in range(10, 60)))
+
+        self.assertEqual(Doctor.objects.count(), 52)
+
+    def test_dry_run_writes_nothing(self):
+        """Test that a dry run only validates."""
+        result = self.import_csv(self.row(1), dry_run=True)
+
+        self.assertEqual(result, {"created": 1, "errors": []})
+        self.assertFalse(Doctor.objects.filter(license_number="LIC-1").exists())
+
+    def test_import_doctors_command(self):
+        """Test the import_doctors management command."""
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write(self.HEADER + self.row(1) + self.row(2, license_number="LIC-TAKEN"))
+
+        out, err = StringIO(), StringIO()
+        call_command(
+            "import_doctors", f.name, "--created-by", "admin", stdout=out, stderr=err
+        )
+
+        self.assertIn("Imported 1 doctor(s); 1 row(s) rejected.", out.getvalue())
+        self.assertIn("Line 3:", err.getvalue())
+
+    def test_admin_upload(self):
+        """Test the CSV upload view in the admin."""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        self.client.login(username="admin", password="testpass123")
+        upload = SimpleUploadedFile(
+            "doctors.csv", (self.HEADER + self.row(1)).encode(), "text/csv"
+        )
+
+        response = self.client.post(
+            reverse("admin:doctors_doctor_import_csv"), {"csv_file": upload}
+        )
+
+        self.assertRedirects(response, reverse("admin:doctors_doctor_changelist"))
+        self.assertTrue(Doctor.objects.filter(license_number="LIC-1").exists())
+
+
 class IntegrationTest(TestCase):
     """Integration tests for the complete doctor creation flow."""
 
@@ -677,6 +811,64 @@ class SpecialtyAdminTest(TestCase):
             self.specialty_admin.has_delete_permission(request, self.neurology)
         )
 
+    def test_delete_unassigned_bulk(self):
+        """Test that bulk delete skips specialties with doctors in fixed queries."""
+        from .services import SpecialtyService
+
+        doctor_user = User.objects.create_user(
+            username="dr_smith", email="dr.smith@test.com", user_type="doctor"
+        )
+        Doctor.objects.create(
+            user=doctor_user,
+            specialty=self.cardiology,
+            license_number="LIC123",
+            experience_years=5,
+            bio="Test bio",
+            consultation_fee=100.00,
+            created_by=self.admin_user,
+        )
+        Specialty.objects.create(name="Dermatology", description="Skin disorders")
+        request = self.factory.get("/admin/doctors/specialty/")
+        request.user = self.admin_user
+        queryset = self.specialty_admin.get_queryset(request)
+
+        with self.assertNumQueries(4):
+            deleted, blocked = SpecialtyService.delete_unassigned(queryset)
+
+        self.assertEqual(deleted, 2)
+        self.assertEqual(blocked, [("Cardiology", 1)])
+        self.assertEqual(
+            list(Specialty.objects.values_list("name", flat=True)), ["Cardiology"]
+        )
+
+    def test_statistics_single_query(self):
+        """Test that per-specialty statistics come from one aggregate query."""
+        from .services import SpecialtyService
+
+        for n, (fee, active) in enumerate([(100, True), (200, False)]):
+            user = User.objects.create_user(
+                username=f"dr{n}", email=f"dr{n}@test.com", user_type="doctor"
+            )
+            Doctor.objects.create(
+                user=user,
+                specialty=self.cardiology,
+                license_number=f"LIC{n}",
+                experience_years=5,
+                bio="Test bio",
+                consultation_fee=fee,
+                is_active=active,
+                created_by=self.admin_user,
+            )
+
+        with self.assertNumQueries(1):
+            stats = {s.name: s for s in SpecialtyService.statistics()}
+
+        self.assertEqual(stats["Cardiology"].doctor_count, 2)
+        self.assertEqual(stats["Cardiology"].active_doctor_count, 1)
+        self.assertEqual(stats["Cardiology"].average_fee, 150)
+        self.assertEqual(stats["Neurology"].doctor_count, 0)
+        self.assertIsNone(stats["Neurology"].average_fee)
+
 
 class SpecialtyIntegrationTest(TestCase):
     """Integration tests for specialty operations."""
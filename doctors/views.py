@@ -18,6 +18,7 @@ from django.urls import reverse_lazy, reverse
 from .models import Specialty, Doctor
 from .forms import SpecialtyForm, DoctorCreationForm
 from .mixins import AdminRequiredMixin, is_admin_user
+from .services import SpecialtyService
 
 
 class SpecialtyListView(ListView):
@@ -29,7 +30,7 @@ class SpecialtyListView(ListView):
     ordering = ["name"]
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = SpecialtyService.with_doctor_count(super().get_queryset())
         search_query = self.request.GET.get("search", "")
 
         if search_query:
@@ -42,7 +43,7 @@ class SpecialtyListView(ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["search_query"] = self.request.GET.get("search", "")
-        context["total_specialties"] = self.get_queryset().count()
+        context["total_specialties"] = context["paginator"].count
         return context
 
 
@@ -126,20 +127,31 @@ class SpecialtyDeleteView(LoginRequiredMixin, AdminRequiredMixin, DeleteView):
     pk_url_kwarg = "specialty_id"
     success_url = reverse_lazy("doctors:specialty_list")
 
-    def delete(self, request, *args, **kwargs):
-        specialty = self.get_object()
-        doctor_count = specialty.doctor_set.count()
+    def get_queryset(self):
+        return SpecialtyService.with_doctor_count()
 
-        if doctor_count > 0:
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if self.object.doctor_count:
+            context["assigned_doctors"] = self.object.doctor_set.select_related("user")
+        return context
+
+    def form_valid(self, form):
+        # DeleteView routes POST through form_valid(); delete() only sees DELETE
+        specialty = self.object
+
+        if specialty.doctor_count > 0:
             messages.error(
-                request,
-                f'Cannot delete "{specialty.name}" because it has {doctor_count} doctor(s) assigned to it.',
+                self.request,
+                f'Cannot delete "{specialty.name}" because it has {specialty.doctor_count} doctor(s) assigned to it.',
             )
             return redirect("doctors:specialty_detail", specialty_id=specialty.id)
 
         specialty_name = specialty.name
-        response = super().delete(request, *args, **kwargs)
-        messages.success(request, f'Specialty "{specialty_name}" deleted successfully!')
+        response = super().form_valid(form)
+        messages.success(
+            self.request, f'Specialty "{specialty_name}" deleted successfully!'
+        )
         return response
 
 
@@ -217,28 +229,25 @@ class DoctorDetailView(DetailView):
         from datetime import date
 
         # Get one slot per day for the next 6 days
-        from django.db.models import Min
-        from datetime import timedelta
+        from datetime import time, timedelta
 
         start_date = date.today()
         end_date = start_date + timedelta(days=6)
 
-        # Get the earliest available slot for each day
-        daily_slots = []
-        for i in range(6):
-            current_date = start_date + timedelta(days=i)
-            earliest_slot = (
-                TimeSlot.objects.filter(
-                    doctor=doctor, is_available=True, date=current_date
-                )
-                .order_by("start_time")
-                .first()
+        # Get the earliest available slot for each day, in a single query
+        daily_slots = {}
+        for slot in (
+            TimeSlot.objects.available()
+            .upcoming()
+            .filter(
+                doctor=doctor,
+                start_at__lt=TimeSlot.local_datetime(end_date, time.min),
             )
+            .order_by("start_at")
+        ):
+            daily_slots.setdefault(slot.date, slot)
 
-            if earliest_slot:
-                daily_slots.append(earliest_slot)
-
-        available_slots = daily_slots
+        available_slots = list(daily_slots.values())
 
         context["available_slots"] = available_slots
 
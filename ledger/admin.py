@@ -0,0 +1,52 @@
+from django.contrib import admin
+
+from .models import Account, BalanceSnapshot, JournalEntry, Posting
+
+
+class ReadOnlyAdmin(admin.ModelAdmin):
+    """Ledger rows are written by LedgerService only."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class PostingInline(admin.TabularInline):
+    model = Posting
+    fields = ("account", "amount", "created_at")
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Account)
+class AccountAdmin(ReadOnlyAdmin):
+    list_display = ("id", "kind", "user", "doctor", "created_at")
+    list_filter = ("kind",)
+    list_select_related = ("user", "doctor__user")
+    search_fields = ("user__username", "user__email")
+    show_full_result_count = False
+
+
+@admin.register(JournalEntry)
+class JournalEntryAdmin(ReadOnlyAdmin):
+    list_display = ("id", "kind", "description", "payment", "created_at")
+    list_filter = ("kind",)
+    raw_id_fields = ("payment", "wallet_transaction")
+    inlines = [PostingInline]
+    show_full_result_count = False
+
+
+@admin.register(BalanceSnapshot)
+class BalanceSnapshotAdmin(ReadOnlyAdmin):
+    list_display = ("account", "posting_id", "as_of", "balance")
+    raw_id_fields = ("account",)
+    show_full_result_count = False
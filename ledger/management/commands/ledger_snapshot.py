@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from ledger.services import LedgerService
+
+
+class Command(BaseCommand):
+    help = "Snapshot the balance of every ledger account with new postings"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=LedgerService.SNAPSHOT_BATCH_SIZE,
+            help="Accounts snapshotted per round of queries",
+        )
+
+    def handle(self, *args, **options):
+        written = LedgerService.snapshot(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} balance snapshot(s)."))
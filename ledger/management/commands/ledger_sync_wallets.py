@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from ledger.services import LedgerService
+
+
+class Command(BaseCommand):
+    help = (
+        "Post adjustment entries for wallet balances set outside the ledger, "
+        "e.g. opening balances of users created before it existed"
+    )
+
+    def handle(self, *args, **options):
+        posted = LedgerService.sync_wallets(description="Opening balance")
+        self.stdout.write(self.style.SUCCESS(f"Posted {posted} adjustment(s)."))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ledger.services import LedgerService
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that every journal entry balances and that snapshots and wallet "
+        "balances match the postings, streaming the ledger in constant memory"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=LedgerService.VERIFY_CHUNK_SIZE,
+            help="Rows fetched per round trip",
+        )
+        parser.add_argument(
+            "--max-problems",
+            type=int,
+            default=50,
+            help="Problems listed before the rest are only counted",
+        )
+
+    def handle(self, *args, **options):
+        report = LedgerService.verify(
+            chunk_size=options["chunk_size"], max_problems=options["max_problems"]
+        )
+        self.stdout.write(
+            f"Checked {report['postings']} posting(s) in {report['entries']} "
+            f"entr{'y' if report['entries'] == 1 else 'ies'}, "
+            f"{report['accounts']} account(s) and {report['snapshots']} snapshot(s)."
+        )
+        for problem in report["problems"]:
+            self.stderr.write(problem)
+        if report["problem_count"]:
+            hidden = report["problem_count"] - len(report["problems"])
+            if hidden:
+                self.stderr.write(f"... and {hidden} more.")
+            raise CommandError(
+                f"Ledger is inconsistent ({report['problem_count']} problem(s))."
+            )
+        self.stdout.write(self.style.SUCCESS("Ledger is consistent."))
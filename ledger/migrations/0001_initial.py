@@ -0,0 +1,241 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:38
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("doctors", "0001_initial"),
+        ("payments", "0005_card_gateway"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Account",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("wallet", "Patient wallet"),
+                            ("clinic_revenue", "Clinic revenue"),
+                            ("doctor_payable", "Doctor payable"),
+                            ("clearing", "External clearing"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "doctor",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="ledger_accounts",
+                        to="doctors.doctor",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="ledger_accounts",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["id"],
+            },
+        ),
+        migrations.CreateModel(
+            name="BalanceSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "posting_id",
+                    models.BigIntegerField(help_text="Last posting included"),
+                ),
+                (
+                    "as_of",
+                    models.DateTimeField(help_text="Time of the last posting included"),
+                ),
+                ("balance", models.DecimalField(decimal_places=2, max_digits=20)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "account",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="snapshots",
+                        to="ledger.account",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["account", "-posting_id"],
+            },
+        ),
+        migrations.CreateModel(
+            name="JournalEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("deposit", "Wallet deposit"),
+                            ("withdrawal", "Wallet withdrawal"),
+                            ("wallet_payment", "Appointment paid from wallet"),
+                            ("card_payment", "Appointment paid by card"),
+                            ("adjustment", "Balance adjustment"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("description", models.CharField(blank=True, max_length=255)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "payment",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="journal_entries",
+                        to="payments.payment",
+                    ),
+                ),
+                (
+                    "wallet_transaction",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="journal_entries",
+                        to="payments.wallettransaction",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Journal entries",
+                "ordering": ["-id"],
+            },
+        ),
+        migrations.CreateModel(
+            name="Posting",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=20)),
+                ("created_at", models.DateTimeField()),
+                (
+                    "account",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="postings",
+                        to="ledger.account",
+                    ),
+                ),
+                (
+                    "entry",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="postings",
+                        to="ledger.journalentry",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["id"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="account",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("user__isnull", False)),
+                fields=("kind", "user"),
+                name="unique_ledger_user_account",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="account",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("doctor__isnull", False)),
+                fields=("kind", "doctor"),
+                name="unique_ledger_doctor_account",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="account",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("kind__in", ["clinic_revenue", "clearing"])),
+                fields=("kind",),
+                name="unique_ledger_system_account",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="balancesnapshot",
+            index=models.Index(
+                fields=["account", "as_of"], name="ledger_bala_account_0e49b8_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="balancesnapshot",
+            constraint=models.UniqueConstraint(
+                fields=("account", "posting_id"), name="unique_ledger_snapshot"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="posting",
+            index=models.Index(
+                fields=["account", "id"], name="ledger_post_account_0f0c80_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="posting",
+            index=models.Index(
+                fields=["account", "created_at"], name="ledger_post_account_658090_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,208 @@
+from django.db import models
+from django.utils import timezone
+
+
+class ImmutableLedgerError(Exception):
+    """Raised when code tries to change or delete a recorded posting."""
+
+
+class Account(models.Model):
+    """
+    A balance in the double-entry ledger.
+
+    Every patient (or doctor) wallet, every doctor's payable and the clinic's
+    revenue is one account. Money entering or leaving the system through
+    deposits, withdrawals and card charges is booked against the single
+    clearing account, so the postings of the whole ledger always sum to zero.
+    """
+
+    WALLET = "wallet"
+    CLINIC_REVENUE = "clinic_revenue"
+    DOCTOR_PAYABLE = "doctor_payable"
+    CLEARING = "clearing"
+    KIND_CHOICES = (
+        (WALLET, "Patient wallet"),
+        (CLINIC_REVENUE, "Clinic revenue"),
+        (DOCTOR_PAYABLE, "Doctor payable"),
+        (CLEARING, "External clearing"),
+    )
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # Accounts outlive their owners: deleting a user must not rewrite history
+    user = models.ForeignKey(
+        "accounts.User",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="ledger_accounts",
+    )
+    doctor = models.ForeignKey(
+        "doctors.Doctor",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="ledger_accounts",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "user"],
+                condition=models.Q(user__isnull=False),
+                name="unique_ledger_user_account",
+            ),
+            models.UniqueConstraint(
+                fields=["kind", "doctor"],
+                condition=models.Q(doctor__isnull=False),
+                name="unique_ledger_doctor_account",
+            ),
+            models.UniqueConstraint(
+                fields=["kind"],
+                condition=models.Q(kind__in=["clinic_revenue", "clearing"]),
+                name="unique_ledger_system_account",
+            ),
+        ]
+
+    def __str__(self):
+        owner = self.user_id or self.doctor_id
+        return (
+            f"{self.get_kind_display()} #{owner}" if owner else self.get_kind_display()
+        )
+
+
+class ImmutableQuerySet(models.QuerySet):
+    """Refuses the bulk operations that would bypass ``save``/``delete``."""
+
+    def update(self, **kwargs):
+        raise ImmutableLedgerError(f"{self.model.__name__} rows cannot be updated.")
+
+    def delete(self):
+        raise ImmutableLedgerError(f"{self.model.__name__} rows cannot be deleted.")
+
+
+class ImmutableModel(models.Model):
+    """Rows may be inserted but never changed or removed afterwards."""
+
+    objects = ImmutableQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ImmutableLedgerError(
+                f"{type(self).__name__} {self.pk} is already recorded."
+            )
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ImmutableLedgerError(
+            f"{type(self).__name__} {self.pk} cannot be deleted."
+        )
+
+
+class JournalEntry(ImmutableModel):
+    """One financial event; its postings always sum to zero."""
+
+    DEPOSIT = "deposit"
+    WITHDRAWAL = "withdrawal"
+    WALLET_PAYMENT = "wallet_payment"
+    CARD_PAYMENT = "card_payment"
+    ADJUSTMENT = "adjustment"
+    KIND_CHOICES = (
+        (DEPOSIT, "Wallet deposit"),
+        (WITHDRAWAL, "Wallet withdrawal"),
+        (WALLET_PAYMENT, "Appointment paid from wallet"),
+        (CARD_PAYMENT, "Appointment paid by card"),
+        (ADJUSTMENT, "Balance adjustment"),
+    )
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    description = models.CharField(max_length=255, blank=True)
+    payment = models.ForeignKey(
+        "payments.Payment",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="journal_entries",
+    )
+    wallet_transaction = models.ForeignKey(
+        "payments.WalletTransaction",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="journal_entries",
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-id"]
+        verbose_name_plural = "Journal entries"
+
+    def __str__(self):
+        return f"#{self.pk} {self.get_kind_display()}"
+
+
+class Posting(ImmutableModel):
+    """
+    A signed movement on one account.
+
+    Positive amounts increase the account's balance. An account's balance is
+    the sum of its postings, normally read as the latest BalanceSnapshot
+    plus the postings after it.
+    """
+
+    entry = models.ForeignKey(
+        JournalEntry, on_delete=models.PROTECT, related_name="postings"
+    )
+    account = models.ForeignKey(
+        Account, on_delete=models.PROTECT, related_name="postings"
+    )
+    amount = models.DecimalField(max_digits=20, decimal_places=2)
+    # Copied from the entry so balances as of a moment need no join
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            # Delta since a snapshot, and the per-account verification pass
+            models.Index(fields=["account", "id"]),
+            # Balance as of a moment
+            models.Index(fields=["account", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.account_id}: {self.amount}"
+
+
+class BalanceSnapshot(models.Model):
+    """
+    An account's balance including every posting up to ``posting_id``.
+
+    Written periodically by ``manage.py ledger_snapshot`` so reading a
+    balance only sums the postings recorded since.
+    """
+
+    account = models.ForeignKey(
+        Account, on_delete=models.PROTECT, related_name="snapshots"
+    )
+    posting_id = models.BigIntegerField(help_text="Last posting included")
+    as_of = models.DateTimeField(help_text="Time of the last posting included")
+    balance = models.DecimalField(max_digits=20, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["account", "-posting_id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["account", "posting_id"], name="unique_ledger_snapshot"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["account", "as_of"]),
+        ]
+
+    def __str__(self):
+        return f"{self.account_id} @ {self.posting_id}: {self.balance}"
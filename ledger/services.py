@@ -0,0 +1,517 @@
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Account, BalanceSnapshot, JournalEntry, Posting
+
+ZERO = Decimal("0.00")
+CENT = Decimal("0.01")
+
+
+class UnbalancedEntry(Exception):
+    """The lines of a journal entry do not sum to zero."""
+
+
+class LedgerService:
+    """Records money movements as double-entry postings and reads balances."""
+
+    SNAPSHOT_BATCH_SIZE = 500
+    VERIFY_CHUNK_SIZE = 5000
+
+    # Accounts
+
+    @staticmethod
+    def system_account(kind):
+        """Return the clinic revenue or clearing account, creating it once."""
+        account, _ = Account.objects.get_or_create(kind=kind)
+        return account
+
+    @staticmethod
+    def wallet_account(user_id):
+        account, _ = Account.objects.get_or_create(kind=Account.WALLET, user_id=user_id)
+        return account
+
+    @staticmethod
+    def payable_account(doctor_id):
+        account, _ = Account.objects.get_or_create(
+            kind=Account.DOCTOR_PAYABLE, doctor_id=doctor_id
+        )
+        return account
+
+    # Recording
+
+    @staticmethod
+    def post(kind, lines, description="", payment=None, wallet_transaction=None):
+        """
+        Record one journal entry.
+
+        Args:
+            kind: One of the JournalEntry kinds
+            lines: Iterable of (account, amount) pairs; amounts are signed
+            description: Free text shown in the admin
+            payment: Payment the entry settles, if any
+            wallet_transaction: WalletTransaction the entry mirrors, if any
+
+        Returns:
+            JournalEntry: The recorded entry
+
+        Raises:
+            UnbalancedEntry: The amounts do not sum to zero or fewer than two
+            accounts are involved
+        """
+        lines = [(account, Decimal(amount)) for account, amount in lines if amount]
+        if len(lines) < 2 or sum(amount for _account, amount in lines) != 0:
+            raise UnbalancedEntry(f"Unbalanced {kind} entry: {lines}")
+
+        with transaction.atomic():
+            entry = JournalEntry.objects.create(
+                kind=kind,
+                description=description[:255],
+                payment=payment,
+                wallet_transaction=wallet_transaction,
+            )
+            Posting.objects.bulk_create(
+                Posting(
+                    entry=entry,
+                    account=account,
+                    amount=amount,
+                    created_at=entry.created_at,
+                )
+                for account, amount in lines
+            )
+        return entry
+
+    @staticmethod
+    def split(amount):
+        """
+        Divide a consultation fee into the clinic's share and the doctor's.
+
+        Returns:
+            tuple: (clinic share, doctor share); they always add up to ``amount``
+        """
+        clinic = (amount * settings.LEDGER_CLINIC_SHARE).quantize(
+            CENT, rounding=ROUND_HALF_UP
+        )
+        return clinic, amount - clinic
+
+    @staticmethod
+    def record_deposit(wallet_transaction):
+        amount = wallet_transaction.amount
+        return LedgerService.post(
+            JournalEntry.DEPOSIT,
+            [
+                (LedgerService.wallet_account(wallet_transaction.user_id_id), amount),
+                (LedgerService.system_account(Account.CLEARING), -amount),
+            ],
+            description=wallet_transaction.description,
+            wallet_transaction=wallet_transaction,
+        )
+
+    @staticmethod
+    def record_withdrawal(wallet_transaction):
+        amount = wallet_transaction.amount
+        return LedgerService.post(
+            JournalEntry.WITHDRAWAL,
+            [
+                (LedgerService.wallet_account(wallet_transaction.user_id_id), -amount),
+                (LedgerService.system_account(Account.CLEARING), amount),
+            ],
+            description=wallet_transaction.description,
+            wallet_transaction=wallet_transaction,
+        )
+
+    @staticmethod
+    def record_payment(payment, doctor_id, wallet_transaction=None):
+        """
+        Book a successful appointment payment.
+
+        The fee leaves the patient's wallet (or, for a card payment, comes in
+        through clearing) and is split between clinic revenue and the
+        doctor's payable.
+        """
+        clinic, doctor = LedgerService.split(payment.amount)
+        if wallet_transaction is not None:
+            kind = JournalEntry.WALLET_PAYMENT
+            source = LedgerService.wallet_account(wallet_transaction.user_id_id)
+        else:
+            kind = JournalEntry.CARD_PAYMENT
+            source = LedgerService.system_account(Account.CLEARING)
+        return LedgerService.post(
+            kind,
+            [
+                (source, -payment.amount),
+                (LedgerService.system_account(Account.CLINIC_REVENUE), clinic),
+                (LedgerService.payable_account(doctor_id), doctor),
+            ],
+            description=f"Appointment {payment.appointment_id_id}",
+            payment=payment,
+            wallet_transaction=wallet_transaction,
+        )
+
+    @staticmethod
+    def sync_wallets(users=None, description="Balance set outside the ledger"):
+        """
+        Post adjustment entries for wallets whose balance was set directly.
+
+        Opening balances of users that existed before the ledger, and edits
+        made in the admin or the doctor forms, change ``wallet_balance``
+        without a deposit; this books the difference against clearing so
+        the ledger and the wallets agree again. Users are compared in
+        chunks and each chunk's adjustments are written with a fixed number
+        of bulk inserts.
+
+        Args:
+            users: User queryset to check; all users when None
+            description: Stored on every adjustment entry
+
+        Returns:
+            int: Number of adjustment entries posted
+        """
+        from accounts.models import User
+
+        if users is None:
+            users = User.objects.all()
+        ledger = (
+            Posting.objects.filter(
+                account__kind=Account.WALLET, account__user=OuterRef("pk")
+            )
+            .order_by()
+            .values("account__user")
+            .annotate(total=Sum("amount"))
+            .values("total")
+        )
+        rows = (
+            users.order_by("pk")
+            .annotate(ledger_balance=Coalesce(Subquery(ledger), ZERO))
+            .values_list("pk", "wallet_balance", "ledger_balance")
+            .iterator(chunk_size=LedgerService.SNAPSHOT_BATCH_SIZE)
+        )
+        posted = 0
+        while chunk := list(islice(rows, LedgerService.SNAPSHOT_BATCH_SIZE)):
+            drift = {
+                user_id: balance - ledger_balance
+                for user_id, balance, ledger_balance in chunk
+                if balance != ledger_balance
+            }
+            if drift:
+                LedgerService._post_adjustments(drift, description)
+                posted += len(drift)
+        return posted
+
+    @staticmethod
+    def _post_adjustments(drift, description):
+        """Book {user_id: difference} against clearing in bulk."""
+        with transaction.atomic():
+            clearing = LedgerService.system_account(Account.CLEARING)
+            wallets = dict(
+                Account.objects.filter(
+                    kind=Account.WALLET, user_id__in=drift
+                ).values_list("user_id", "id")
+            )
+            missing = [
+                Account(kind=Account.WALLET, user_id=user_id)
+                for user_id in drift
+                if user_id not in wallets
+            ]
+            for account in Account.objects.bulk_create(missing):
+                wallets[account.user_id] = account.pk
+
+            now = timezone.now()
+            entries = JournalEntry.objects.bulk_create(
+                JournalEntry(
+                    kind=JournalEntry.ADJUSTMENT,
+                    description=description[:255],
+                    created_at=now,
+                )
+                for _user_id in drift
+            )
+            postings = []
+            for entry, (user_id, difference) in zip(entries, drift.items()):
+                postings.append(
+                    Posting(
+                        entry=entry,
+                        account_id=wallets[user_id],
+                        amount=difference,
+                        created_at=now,
+                    )
+                )
+                postings.append(
+                    Posting(
+                        entry=entry,
+                        account=clearing,
+                        amount=-difference,
+                        created_at=now,
+                    )
+                )
+            Posting.objects.bulk_create(postings)
+
+    # Reading
+
+    @staticmethod
+    def balance(account, at=None):
+        """
+        Balance of ``account`` now, or as of the moment ``at``.
+
+        Reads the latest snapshot taken no later than ``at`` and adds the
+        postings recorded after it, so the cost is bounded by the activity
+        since the last ``ledger_snapshot`` run rather than the whole history.
+        """
+        snapshots = BalanceSnapshot.objects.filter(account=account)
+        postings = Posting.objects.filter(account=account)
+        if at is not None:
+            snapshots = snapshots.filter(as_of__lte=at)
+            postings = postings.filter(created_at__lte=at)
+        snapshot = snapshots.order_by("-posting_id").first()
+        if snapshot is not None:
+            postings = postings.filter(id__gt=snapshot.posting_id)
+        delta = postings.aggregate(total=Sum("amount"))["total"] or ZERO
+        return (snapshot.balance if snapshot else ZERO) + delta
+
+    # Maintenance
+
+    @staticmethod
+    def snapshot(batch_size=None):
+        """
+        Snapshot every account that has postings since its last snapshot.
+
+        Accounts are processed ``batch_size`` at a time; each batch is one
+        grouped aggregate over the postings after the previous snapshot and
+        one bulk insert, up to the last posting older than
+        ``LEDGER_SNAPSHOT_MARGIN`` when the run started.
+
+        Ids are handed out when a posting is inserted but become visible when
+        its transaction commits, so a posting with a lower id may still be in
+        flight behind the newest visible one. ``balance`` only adds postings
+        after a snapshot's ``posting_id``, so the bound stays behind every
+        transaction that could still commit below it.
+
+        Returns:
+            int: Number of snapshots written
+        """
+        batch_size = batch_size or LedgerService.SNAPSHOT_BATCH_SIZE
+        cutoff = timezone.now() - timedelta(seconds=settings.LEDGER_SNAPSHOT_MARGIN)
+        upto = (
+            Posting.objects.filter(created_at__lt=cutoff)
+            .order_by("-id")
+            .values_list("id", flat=True)
+            .first()
+        )
+        if upto is None:
+            return 0
+
+        latest = BalanceSnapshot.objects.filter(account=OuterRef("account")).order_by(
+            "-posting_id"
+        )
+        written, after = 0, 0
+        while True:
+            account_ids = list(
+                Account.objects.filter(id__gt=after)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not account_ids:
+                return written
+            after = account_ids[-1]
+
+            deltas = (
+                Posting.objects.filter(account_id__in=account_ids, id__lte=upto)
+                .annotate(
+                    since=Coalesce(Subquery(latest.values("posting_id")[:1]), 0),
+                    previous=Coalesce(Subquery(latest.values("balance")[:1]), ZERO),
+                )
+                .filter(id__gt=F("since"))
+                .order_by()
+                .values("account", "previous")
+                .annotate(
+                    delta=Sum("amount"),
+                    last=Max("id"),
+                    as_of=Max("created_at"),
+                )
+            )
+            snapshots = [
+                BalanceSnapshot(
+                    account_id=row["account"],
+                    posting_id=row["last"],
+                    as_of=row["as_of"],
+                    balance=row["previous"] + row["delta"],
+                )
+                for row in deltas
+            ]
+            BalanceSnapshot.objects.bulk_create(snapshots, ignore_conflicts=True)
+            written += len(snapshots)
+
+    @staticmethod
+    def verify(chunk_size=None, max_problems=50):
+        """
+        Check the ledger's invariants in streaming passes.
+
+        1. Every journal entry's postings sum to zero (postings read in
+           entry order, so only the current entry's running sum is held).
+        2. Every snapshot equals the sum of its account's postings up to it,
+           and every wallet account matches its user's ``wallet_balance``
+           (postings, snapshots and wallets read in account order and
+           merged, so only the current account's running balance is held).
+
+        Memory stays constant however many postings there are. On
+        PostgreSQL the passes share one repeatable-read snapshot, so
+        traffic during the run cannot produce false alarms.
+
+        Returns:
+            dict: entries, postings, accounts, snapshots, total (sum of all
+            postings, zero when balanced), problems (first ``max_problems``
+            messages) and problem_count
+        """
+        chunk_size = chunk_size or LedgerService.VERIFY_CHUNK_SIZE
+        report = {
+            "entries": 0,
+            "postings": 0,
+            "accounts": 0,
+            "snapshots": 0,
+            "total": ZERO,
+            "problems": [],
+            "problem_count": 0,
+        }
+
+        def problem(message):
+            report["problem_count"] += 1
+            if len(report["problems"]) < max_problems:
+                report["problems"].append(message)
+
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY"
+                    )
+            LedgerService._verify_entries(chunk_size, report, problem)
+            LedgerService._verify_accounts(chunk_size, report, problem)
+
+        if report["total"] != 0:
+            problem(f"All postings sum to {report['total']}, not zero")
+        return report
+
+    @staticmethod
+    def _verify_entries(chunk_size, report, problem):
+        postings = (
+            Posting.objects.order_by("entry_id", "id")
+            .values_list("entry_id", "amount")
+            .iterator(chunk_size=chunk_size)
+        )
+        current, running, lines = None, ZERO, 0
+        for entry_id, amount in postings:
+            if entry_id != current:
+                if current is not None:
+                    LedgerService._close_entry(current, running, lines, problem)
+                report["entries"] += 1
+                current, running, lines = entry_id, ZERO, 0
+            running += amount
+            lines += 1
+            report["postings"] += 1
+            report["total"] += amount
+        if current is not None:
+            LedgerService._close_entry(current, running, lines, problem)
+
+    @staticmethod
+    def _close_entry(entry_id, running, lines, problem):
+        if running != 0:
+            problem(f"Entry {entry_id} is unbalanced by {running}")
+        if lines < 2:
+            problem(f"Entry {entry_id} has a single posting")
+
+    @staticmethod
+    def _verify_accounts(chunk_size, report, problem):
+        postings = (
+            Posting.objects.order_by("account_id", "id")
+            .values_list("account_id", "id", "amount")
+            .iterator(chunk_size=chunk_size)
+        )
+        snapshots = _Peekable(
+            BalanceSnapshot.objects.order_by("account_id", "posting_id")
+            .values_list("account_id", "posting_id", "balance")
+            .iterator(chunk_size=chunk_size)
+        )
+        wallets = _Peekable(
+            Account.objects.filter(kind=Account.WALLET, user__isnull=False)
+            .order_by("id")
+            .values_list("id", "user_id", "user__wallet_balance")
+            .iterator(chunk_size=chunk_size)
+        )
+        state = {"account": None, "balance": ZERO}
+
+        def flush(before_account):
+            # Everything ordered before ``before_account`` belongs either to
+            # the account just finished or to accounts without postings
+            while snapshots.peek() and (
+                before_account is None or snapshots.peek()[0] < before_account
+            ):
+                account_id, posting_id, balance = next(snapshots)
+                report["snapshots"] += 1
+                expected = state["balance"] if account_id == state["account"] else 0
+                if balance != expected:
+                    problem(
+                        f"Snapshot of account {account_id} at posting {posting_id} "
+                        f"is {balance}, postings sum to {expected}"
+                    )
+            while wallets.peek() and (
+                before_account is None or wallets.peek()[0] < before_account
+            ):
+                account_id, user_id, wallet_balance = next(wallets)
+                expected = state["balance"] if account_id == state["account"] else 0
+                if wallet_balance != expected:
+                    problem(
+                        f"User {user_id} has a wallet balance of {wallet_balance}, "
+                        f"the ledger says {expected}"
+                    )
+
+        for account_id, posting_id, amount in postings:
+            if account_id != state["account"]:
+                flush(account_id)
+                report["accounts"] += 1
+                state.update(account=account_id, balance=ZERO)
+            # Snapshots taken before this posting must equal the balance so far
+            while (
+                snapshots.peek()
+                and snapshots.peek()[0] == account_id
+                and snapshots.peek()[1] < posting_id
+            ):
+                _account, snapshot_posting, balance = next(snapshots)
+                report["snapshots"] += 1
+                if balance != state["balance"]:
+                    problem(
+                        f"Snapshot of account {account_id} at posting "
+                        f"{snapshot_posting} is {balance}, postings sum to "
+                        f"{state['balance']}"
+                    )
+            state["balance"] += amount
+        flush(None)
+
+
+class _Peekable:
+    """Iterator wrapper that can look at the next item without consuming it."""
+
+    _empty = object()
+
+    def __init__(self, iterator):
+        self._iterator = iterator
+        self._next = self._empty
+
+    def peek(self):
+        if self._next is self._empty:
+            self._next = next(self._iterator, None)
+        return self._next
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item = self.peek()
+        if item is None:
+            raise StopIteration
+        self._next = self._empty
+        return item
@@ -0,0 +1,201 @@
+from datetime import date, time, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from appointments.models import Appointment, TimeSlot
+from doctors.models import Doctor, Specialty
+from payments.gateways import GatewayResult
+from payments.services import CardPaymentService, PaymentService
+from .models import (
+    Account,
+    BalanceSnapshot,
+    ImmutableLedgerError,
+    JournalEntry,
+    Posting,
+)
+from .services import LedgerService, UnbalancedEntry
+
+User = get_user_model()
+
+
+@override_settings(LEDGER_CLINIC_SHARE=Decimal("0.20"), LEDGER_SNAPSHOT_MARGIN=0)
+class LedgerServiceTest(TestCase):
+    """Test cases for the double-entry ledger."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.patient = User.objects.create_user(
+            username="patient",
+            email="patient@test.com",
+            password="testpass123",
+            wallet_balance=Decimal("500.00"),
+        )
+        self.doctor = Doctor.objects.create(
+            user=User.objects.create_user(
+                username="dr_smith",
+                email="dr.smith@test.com",
+                first_name="John",
+                last_name="Smith",
+                user_type="doctor",
+            ),
+            specialty=Specialty.objects.create(
+                name="Cardiology", description="Heart specialist"
+            ),
+            license_number="LIC123456",
+            experience_years=5,
+            bio="Cardiologist",
+            consultation_fee=Decimal("100.00"),
+            created_by=self.patient,
+        )
+        # The patient's balance predates the ledger
+        LedgerService.sync_wallets()
+        self.client.login(username="patient", password="testpass123")
+
+    def _appointment(self, hour=9):
+        return Appointment.objects.create(
+            patient=self.patient,
+            doctor=self.doctor,
+            time_slot=TimeSlot.objects.create(
+                doctor=self.doctor,
+                date=date.today() + timedelta(days=1),
+                start_time=time(hour, 0),
+                end_time=time(hour, 15),
+            ),
+            status="PENDING",
+            consultation_fee=Decimal("100.00"),
+            hold_expires_at=timezone.now() + timedelta(minutes=15),
+        )
+
+    def _verify(self):
+        out = StringIO()
+        call_command("ledger_verify", stdout=out, stderr=out)
+        return out.getvalue()
+
+    def test_payments_are_split_between_revenue_and_doctor(self):
+        """Test that wallet and card payments post balanced, split entries."""
+        self.client.post(reverse("payments:deposit_funds"), {"amount": "50"})
+        PaymentService.pay(
+            self.patient, self._appointment(9), "wallet", "key-wallet-01"
+        )
+        card, _ = PaymentService.pay(
+            self.patient, self._appointment(10), "card", "key-card-0001"
+        )
+        CardPaymentService.apply_result(card.pk, GatewayResult(True, "ref"))
+
+        wallet = LedgerService.wallet_account(self.patient.pk)
+        revenue = LedgerService.system_account(Account.CLINIC_REVENUE)
+        payable = LedgerService.payable_account(self.doctor.pk)
+        self.assertEqual(LedgerService.balance(wallet), Decimal("450.00"))
+        self.assertEqual(LedgerService.balance(revenue), Decimal("40.00"))
+        self.assertEqual(LedgerService.balance(payable), Decimal("160.00"))
+        self.assertIn("Ledger is consistent", self._verify())
+
+    def test_postings_are_immutable(self):
+        """Test that recorded postings cannot be changed or deleted."""
+        posting = Posting.objects.first()
+
+        posting.amount = Decimal("1.00")
+        with self.assertRaises(ImmutableLedgerError):
+            posting.save()
+        with self.assertRaises(ImmutableLedgerError):
+            posting.delete()
+        with self.assertRaises(ImmutableLedgerError):
+            Posting.objects.update(amount=0)
+        with self.assertRaises(UnbalancedEntry):
+            LedgerService.post(
+                "adjustment",
+                [(LedgerService.wallet_account(self.patient.pk), Decimal("5"))],
+            )
+
+    def test_historical_balance_is_snapshot_plus_delta(self):
+        """Test that balances as of a moment read the snapshot before it."""
+        wallet = LedgerService.wallet_account(self.patient.pk)
+        self.assertEqual(LedgerService.snapshot(), 2)
+        snapshot = BalanceSnapshot.objects.get(account=wallet)
+        between = timezone.now()
+
+        self.client.post(reverse("payments:deposit_funds"), {"amount": "25"})
+        self.assertEqual(LedgerService.snapshot(), 2)
+        self.assertEqual(LedgerService.snapshot(), 0)
+
+        self.assertEqual(LedgerService.balance(wallet, at=between), Decimal("500.00"))
+        self.assertEqual(LedgerService.balance(wallet), Decimal("525.00"))
+        self.assertEqual(
+            LedgerService.balance(wallet, at=snapshot.as_of - timedelta(seconds=1)),
+            Decimal("0.00"),
+        )
+
+    @override_settings(LEDGER_SNAPSHOT_MARGIN=300)
+    def test_snapshot_waits_for_postings_still_in_flight(self):
+        """Test that a posting committing below a newer one is never skipped."""
+        wallet = LedgerService.wallet_account(self.patient.pk)
+        clearing = LedgerService.system_account(Account.CLEARING)
+        last = Posting.objects.order_by("-id").values_list("id", flat=True).first()
+
+        def adjust(first_id, amount):
+            entry = JournalEntry.objects.create(kind=JournalEntry.ADJUSTMENT)
+            Posting.objects.bulk_create(
+                [
+                    Posting(
+                        id=first_id,
+                        entry=entry,
+                        account=wallet,
+                        amount=amount,
+                        created_at=entry.created_at,
+                    ),
+                    Posting(
+                        id=first_id + 1,
+                        entry=entry,
+                        account=clearing,
+                        amount=-amount,
+                        created_at=entry.created_at,
+                    ),
+                ]
+            )
+
+        # The first writer took the lower ids but commits after the second
+        # writer and after a snapshot run
+        adjust(last + 10, Decimal("25.00"))
+        self.assertEqual(LedgerService.snapshot(), 0)
+        adjust(last + 1, Decimal("10.00"))
+
+        self.assertEqual(LedgerService.balance(wallet), Decimal("535.00"))
+        with override_settings(LEDGER_SNAPSHOT_MARGIN=0):
+            self.assertEqual(LedgerService.snapshot(), 2)
+        self.assertEqual(
+            BalanceSnapshot.objects.get(account=wallet).posting_id, last + 10
+        )
+        self.assertEqual(LedgerService.balance(wallet), Decimal("535.00"))
+
+    def test_verify_reports_drift(self):
+        """Test that ledger_verify catches wallets and snapshots that disagree."""
+        LedgerService.snapshot()
+        User.objects.filter(pk=self.patient.pk).update(wallet_balance=Decimal("1"))
+        BalanceSnapshot.objects.filter(account__kind=Account.CLEARING).update(
+            balance=Decimal("3")
+        )
+
+        with self.assertRaises(CommandError):
+            self._verify()
+        report = LedgerService.verify(chunk_size=1)
+        self.assertEqual(report["problem_count"], 2)
+        self.assertEqual(report["total"], 0)
+
+    def test_direct_balance_edit_is_booked(self):
+        """Test that setting a balance directly is recorded as an adjustment."""
+        self.patient.wallet_balance = Decimal("80.00")
+        self.patient.save()
+
+        self.assertEqual(LedgerService.sync_wallets(), 1)
+        self.assertEqual(LedgerService.sync_wallets(), 0)
+        wallet = LedgerService.wallet_account(self.patient.pk)
+        self.assertEqual(LedgerService.balance(wallet), Decimal("80.00"))
@@ -1,3 +1,11 @@
 from django.contrib import admin
+from .models import Notification
 
-# Register your models here.
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ("user", "kind", "message", "is_read", "created_at")
+    list_filter = ("kind", "is_read")
+    search_fields = ("user__username", "message")
+    raw_id_fields = ("user",)
+    list_select_related = ("user",)
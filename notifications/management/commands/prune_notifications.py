@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from notifications.services import NotificationService
+
+
+class Command(BaseCommand):
+    help = "Delete old read notifications in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=30,
+            help="Delete read notifications older than this many days",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=NotificationService.BATCH_SIZE,
+            help="Number of rows deleted per statement",
+        )
+
+    def handle(self, *args, **options):
+        deleted = NotificationService.prune_read(
+            older_than_days=options["days"], batch_size=options["batch_size"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} notification(s)."))
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.6 on 2026-10-19 09:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Notification",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("general", "General"),
+                            ("appointment_cancelled", "Appointment Cancelled"),
+                        ],
+                        default="general",
+                        max_length=30,
+                    ),
+                ),
+                ("message", models.CharField(max_length=255)),
+                ("link", models.CharField(blank=True, max_length=200)),
+                ("is_read", models.BooleanField(default=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="notifications",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["user", "is_read", "created_at"],
+                        name="notificatio_user_id_8a7c6b_idx",
+                    ),
+                    models.Index(
+                        fields=["is_read", "created_at"],
+                        name="notificatio_is_read_3a06ff_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
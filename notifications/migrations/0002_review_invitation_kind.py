@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="notification",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("general", "General"),
+                    ("appointment_cancelled", "Appointment Cancelled"),
+                    ("review_invitation", "Review Invitation"),
+                ],
+                default="general",
+                max_length=30,
+            ),
+        ),
+    ]
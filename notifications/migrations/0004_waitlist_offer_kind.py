@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0003_appointment_rescheduled_kind"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="notification",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("general", "General"),
+                    ("appointment_cancelled", "Appointment Cancelled"),
+                    ("appointment_rescheduled", "Appointment Rescheduled"),
+                    ("review_invitation", "Review Invitation"),
+                    ("waitlist_offer", "Waitlist Offer"),
+                ],
+                default="general",
+                max_length=30,
+            ),
+        ),
+    ]
@@ -1,3 +1,33 @@
 from django.db import models
+from django.conf import settings
 
-# Create your models here.
+
+class Notification(models.Model):
+    KIND_CHOICES = [
+        ("general", "General"),
+        ("appointment_cancelled", "Appointment Cancelled"),
+        ("appointment_rescheduled", "Appointment Rescheduled"),
+        ("review_invitation", "Review Invitation"),
+        ("waitlist_offer", "Waitlist Offer"),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="notifications",
+    )
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES, default="general")
+    message = models.CharField(max_length=255)
+    link = models.CharField(max_length=200, blank=True)
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["user", "is_read", "created_at"]),
+            models.Index(fields=["is_read", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"Notification for user {self.user_id} - {self.message}"
@@ -0,0 +1,104 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Notification
+
+User = get_user_model()
+
+
+class NotificationService:
+    """Service for in-app notifications and the per-user unread counter."""
+
+    BATCH_SIZE = 1000
+
+    @staticmethod
+    def notify(user, message, kind="general", link=""):
+        """Create a single notification for ``user``."""
+        notification = Notification(user=user, message=message, kind=kind, link=link)
+        return NotificationService.bulk_notify([notification])[0]
+
+    @staticmethod
+    def bulk_notify(notifications):
+        """
+        Fan out unsaved Notification instances.
+
+        Inserts with bulk_create and bumps the unread counters with one
+        UPDATE per distinct per-user count instead of one per recipient.
+        """
+        notifications = list(notifications)
+        if not notifications:
+            return []
+
+        with transaction.atomic():
+            created = Notification.objects.bulk_create(
+                notifications, batch_size=NotificationService.BATCH_SIZE
+            )
+
+            users_by_count = defaultdict(list)
+            for user_id, count in Counter(n.user_id for n in created).items():
+                users_by_count[count].append(user_id)
+
+            for count, user_ids in users_by_count.items():
+                User.objects.filter(id__in=user_ids).update(
+                    unread_notification_count=F("unread_notification_count") + count
+                )
+            # The navbar reads the counter from the user snapshot
+            User.invalidate_snapshots({n.user_id for n in created})
+
+        return created
+
+    @staticmethod
+    def mark_read(user, notification_ids=None):
+        """
+        Mark the user's unread notifications (or just ``notification_ids``) read.
+
+        Returns:
+            int: Number of notifications that changed state
+        """
+        unread = Notification.objects.filter(user=user, is_read=False)
+        if notification_ids is not None:
+            unread = unread.filter(id__in=notification_ids)
+
+        with transaction.atomic():
+            marked = unread.update(is_read=True)
+            if marked:
+                User.objects.filter(pk=user.pk).update(
+                    unread_notification_count=Greatest(
+                        F("unread_notification_count") - marked, 0
+                    )
+                )
+                User.invalidate_snapshot(user.pk)
+
+        user.unread_notification_count = max(user.unread_notification_count - marked, 0)
+        return marked
+
+    @staticmethod
+    def prune_read(older_than_days=30, batch_size=None):
+        """
+        Delete read notifications older than ``older_than_days`` in chunks.
+
+        Unread notifications are never pruned, so the counters stay exact.
+
+        Returns:
+            int: Number of notifications deleted
+        """
+        batch_size = batch_size or NotificationService.BATCH_SIZE
+        cutoff = timezone.now() - timedelta(days=older_than_days)
+        stale = Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+
+        deleted = 0
+        while True:
+            ids = list(
+                stale.order_by("created_at").values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            deleted += Notification.objects.filter(id__in=ids).delete()[0]
+
+        return deleted
@@ -1,3 +1,204 @@
+from datetime import date, time, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from appointments.models import Appointment, TimeSlot
+from doctors.models import Doctor, Specialty
+from .models import Notification
+from .services import NotificationService
+
+User = get_user_model()
+
+
+class NotificationServiceTest(TestCase):
+    """Test cases for NotificationService."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.alice = User.objects.create_user(
+            username="alice", email="alice@test.com", password="testpass123"
+        )
+        self.bob = User.objects.create_user(
+            username="bob", email="bob@test.com", password="testpass123"
+        )
+
+    def test_bulk_notify_updates_counters(self):
+        """Test that fan-out bumps each recipient's unread counter."""
+        NotificationService.bulk_notify(
+            [
+                Notification(user=self.alice, message="one"),
+                Notification(user=self.alice, message="two"),
+                Notification(user=self.bob, message="three"),
+            ]
+        )
+
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual(self.alice.unread_notification_count, 2)
+        self.assertEqual(self.bob.unread_notification_count, 1)
+        self.assertEqual(Notification.objects.count(), 3)
+
+    def test_mark_read_decrements_counter(self):
+        """Test that marking notifications read decrements the counter."""
+        first = NotificationService.notify(self.alice, "one")
+        NotificationService.notify(self.alice, "two")
+        self.alice.refresh_from_db()
+
+        self.assertEqual(NotificationService.mark_read(self.alice, [first.id]), 1)
+        self.assertEqual(NotificationService.mark_read(self.alice, [first.id]), 0)
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.unread_notification_count, 1)
+
+        NotificationService.mark_read(self.alice)
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.unread_notification_count, 0)
+
+    def test_stale_user_save_keeps_counter(self):
+        """Test that saving a stale user instance does not reset the counter."""
+        stale = User.objects.get(pk=self.alice.pk)
+        NotificationService.notify(self.alice, "one")
+
+        stale.first_name = "Alice"
+        stale.save()
+
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.first_name, "Alice")
+        self.assertEqual(self.alice.unread_notification_count, 1)
+
+    def test_prune_read_deletes_only_old_read(self):
+        """Test that pruning removes old read notifications only."""
+        old_read = NotificationService.notify(self.alice, "old read")
+        old_unread = NotificationService.notify(self.alice, "old unread")
+        recent_read = NotificationService.notify(self.alice, "recent read")
+        NotificationService.mark_read(self.alice, [old_read.id, recent_read.id])
+        Notification.objects.filter(id__in=[old_read.id, old_unread.id]).update(
+            created_at=timezone.now() - timedelta(days=60)
+        )
+
+        call_command("prune_notifications", "--batch-size", "1", stdout=StringIO())
+
+        self.assertCountEqual(
+            Notification.objects.values_list("id", flat=True),
+            [old_unread.id, recent_read.id],
+        )
+
+    def test_navbar_badge_shows_counter(self):
+        """Test that the navbar badge reads the counter."""
+        NotificationService.bulk_notify(
+            Notification(user=self.alice, message=f"n{i}") for i in range(3)
+        )
+        self.client.login(username="alice", password="testpass123")
+
+        response = self.client.get(reverse("notifications:notification_list"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Mark all as read (3)")
+
+
+class CancelDayFanOutTest(TestCase):
+    """Test cases for cancelling a doctor's whole day."""
+
+    def setUp(self):
+        """Set up test data."""
+        specialty = Specialty.objects.create(
+            name="Cardiology", description="Heart specialist"
+        )
+        self.admin_user = User.objects.create_user(
+            username="admin",
+            email="admin@test.com",
+            password="testpass123",
+            user_type="admin",
+            is_superuser=True,
+        )
+        doctor_user = User.objects.create_user(
+            username="dr_smith",
+            email="dr.smith@test.com",
+            first_name="John",
+            last_name="Smith",
+            user_type="doctor",
+        )
+        self.doctor = Doctor.objects.create(
+            user=doctor_user,
+            specialty=specialty,
+            license_number="LIC123456",
+            experience_years=5,
+            bio="Experienced cardiologist",
+            consultation_fee=Decimal("100.00"),
+            created_by=self.admin_user,
+        )
+        self.day = date.today() + timedelta(days=1)
+        self.patients = []
+        for hour in (9, 10, 11):
+            slot = TimeSlot.objects.create(
+                doctor=self.doctor,
+                date=self.day,
+                start_time=time(hour, 0),
+                end_time=time(hour, 15),
+                is_available=False,
+            )
+            patient = User.objects.create_user(
+                username=f"patient{hour}", email=f"patient{hour}@test.com"
+            )
+            Appointment.objects.create(
+                patient=patient,
+                doctor=self.doctor,
+                time_slot=slot,
+                status="CONFIRMED",
+                consultation_fee=Decimal("100.00"),
+            )
+            self.patients.append(patient)
+        TimeSlot.objects.create(
+            doctor=self.doctor,
+            date=self.day,
+            start_time=time(12, 0),
+            end_time=time(12, 15),
+        )
+
+    def test_cancel_day_notifies_patients(self):
+        """Test that cancelling a day cancels appointments and notifies everyone."""
+        self.client.login(username="admin", password="testpass123")
+
+        self.client.post(
+            reverse("appointments:delete_day_slots", args=[self.doctor.id]),
+            {"date": self.day.isoformat(), "cancel_appointments": "on"},
+        )
+
+        self.assertFalse(Appointment.objects.exclude(status="CANCELLED").exists())
+        self.assertEqual(TimeSlot.objects.count(), 3)
+        self.assertFalse(TimeSlot.objects.available().exists())
+        for patient in self.patients:
+            patient.refresh_from_db()
+            self.assertEqual(patient.unread_notification_count, 1)
+            self.assertEqual(patient.notifications.get().kind, "appointment_cancelled")
+
+    def test_cancel_day_requires_owner_or_admin(self):
+        """Test that other users cannot cancel a doctor's day."""
+        self.client.force_login(self.patients[0])
+
+        response = self.client.post(
+            reverse("appointments:delete_day_slots", args=[self.doctor.id]),
+            {"date": self.day.isoformat(), "cancel_appointments": "on"},
+        )
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Appointment.objects.filter(status="CONFIRMED").count(), 3)
+        self.assertEqual(TimeSlot.objects.count(), 4)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_delete_day_without_cancel_keeps_appointments(self):
+        """Test that the plain delete still refuses booked days."""
+        self.client.login(username="admin", password="testpass123")
+
+        self.client.post(
+            reverse("appointments:delete_day_slots", args=[self.doctor.id]),
+            {"date": self.day.isoformat()},
+        )
 
-# Create your tests here.
+        self.assertEqual(Appointment.objects.filter(status="CONFIRMED").count(), 3)
+        self.assertFalse(Notification.objects.exists())
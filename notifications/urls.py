@@ -0,0 +1,14 @@
+from django.urls import path
+from . import views
+
+app_name = "notifications"
+
+urlpatterns = [
+    path("", views.notification_list, name="notification_list"),
+    path("read-all/", views.mark_all_read, name="mark_all_read"),
+    path(
+        "<int:notification_id>/read/",
+        views.mark_notification_read,
+        name="mark_notification_read",
+    ),
+]
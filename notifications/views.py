@@ -1,3 +1,52 @@
-from django.shortcuts import render
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.http import require_POST
 
-# Create your views here.
+from .models import Notification
+from .services import NotificationService
+
+
+@login_required
+def notification_list(request):
+    """Show the user's notifications, newest first."""
+    notifications = Notification.objects.filter(user=request.user).order_by(
+        "-created_at"
+    )
+
+    paginator = Paginator(notifications, 20)
+    page_obj = paginator.get_page(request.GET.get("page"))
+
+    context = {
+        "notifications": page_obj,
+        "unread_count": request.user.unread_notification_count,
+    }
+    return render(request, "notifications/notification_list.html", context)
+
+
+@login_required
+@require_POST
+def mark_notification_read(request, notification_id):
+    """Mark one notification read and follow its link."""
+    notification = get_object_or_404(
+        Notification, id=notification_id, user=request.user
+    )
+    NotificationService.mark_read(request.user, [notification.id])
+
+    if notification.link and url_has_allowed_host_and_scheme(
+        notification.link, allowed_hosts={request.get_host()}
+    ):
+        return redirect(notification.link)
+    return redirect("notifications:notification_list")
+
+
+@login_required
+@require_POST
+def mark_all_read(request):
+    """Mark every unread notification read."""
+    marked = NotificationService.mark_read(request.user)
+    if marked:
+        messages.success(request, f"Marked {marked} notification(s) as read.")
+    return redirect("notifications:notification_list")
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from core.exports import export_action
 from payments.models import Payment, WalletTransaction
 
 @admin.register(WalletTransaction)
@@ -6,9 +7,15 @@ class WalletTransactionAdmin(admin.ModelAdmin):
     list_display = ['user_id_id','amount', 'transaction_type', 'balance_after']
     list_filter = ['transaction_type']
     search_fields = ['transaction_type']
+    actions = [
+        export_action('wallet_transactions', 'csv'),
+        export_action('wallet_transactions', 'jsonl'),
+    ]
 
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
     list_display = ['appointment_id', 'amount', 'status']
-    search_fields = ['appointment_id']
\ No newline at end of file
+    list_select_related = ['appointment_id__patient', 'appointment_id__doctor__user']
+    search_fields = ['appointment_id']
+    actions = [export_action('payments', 'csv'), export_action('payments', 'jsonl')]
\ No newline at end of file
@@ -0,0 +1,117 @@
+"""
+Card payment gateways.
+
+The backend is chosen with the PAYMENT_GATEWAY setting, in the same
+BACKEND/OPTIONS shape as CACHES. Only a local mock exists so far; a real
+provider implements ``charge`` and confirms charges through the signed
+webhook at ``payments:gateway_webhook``.
+"""
+
+import hashlib
+import hmac
+import random
+import time
+import uuid
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+_gateway = None
+
+
+class GatewayError(Exception):
+    """The gateway could not be reached or timed out; the charge may be retried."""
+
+
+@dataclass(frozen=True)
+class GatewayResult:
+    """Outcome of a charge the gateway has decided on."""
+
+    succeeded: bool
+    reference: str = ""
+    error: str = ""
+
+
+class PaymentGateway:
+    """Interface of a card payment provider."""
+
+    def charge(self, payment, idempotency_key):
+        """
+        Authorise and capture ``payment.amount``.
+
+        Blocks for as long as the provider takes, so it must only be called
+        off the request thread (see CaptureWorker).
+
+        ``idempotency_key`` is the same on every attempt at one payment and
+        must be sent to the provider, so a retry after a timeout returns the
+        first charge instead of charging the card again.
+
+        Returns:
+            GatewayResult: Whether the card was charged
+
+        Raises:
+            GatewayError: The outcome is unknown and the charge should be retried
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def sign(body):
+        """Return the hex HMAC-SHA256 of a webhook body."""
+        return hmac.new(
+            settings.PAYMENT_WEBHOOK_SECRET.encode(), body, hashlib.sha256
+        ).hexdigest()
+
+    @classmethod
+    def verify(cls, body, signature):
+        return hmac.compare_digest(cls.sign(body), signature or "")
+
+
+class MockGateway(PaymentGateway):
+    """
+    Local stand-in for a card provider.
+
+    Sleeps for ``latency`` seconds per charge, declines ``decline_rate`` of
+    them and fails ``error_rate`` of them with a GatewayError, so timeouts
+    and declines can be exercised without a real account. A timed-out
+    charge has still gone through; like a real provider the mock remembers
+    each idempotency key, and a retry with the same key gets that charge.
+    """
+
+    def __init__(self, latency=0.5, decline_rate=0.0, error_rate=0.0, seed=None):
+        self.latency = float(latency)
+        self.decline_rate = float(decline_rate)
+        self.error_rate = float(error_rate)
+        self.random = random.Random(seed)
+        self.charges = {}
+
+    def charge(self, payment, idempotency_key):
+        time.sleep(self.latency)
+        if idempotency_key in self.charges:
+            return self.charges[idempotency_key]
+        roll = self.random.random()
+        declined = self.error_rate <= roll < self.error_rate + self.decline_rate
+        if declined:
+            result = GatewayResult(succeeded=False, error="Card declined")
+        else:
+            result = GatewayResult(succeeded=True, reference=f"mock_{uuid.uuid4().hex}")
+        self.charges[idempotency_key] = result
+        if roll < self.error_rate:
+            # The card was charged but the response never arrived
+            raise GatewayError("Mock gateway timed out")
+        return result
+
+
+def get_gateway():
+    """Return the configured gateway, built once per process."""
+    global _gateway
+    if _gateway is None:
+        config = settings.PAYMENT_GATEWAY
+        _gateway = import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+    return _gateway
+
+
+def reset_gateway():
+    """Drop the cached gateway, e.g. after changing PAYMENT_GATEWAY in tests."""
+    global _gateway
+    _gateway = None
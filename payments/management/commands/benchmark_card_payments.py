@@ -0,0 +1,149 @@
+import statistics
+import time
+import uuid
+from datetime import date, timedelta
+from datetime import time as clock
+from decimal import Decimal
+
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.urls import reverse
+
+from accounts.models import User
+from appointments.models import Appointment, TimeSlot
+from doctors.models import Doctor, Specialty
+from payments import gateways
+from payments.gateways import MockGateway
+from payments.models import Payment
+from payments.views import process_payment
+from payments.workers import CaptureWorker
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure card payment request latency against simulated gateway latency. "
+        "Creates throwaway bench_* users and slots and deletes them afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--latency",
+            type=float,
+            nargs="+",
+            default=[0.0, 0.25, 0.5, 1.0],
+            help="Gateway latencies to simulate, in seconds",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=20,
+            help="Card payments submitted per latency",
+        )
+
+    def handle(self, *args, **options):
+        if not 0 < options["requests"] <= 96:
+            raise CommandError("--requests must be between 1 and 96")
+
+        tag = uuid.uuid4().hex[:8]
+        specialty = Specialty.objects.create(
+            name=f"bench_{tag}", description="Benchmark"
+        )
+        admin = User.objects.create_user(
+            username=f"bench_admin_{tag}", email=f"bench_admin_{tag}@example.com"
+        )
+        patient = User.objects.create_user(
+            username=f"bench_patient_{tag}", email=f"bench_patient_{tag}@example.com"
+        )
+        doctor = Doctor.objects.create(
+            user=User.objects.create_user(
+                username=f"bench_doctor_{tag}",
+                email=f"bench_doctor_{tag}@example.com",
+                user_type="doctor",
+            ),
+            specialty=specialty,
+            license_number=f"BENCH-{tag}",
+            experience_years=1,
+            bio="Benchmark",
+            consultation_fee=Decimal("100.00"),
+            created_by=admin,
+        )
+        factory = RequestFactory()
+        original_gateway = gateways._gateway
+
+        self.stdout.write(
+            f"{'gateway':>9} {'inline':>9} {'req p50':>9} {'req p95':>9} {'settled':>9}"
+        )
+        try:
+            for index, latency in enumerate(options["latency"]):
+                gateways._gateway = MockGateway(latency=latency)
+
+                # What the request used to pay: one synchronous gateway call
+                started = time.perf_counter()
+                gateways._gateway.charge(None, uuid.uuid4().hex)
+                inline = time.perf_counter() - started
+
+                timings, payment_ids = [], []
+                for number in range(options["requests"]):
+                    appointment = self._appointment(doctor, patient, index, number)
+                    request = factory.post(
+                        reverse("payments:process_payment", args=[appointment.id]),
+                        {
+                            "payment_method": "card",
+                            "idempotency_key": uuid.uuid4().hex,
+                        },
+                    )
+                    request.user = patient
+                    request.session = SessionBase()
+                    request._messages = FallbackStorage(request)
+
+                    started = time.perf_counter()
+                    process_payment(request, appointment.id)
+                    timings.append(time.perf_counter() - started)
+                    payment_ids.append(
+                        Payment.objects.get(appointment_id=appointment).pk
+                    )
+
+                # Let the pool drain before counting settled payments
+                CaptureWorker.shutdown(wait=True)
+                settled = Payment.objects.filter(
+                    pk__in=payment_ids, status=Payment.SUCCESS
+                ).count()
+                p95 = sorted(timings)[max(0, int(len(timings) * 0.95) - 1)]
+                self.stdout.write(
+                    f"{latency * 1000:>7.0f}ms {inline * 1000:>7.1f}ms "
+                    f"{statistics.median(timings) * 1000:>7.1f}ms "
+                    f"{p95 * 1000:>7.1f}ms {settled:>5}/{len(timings)}"
+                )
+        finally:
+            CaptureWorker.shutdown(wait=True)
+            gateways._gateway = original_gateway
+            patient.delete()
+            doctor_user = doctor.user
+            doctor.delete()
+            doctor_user.delete()
+            admin.delete()
+            specialty.delete()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Request latency should stay flat while the inline column grows."
+            )
+        )
+
+    def _appointment(self, doctor, patient, index, number):
+        slot = TimeSlot.objects.create(
+            doctor=doctor,
+            date=date.today() + timedelta(days=365 + index),
+            start_time=clock(number // 4, (number % 4) * 15),
+            end_time=clock(number // 4, (number % 4) * 15 + 14),
+            is_available=False,
+        )
+        return Appointment.objects.create(
+            patient=patient,
+            doctor=doctor,
+            time_slot=slot,
+            status="PENDING",
+            consultation_fee=doctor.consultation_fee,
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from payments.services import CardPaymentService
+
+
+class Command(BaseCommand):
+    help = "Capture pending card payments the background workers did not get to"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Maximum number of pending payments captured per run",
+        )
+
+    def handle(self, *args, **options):
+        settled, pending = CardPaymentService.capture_stale(options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Settled {settled} card payment(s); {pending} still pending."
+            )
+        )
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 09:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0003_appointment_reminders"),
+        ("payments", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["created_at"], name="payments_pa_created_b8a300_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="wallettransaction",
+            index=models.Index(
+                fields=["created_at"], name="payments_wa_created_a3d6ca_idx"
+            ),
+        ),
+    ]
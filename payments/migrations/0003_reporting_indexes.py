@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0004_rollup_source_indexes"),
+        ("payments", "0002_created_at_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["status", "created_at"], name="payments_pa_status_343680_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="wallettransaction",
+            index=models.Index(
+                fields=["user_id", "created_at"], name="payments_wa_user_id_545472_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0003_reporting_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payment",
+            name="idempotency_key",
+            field=models.CharField(
+                blank=True, editable=False, max_length=64, null=True, unique=True
+            ),
+        ),
+    ]
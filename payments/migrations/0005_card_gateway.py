@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0004_payment_idempotency_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payment",
+            name="gateway_reference",
+            field=models.CharField(
+                blank=True, default="", editable=False, max_length=64
+            ),
+        ),
+        migrations.AlterField(
+            model_name="payment",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("failed", "Filed"),
+                    ("success", "Success"),
+                    ("pending", "Pending"),
+                ],
+                max_length=20,
+            ),
+        ),
+    ]
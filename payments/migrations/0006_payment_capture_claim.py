@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0005_card_gateway"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payment",
+            name="capture_started_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
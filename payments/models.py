@@ -7,14 +7,24 @@ from accounts.models import User
 class Payment(models.Model):
     FILED = "failed"
     SUCCESS = 'success'
+    PENDING = 'pending'
     STATUS_CHOICES = (
         (FILED, 'Filed'),
         (SUCCESS, 'Success'),
+        (PENDING, 'Pending'),
     )
     appointment_id = models.ForeignKey(Appointment, on_delete=models.CASCADE)
     amount = models.DecimalField(decimal_places=2, max_digits=20)
     status = models.CharField(choices=STATUS_CHOICES, max_length=20)
     transaction_id = models.UUIDField(default=uuid.uuid4, editable=False)
+    # Client-supplied key of the request that created this payment; the
+    # unique index turns a retried submission into a cheap lookup
+    idempotency_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+    # Card payments: the gateway's id for the charge, set once it is captured
+    gateway_reference = models.CharField(max_length=64, blank=True, default='', editable=False)
+    # Card payments: when a capturer claimed the gateway call; while the claim
+    # is fresh no other worker or sweep charges the card
+    capture_started_at = models.DateTimeField(null=True, blank=True, editable=False)
     paid_at = models.DateTimeField(auto_now_add=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -26,6 +36,11 @@ class Payment(models.Model):
         verbose_name = "Payment"
         verbose_name_plural = "Payments"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            # Finance reports filter successful payments by period
+            models.Index(fields=['status', 'created_at']),
+        ]
 
 
 class WalletTransaction(models.Model):
@@ -44,13 +59,20 @@ class WalletTransaction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.user_id}, {str(self.amount)}, {self.description}, {str(self.appointment_id)}, {self.transaction_type}, {self.created_at}"
+        # Use the raw foreign keys so listing transactions never loads the
+        # user or the appointment (and its slot and doctor) once per row
+        return f"{self.user_id_id}, {str(self.amount)}, {self.description}, {self.appointment_id_id}, {self.transaction_type}, {self.created_at}"
 
 
     class Meta:
         verbose_name = 'Wallet Transaction'
         verbose_name_plural = 'Wallet Transactions'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            # Per-user history and balances as of a date
+            models.Index(fields=['user_id', 'created_at']),
+        ]
 
 
 
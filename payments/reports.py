@@ -0,0 +1,331 @@
+"""
+Finance reports over Payment and WalletTransaction.
+
+Every report is computed one calendar month at a time with grouped
+aggregates over an indexed ``created_at`` range. A month that has ended can
+no longer change, so its rows are cached without expiry; only the current
+month is recomputed on each request. A closed month that still has a card
+payment awaiting capture is not cached either: the payment counts in the month
+it was created once the gateway settles it.
+"""
+
+from contextlib import nullcontext
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Callable
+
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from appointments.models import Appointment
+from core.routers import primary_reads
+from .models import Payment, WalletTransaction
+
+CENT = Decimal("0.01")
+ZERO = Value(Decimal("0"), output_field=DecimalField(max_digits=20, decimal_places=2))
+
+
+@dataclass(frozen=True)
+class ReportSpec:
+    """Columns and row builder of one finance report."""
+
+    # (name, kind) pairs; kind is one of "int", "money", "rate", "str"
+    columns: tuple
+    # Called with the aware [start, end) bounds of a month, returns dict rows
+    compute: Callable
+
+
+def _money(value):
+    return (value or Decimal("0")).quantize(CENT)
+
+
+def _rate(part, whole):
+    return round(float(part) / float(whole), 4) if whole else 0.0
+
+
+def previous_month(month):
+    if month.month == 1:
+        return date(month.year - 1, 12, 1)
+    return date(month.year, month.month - 1, 1)
+
+
+def next_month(month):
+    if month.month == 12:
+        return date(month.year + 1, 1, 1)
+    return date(month.year, month.month + 1, 1)
+
+
+def _revenue(start, end):
+    totals = Payment.objects.filter(
+        created_at__gte=start, created_at__lt=end
+    ).aggregate(
+        payments=Count("id", filter=Q(status=Payment.SUCCESS)),
+        failed=Count("id", filter=Q(status=Payment.FILED)),
+        revenue=Sum("amount", filter=Q(status=Payment.SUCCESS)),
+    )
+    return [
+        {
+            "payments": totals["payments"],
+            "failed": totals["failed"],
+            "revenue": _money(totals["revenue"]),
+        }
+    ]
+
+
+def _successful_payments(start, end):
+    # Served by the (status, created_at) index
+    return Payment.objects.filter(
+        status=Payment.SUCCESS, created_at__gte=start, created_at__lt=end
+    )
+
+
+def _revenue_by_doctor(start, end):
+    rows = (
+        _successful_payments(start, end)
+        .values(
+            "appointment_id__doctor_id",
+            "appointment_id__doctor__user__first_name",
+            "appointment_id__doctor__user__last_name",
+            "appointment_id__doctor__specialty__name",
+        )
+        .annotate(payments=Count("id"), revenue=Sum("amount"))
+        .order_by("-revenue", "appointment_id__doctor_id")
+    )
+    return [
+        {
+            "doctor_id": row["appointment_id__doctor_id"],
+            "doctor": " ".join(
+                filter(
+                    None,
+                    (
+                        row["appointment_id__doctor__user__first_name"],
+                        row["appointment_id__doctor__user__last_name"],
+                    ),
+                )
+            ),
+            "specialty": row["appointment_id__doctor__specialty__name"],
+            "payments": row["payments"],
+            "revenue": _money(row["revenue"]),
+        }
+        for row in rows
+    ]
+
+
+def _revenue_by_specialty(start, end):
+    rows = (
+        _successful_payments(start, end)
+        .values("appointment_id__doctor__specialty__name")
+        .annotate(
+            doctors=Count("appointment_id__doctor", distinct=True),
+            payments=Count("id"),
+            revenue=Sum("amount"),
+        )
+        .order_by("-revenue", "appointment_id__doctor__specialty__name")
+    )
+    return [
+        {
+            "specialty": row["appointment_id__doctor__specialty__name"],
+            "doctors": row["doctors"],
+            "payments": row["payments"],
+            "revenue": _money(row["revenue"]),
+        }
+        for row in rows
+    ]
+
+
+def _rates(start, end):
+    appointments = Appointment.objects.filter(
+        time_slot__date__gte=timezone.localdate(start),
+        time_slot__date__lt=timezone.localdate(end),
+    ).aggregate(
+        total=Count("id"),
+        cancelled=Count("id", filter=Q(status="CANCELLED")),
+    )
+    revenue = _successful_payments(start, end).aggregate(total=Sum("amount"))["total"]
+    # Money credited back to a wallet against an appointment is a refund
+    refunds = WalletTransaction.objects.filter(
+        created_at__gte=start,
+        created_at__lt=end,
+        transaction_type=WalletTransaction.DEPOSIT,
+        appointment_id__isnull=False,
+    ).aggregate(count=Count("id"), total=Sum("amount"))
+    return [
+        {
+            "appointments": appointments["total"],
+            "cancelled": appointments["cancelled"],
+            "cancellation_rate": _rate(
+                appointments["cancelled"], appointments["total"]
+            ),
+            "revenue": _money(revenue),
+            "refunds": refunds["count"],
+            "refunded": _money(refunds["total"]),
+            "refund_rate": _rate(refunds["total"] or 0, revenue),
+        }
+    ]
+
+
+def _flows(queryset):
+    return queryset.aggregate(
+        deposits=Coalesce(
+            Sum("amount", filter=Q(transaction_type=WalletTransaction.DEPOSIT)), ZERO
+        ),
+        withdrawals=Coalesce(
+            Sum("amount", filter=Q(transaction_type=WalletTransaction.WITHDRAW)), ZERO
+        ),
+    )
+
+
+def _wallet_float(start, end):
+    flows = _flows(
+        WalletTransaction.objects.filter(created_at__gte=start, created_at__lt=end)
+    )
+    # The previous month's closing float is usually cached; otherwise fall
+    # back to one aggregate over everything before this month
+    previous = cache.get(
+        FinanceReportService.cache_key(
+            "wallet_float", previous_month(timezone.localdate(start))
+        )
+    )
+    if previous is not None:
+        opening = previous[0]["closing_float"]
+    else:
+        before = _flows(WalletTransaction.objects.filter(created_at__lt=start))
+        opening = before["deposits"] - before["withdrawals"]
+    closing = opening + flows["deposits"] - flows["withdrawals"]
+    return [
+        {
+            "opening_float": _money(opening),
+            "deposits": _money(flows["deposits"]),
+            "withdrawals": _money(flows["withdrawals"]),
+            "closing_float": _money(closing),
+        }
+    ]
+
+
+REPORTS = {
+    "revenue": ReportSpec(
+        columns=(("payments", "int"), ("failed", "int"), ("revenue", "money")),
+        compute=_revenue,
+    ),
+    "revenue_by_doctor": ReportSpec(
+        columns=(
+            ("doctor_id", "int"),
+            ("doctor", "str"),
+            ("specialty", "str"),
+            ("payments", "int"),
+            ("revenue", "money"),
+        ),
+        compute=_revenue_by_doctor,
+    ),
+    "revenue_by_specialty": ReportSpec(
+        columns=(
+            ("specialty", "str"),
+            ("doctors", "int"),
+            ("payments", "int"),
+            ("revenue", "money"),
+        ),
+        compute=_revenue_by_specialty,
+    ),
+    "rates": ReportSpec(
+        columns=(
+            ("appointments", "int"),
+            ("cancelled", "int"),
+            ("cancellation_rate", "rate"),
+            ("revenue", "money"),
+            ("refunds", "int"),
+            ("refunded", "money"),
+            ("refund_rate", "rate"),
+        ),
+        compute=_rates,
+    ),
+    "wallet_float": ReportSpec(
+        columns=(
+            ("opening_float", "money"),
+            ("deposits", "money"),
+            ("withdrawals", "money"),
+            ("closing_float", "money"),
+        ),
+        compute=_wallet_float,
+    ),
+}
+
+
+class FinanceReportService:
+    CACHE_PREFIX = "finance-report"
+
+    @staticmethod
+    def cache_key(report, month):
+        return f"{FinanceReportService.CACHE_PREFIX}:{report}:{month:%Y-%m}"
+
+    @staticmethod
+    def months(start, end):
+        """Yield the first day of every month from ``start`` to ``end`` inclusive."""
+        month = start.replace(day=1)
+        while month <= end:
+            yield month
+            month = next_month(month)
+
+    @staticmethod
+    def is_closed(month):
+        """Return True if ``month`` has ended, so its figures can no longer change."""
+        return month < timezone.localdate().replace(day=1)
+
+    @staticmethod
+    def month_rows(report, month):
+        """
+        Return the rows of ``report`` for one calendar month.
+
+        Closed months are served from the cache once computed; the current
+        (or a future) month, and a closed month with payments still pending
+        capture, are always recomputed.
+
+        Args:
+            report: Key of REPORTS
+            month: Any date in the month
+
+        Returns:
+            list: Row dicts keyed by the report's column names
+        """
+        month = month.replace(day=1)
+        closed = FinanceReportService.is_closed(month)
+        key = FinanceReportService.cache_key(report, month)
+        if closed:
+            rows = cache.get(key)
+            if rows is not None:
+                return rows
+
+        start = timezone.make_aware(datetime.combine(month, time.min))
+        end = timezone.make_aware(datetime.combine(next_month(month), time.min))
+        # A closed month is cached for good, so it is not read from a
+        # replica that may still be missing its last writes
+        with primary_reads() if closed else nullcontext():
+            # A card payment captured after month end still belongs to this
+            # month, so the figures are final only once none is pending. Checked
+            # first: one settling during the compute is then still caught
+            if closed:
+                closed = not Payment.objects.filter(
+                    status=Payment.PENDING, created_at__gte=start, created_at__lt=end
+                ).exists()
+            rows = REPORTS[report].compute(start, end)
+        if closed:
+            cache.set(key, rows, timeout=None)
+        return rows
+
+    @staticmethod
+    def rows(report, start, end):
+        """
+        Yield the rows of ``report`` for every month from ``start`` to ``end``.
+
+        Each row starts with a ``month`` column. Months are computed lazily,
+        so a long range can be written out without holding it in memory.
+        """
+        for month in FinanceReportService.months(start, end):
+            for row in FinanceReportService.month_rows(report, month):
+                yield {"month": month, **row}
+
+    @staticmethod
+    def headers(report):
+        return ["month"] + [name for name, _kind in REPORTS[report].columns]
@@ -0,0 +1,393 @@
+import logging
+import re
+import uuid
+from contextlib import nullcontext
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q, Sum
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from appointments.models import Appointment
+from ledger.services import LedgerService
+from appointments.services import AppointmentHoldService, AppointmentTransitionService
+from core.routers import primary_reads
+from notifications.services import NotificationService
+from .gateways import GatewayError, get_gateway
+from .models import Payment, WalletTransaction
+from .reports import FinanceReportService, next_month
+from .workers import CaptureWorker
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentError(Exception):
+    """A payment that cannot go through; the message is shown to the user."""
+
+
+class HoldExpired(PaymentError):
+    """The reservation lapsed and its slot was released."""
+
+
+class InsufficientFunds(PaymentError):
+    """The wallet cannot cover the consultation fee."""
+
+
+class AlreadyPaid(PaymentError):
+    """The appointment is no longer waiting for a payment."""
+
+
+class PaymentService:
+    METHODS = ("wallet", "card")
+    REPLAY_PREFIX = "payment-replay"
+    KEY_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+    @staticmethod
+    def clean_key(key):
+        """
+        Return ``key`` if it is a usable idempotency key, else a fresh one.
+
+        Requests without a valid key still go through, they just cannot be
+        recognised when retried.
+        """
+        if key and PaymentService.KEY_PATTERN.match(key):
+            return key
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def replay_cache_key(user_id, key):
+        return f"{PaymentService.REPLAY_PREFIX}:{user_id}:{key}"
+
+    @staticmethod
+    def get_replay(user_id, key):
+        """Return the stored outcome of an already processed request, if any."""
+        return cache.get(PaymentService.replay_cache_key(user_id, key))
+
+    @staticmethod
+    def store_replay(user_id, key, outcome):
+        """Remember the outcome of a request for PAYMENT_IDEMPOTENCY_TTL seconds."""
+        cache.set(
+            PaymentService.replay_cache_key(user_id, key),
+            outcome,
+            settings.PAYMENT_IDEMPOTENCY_TTL,
+        )
+
+    @staticmethod
+    def pay(user, appointment, method, idempotency_key):
+        """
+        Charge ``user`` for ``appointment`` exactly once per idempotency key.
+
+        The Payment row carrying the key is inserted first, so a concurrent
+        or retried duplicate fails on the unique index and returns the
+        existing payment instead of repeating the work. Only the winner
+        goes on to lock the appointment and the payer's wallet; anything
+        that goes wrong after the insert rolls it back with the rest.
+
+        Args:
+            user: The paying patient
+            appointment: The PENDING appointment to pay for
+            method: "wallet" or "card"
+            idempotency_key: Key of the submitted request (see clean_key)
+
+        Returns:
+            tuple: (payment, created); ``created`` is False for a replay
+
+        Raises:
+            HoldExpired: The reservation lapsed before the payment
+            AlreadyPaid: The appointment was already paid or cancelled
+            InsufficientFunds: The wallet balance is below the fee
+            PaymentError: The key belongs to another user's payment
+        """
+        fee = appointment.consultation_fee
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    payment = Payment.objects.create(
+                        appointment_id=appointment,
+                        amount=fee,
+                        status=Payment.SUCCESS,
+                        idempotency_key=idempotency_key,
+                    )
+            except IntegrityError:
+                existing = Payment.objects.filter(
+                    idempotency_key=idempotency_key, appointment_id__patient=user
+                ).first()
+                if existing is None:
+                    raise PaymentError("This payment request is not valid.")
+                return existing, False
+
+            # Serialises with release_expired_holds and with a second
+            # submission that carries a different key
+            locked = Appointment.objects.select_for_update().get(pk=appointment.pk)
+            if locked.status == "EXPIRED" or locked.hold_expired:
+                raise HoldExpired(
+                    "Your reservation has expired and the time slot was released. "
+                    "Please book again."
+                )
+            if locked.status != "PENDING":
+                raise AlreadyPaid("This appointment has already been paid for.")
+
+            if method == "wallet":
+                # Re-read the balance under the lock; request.user may be stale
+                payer = User.objects.select_for_update().get(pk=user.pk)
+                if payer.wallet_balance < fee:
+                    raise InsufficientFunds(
+                        "Insufficient funds in wallet. Please add funds or use "
+                        "another payment method."
+                    )
+                payer.wallet_balance -= fee
+                payer.save(update_fields=["wallet_balance", "updated_at"])
+                user.wallet_balance = payer.wallet_balance
+                wallet_transaction = WalletTransaction.objects.create(
+                    user_id=payer,
+                    transaction_type=WalletTransaction.WITHDRAW,
+                    amount=fee,
+                    description=f"Payment for appointment with Dr. {appointment.doctor.user.get_full_name()}",
+                    balance_after=payer.wallet_balance,
+                    appointment_id=locked,
+                )
+                LedgerService.record_payment(
+                    payment, locked.doctor_id, wallet_transaction
+                )
+
+            if method == "card":
+                # The gateway call happens off the request thread; the slot
+                # stays taken while the charge is in flight
+                payment.status = Payment.PENDING
+                payment.save(update_fields=["status"])
+                locked.status = "PENDING_PAYMENT"
+                transaction.on_commit(lambda: CaptureWorker.submit(payment.pk))
+            else:
+                locked.status = "CONFIRMED"
+                locked.hold_expires_at = None
+            locked.save()
+            AppointmentTransitionService.record(
+                [(locked.pk, "PENDING")], locked.status, user, reason="payment"
+            )
+            appointment.status = locked.status
+            appointment.hold_expires_at = locked.hold_expires_at
+        return payment, True
+
+
+class CardPaymentService:
+    # Pending card payments older than this are picked up by capture_payments;
+    # younger ones are still queued in (or running on) the CaptureWorker pool
+    SWEEP_AFTER = timedelta(minutes=2)
+    # A claim older than this belongs to a capturer that died mid-call; it
+    # must outlast the slowest gateway call
+    CLAIM_TIMEOUT = timedelta(minutes=5)
+
+    @staticmethod
+    def _claimable(now):
+        return Q(capture_started_at__isnull=True) | Q(
+            capture_started_at__lte=now - CardPaymentService.CLAIM_TIMEOUT
+        )
+
+    @staticmethod
+    def capture(payment_id, gateway=None):
+        """
+        Charge a pending card payment through the gateway and apply the result.
+
+        A conditional UPDATE claims the payment first, so of a worker and a
+        sweep racing for it only one calls the gateway. Every attempt sends
+        the payment's ``transaction_id`` as the provider's idempotency key,
+        so retrying a charge whose outcome was lost cannot charge twice.
+
+        The gateway call runs outside any transaction, so no row lock is held
+        while it waits. A real provider also confirms through the webhook;
+        whichever confirmation arrives second is a no-op.
+
+        Returns:
+            bool: True if the payment was settled by this call
+        """
+        now = timezone.now()
+        claimed = Payment.objects.filter(
+            CardPaymentService._claimable(now), pk=payment_id, status=Payment.PENDING
+        ).update(capture_started_at=now)
+        if not claimed:
+            return False
+        payment = Payment.objects.select_related("appointment_id").get(pk=payment_id)
+        try:
+            result = (gateway or get_gateway()).charge(
+                payment, str(payment.transaction_id)
+            )
+        except GatewayError:
+            # Outcome unknown: release the claim and leave it pending for the
+            # next sweep, which retries with the same idempotency key
+            logger.warning("Gateway error for payment %s; will retry", payment_id)
+            Payment.objects.filter(pk=payment_id, capture_started_at=now).update(
+                capture_started_at=None
+            )
+            return False
+        return CardPaymentService.apply_result(payment_id, result)
+
+    @staticmethod
+    def apply_result(payment_id, result):
+        """
+        Settle a pending payment from a gateway result (worker or webhook).
+
+        A successful charge confirms the appointment. A declined one marks
+        the payment failed and gives the appointment back a fresh hold so
+        the patient can pay another way.
+
+        Returns:
+            bool: False if the payment was not pending (already settled)
+        """
+        with transaction.atomic():
+            payment = (
+                Payment.objects.select_for_update()
+                .filter(pk=payment_id, status=Payment.PENDING)
+                .first()
+            )
+            if payment is None:
+                return False
+            appointment = Appointment.objects.select_for_update().get(
+                pk=payment.appointment_id_id
+            )
+            source = appointment.status
+
+            if result.succeeded:
+                payment.status = Payment.SUCCESS
+                payment.paid_at = timezone.now()
+                payment.gateway_reference = result.reference
+                appointment.status = "CONFIRMED"
+                appointment.hold_expires_at = None
+                LedgerService.record_payment(payment, appointment.doctor_id)
+                transaction.on_commit(
+                    lambda: CardPaymentService._send_confirmation(appointment)
+                )
+            else:
+                payment.status = Payment.FILED
+                appointment.status = "PENDING"
+                appointment.hold_expires_at = AppointmentHoldService.hold_expiry()
+                transaction.on_commit(
+                    lambda: NotificationService.notify(
+                        appointment.patient,
+                        f"Your card payment was not accepted ({result.error or 'declined'}). "
+                        "Your slot is held while you try another payment method.",
+                        link=reverse("payments:process_payment", args=[appointment.pk]),
+                    )
+                )
+            payment.save(update_fields=["status", "paid_at", "gateway_reference"])
+            appointment.save()
+            AppointmentTransitionService.record(
+                [(appointment.pk, source)], appointment.status, reason="gateway"
+            )
+        return True
+
+    @staticmethod
+    def _send_confirmation(appointment):
+        from appointments.services import AppointmentEmailService
+
+        try:
+            AppointmentEmailService.send_payment_confirmation(appointment)
+        except Exception as e:
+            # Don't fail the payment if email fails
+            logger.warning("Could not send payment confirmation email: %s", e)
+
+    @staticmethod
+    def capture_stale(batch_size=100, gateway=None):
+        """
+        Capture pending card payments the worker pool never got to.
+
+        Covers payments left behind by a full queue or a restarted process.
+        Payments a capturer has claimed are skipped until the claim times out.
+
+        Returns:
+            tuple: (settled, still pending)
+        """
+        now = timezone.now()
+        cutoff = now - CardPaymentService.SWEEP_AFTER
+        payment_ids = list(
+            Payment.objects.filter(
+                CardPaymentService._claimable(now),
+                status=Payment.PENDING,
+                created_at__lte=cutoff,
+            )
+            .order_by("created_at")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        settled = sum(
+            CardPaymentService.capture(payment_id, gateway)
+            for payment_id in payment_ids
+        )
+        return settled, len(payment_ids) - settled
+
+
+class WalletStatementService:
+    CACHE_PREFIX = "wallet-statement"
+
+    @staticmethod
+    def cache_key(user_id, month):
+        return f"{WalletStatementService.CACHE_PREFIX}:{user_id}:{month:%Y-%m}"
+
+    @staticmethod
+    def _balance_before(user_id, moment):
+        """Running balance of the user's last transaction before ``moment``."""
+        return (
+            WalletTransaction.objects.filter(user_id=user_id, created_at__lt=moment)
+            .order_by("-created_at", "-id")
+            .values_list("balance_after", flat=True)
+            .first()
+        )
+
+    @staticmethod
+    def monthly_statement(user_id, month):
+        """
+        Summarise one month of a user's wallet activity.
+
+        Opening and closing balances are read from the ``balance_after`` of
+        the last transaction before each boundary (one indexed lookup each)
+        instead of summing the whole history; the month's deposits and
+        withdrawals come from a single aggregate. Closed months are cached.
+
+        Args:
+            user_id: ID of the wallet owner
+            month: Any date in the month
+
+        Returns:
+            dict: month, opening_balance, deposits, withdrawals, transactions
+            and closing_balance
+        """
+        month = month.replace(day=1)
+        closed = FinanceReportService.is_closed(month)
+        key = WalletStatementService.cache_key(user_id, month)
+        if closed:
+            statement = cache.get(key)
+            if statement is not None:
+                return statement
+
+        start = timezone.make_aware(datetime.combine(month, time.min))
+        end = timezone.make_aware(datetime.combine(next_month(month), time.min))
+        # Closed months are cached for good, so not read from a lagging replica
+        with primary_reads() if closed else nullcontext():
+            opening = WalletStatementService._balance_before(user_id, start)
+            closing = WalletStatementService._balance_before(user_id, end)
+            totals = WalletTransaction.objects.filter(
+                user_id=user_id, created_at__gte=start, created_at__lt=end
+            ).aggregate(
+                transactions=Count("id"),
+                deposits=Sum(
+                    "amount", filter=Q(transaction_type=WalletTransaction.DEPOSIT)
+                ),
+                withdrawals=Sum(
+                    "amount", filter=Q(transaction_type=WalletTransaction.WITHDRAW)
+                ),
+            )
+        opening = opening if opening is not None else Decimal("0.00")
+        statement = {
+            "month": month,
+            "opening_balance": opening,
+            "deposits": totals["deposits"] or Decimal("0.00"),
+            "withdrawals": totals["withdrawals"] or Decimal("0.00"),
+            "transactions": totals["transactions"],
+            "closing_balance": closing if closing is not None else opening,
+        }
+        if closed:
+            cache.set(key, statement, timeout=None)
+        return statement
@@ -1,3 +1,552 @@
+import csv
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from appointments.models import Appointment, TimeSlot
+from doctors.models import Doctor, Specialty
+from .gateways import MockGateway, PaymentGateway
+from .models import Payment, WalletTransaction
+from .reports import FinanceReportService
+from .services import CardPaymentService
+
+User = get_user_model()
+
+
+class FinanceReportTest(TestCase):
+    """Test cases for the monthly finance reports."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        admin_user = User.objects.create_user(
+            username="admin", email="admin@test.com", user_type="admin"
+        )
+        self.patient = User.objects.create_user(
+            username="patient", email="patient@test.com"
+        )
+        cardiology = Specialty.objects.create(
+            name="Cardiology", description="Heart specialist"
+        )
+        self.doctors = [
+            Doctor.objects.create(
+                user=User.objects.create_user(
+                    username=f"dr_{name.lower()}",
+                    email=f"{name.lower()}@test.com",
+                    first_name="Dr",
+                    last_name=name,
+                    user_type="doctor",
+                ),
+                specialty=cardiology,
+                license_number=f"LIC{index}",
+                experience_years=5,
+                bio="Cardiologist",
+                consultation_fee=Decimal("100.00"),
+                created_by=admin_user,
+            )
+            for index, name in enumerate(("Smith", "Jones"))
+        ]
+        # A closed month, well before the current one
+        self.month = (timezone.localdate().replace(day=1) - timedelta(days=40)).replace(
+            day=1
+        )
+        self.when = timezone.make_aware(
+            datetime.combine(self.month + timedelta(days=9), time(12, 0))
+        )
+        for doctor, amounts in (
+            (self.doctors[0], ("100.00", "50.00")),
+            (self.doctors[1], ("80.00",)),
+        ):
+            for amount in amounts:
+                self._pay(doctor, Decimal(amount), Payment.SUCCESS)
+        self._pay(self.doctors[1], Decimal("80.00"), Payment.FILED)
+        self._wallet(
+            WalletTransaction.DEPOSIT, "300.00", self.when - timedelta(days=40)
+        )
+        self._wallet(WalletTransaction.DEPOSIT, "200.00", self.when)
+        self._wallet(WalletTransaction.WITHDRAW, "150.00", self.when)
+
+    def _pay(self, doctor, amount, status):
+        slot = TimeSlot.objects.create(
+            doctor=doctor,
+            date=date.today() + timedelta(days=TimeSlot.objects.count() + 1),
+            start_time=time(9, 0),
+            end_time=time(9, 15),
+        )
+        appointment = Appointment.objects.create(
+            patient=self.patient,
+            doctor=doctor,
+            time_slot=slot,
+            status="CONFIRMED",
+            consultation_fee=amount,
+        )
+        payment = Payment.objects.create(
+            appointment_id=appointment, amount=amount, status=status
+        )
+        Payment.objects.filter(pk=payment.pk).update(created_at=self.when)
+
+    def _wallet(self, transaction_type, amount, when):
+        transaction = WalletTransaction.objects.create(
+            user_id=self.patient,
+            transaction_type=transaction_type,
+            amount=Decimal(amount),
+            description="test",
+            balance_after=Decimal("0.00"),
+        )
+        WalletTransaction.objects.filter(pk=transaction.pk).update(created_at=when)
+
+    def test_revenue_by_doctor(self):
+        """Test that successful payments are grouped per doctor."""
+        rows = FinanceReportService.month_rows("revenue_by_doctor", self.month)
+
+        self.assertEqual(
+            [(row["doctor"], row["payments"], row["revenue"]) for row in rows],
+            [("Dr Smith", 2, Decimal("150.00")), ("Dr Jones", 1, Decimal("80.00"))],
+        )
+
+    def test_closed_month_is_cached(self):
+        """Test that a closed month is computed once and then read from cache."""
+        first = FinanceReportService.month_rows("revenue_by_specialty", self.month)
+
+        with self.assertNumQueries(0):
+            second = FinanceReportService.month_rows("revenue_by_specialty", self.month)
+
+        self.assertEqual(first, second)
+        self.assertEqual(first[0]["doctors"], 2)
+        self.assertEqual(first[0]["revenue"], Decimal("230.00"))
+
+    def test_month_with_pending_payment_is_not_cached(self):
+        """Test that a closed month is recomputed until its captures settle."""
+        self._pay(self.doctors[0], Decimal("40.00"), Payment.PENDING)
+        pending = Payment.objects.get(status=Payment.PENDING)
+
+        first = FinanceReportService.month_rows("revenue", self.month)
+        Payment.objects.filter(pk=pending.pk).update(status=Payment.SUCCESS)
+        second = FinanceReportService.month_rows("revenue", self.month)
+
+        self.assertEqual(first[0]["revenue"], Decimal("230.00"))
+        self.assertEqual(second[0]["revenue"], Decimal("270.00"))
+        self.assertEqual(
+            cache.get(FinanceReportService.cache_key("revenue", self.month)), second
+        )
+
+    def test_current_month_is_not_cached(self):
+        """Test that the open month is recomputed on every call."""
+        current = timezone.localdate()
+
+        FinanceReportService.month_rows("revenue", current)
+
+        self.assertIsNone(
+            cache.get(FinanceReportService.cache_key("revenue", current.replace(day=1)))
+        )
+
+    def test_wallet_float_carries_over(self):
+        """Test that the wallet float opens with everything deposited before."""
+        rows = FinanceReportService.month_rows("wallet_float", self.month)
+
+        self.assertEqual(
+            rows[0],
+            {
+                "opening_float": Decimal("300.00"),
+                "deposits": Decimal("200.00"),
+                "withdrawals": Decimal("150.00"),
+                "closing_float": Decimal("350.00"),
+            },
+        )
+
+    def test_finance_report_command_csv(self):
+        """Test that the command writes one CSV row per month."""
+        out = StringIO()
+
+        call_command(
+            "finance_report",
+            "revenue",
+            "--from",
+            f"{self.month:%Y-%m}",
+            "--to",
+            f"{timezone.localdate():%Y-%m}",
+            stdout=out,
+        )
+
+        rows = list(csv.DictReader(StringIO(out.getvalue())))
+        self.assertEqual(rows[0]["month"], self.month.isoformat())
+        self.assertEqual(rows[0]["payments"], "3")
+        self.assertEqual(rows[0]["failed"], "1")
+        self.assertEqual(rows[0]["revenue"], "230.00")
+        self.assertEqual(rows[-1]["revenue"], "0.00")
+
+
+class WalletHistoryViewTest(TestCase):
+    """Test cases for the paginated wallet history and monthly statement."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="patient", email="patient@test.com", password="testpass123"
+        )
+        doctor = Doctor.objects.create(
+            user=User.objects.create_user(
+                username="dr_smith",
+                email="dr.smith@test.com",
+                first_name="John",
+                last_name="Smith",
+                user_type="doctor",
+            ),
+            specialty=Specialty.objects.create(
+                name="Cardiology", description="Heart specialist"
+            ),
+            license_number="LIC123456",
+            experience_years=5,
+            bio="Cardiologist",
+            consultation_fee=Decimal("100.00"),
+            created_by=self.user,
+        )
+        self.appointments = []
+        for day in range(1, 4):
+            self.appointments.append(
+                Appointment.objects.create(
+                    patient=self.user,
+                    doctor=doctor,
+                    time_slot=TimeSlot.objects.create(
+                        doctor=doctor,
+                        date=date.today() + timedelta(days=day),
+                        start_time=time(9, 0),
+                        end_time=time(9, 15),
+                    ),
+                    status="CONFIRMED",
+                    consultation_fee=Decimal("100.00"),
+                )
+            )
+        self.client.login(username="patient", password="testpass123")
+
+    def _transactions(self, count):
+        balance = Decimal("0.00")
+        for index in range(count):
+            balance += Decimal("10.00")
+            WalletTransaction.objects.create(
+                user_id=self.user,
+                transaction_type=WalletTransaction.DEPOSIT,
+                amount=Decimal("10.00"),
+                description="Deposit",
+                balance_after=balance,
+                appointment_id=self.appointments[index % 3],
+            )
+
+    def test_transactions_page_query_count_is_constant(self):
+        """Test that a page costs the same queries whatever the history size."""
+        self._transactions(3)
+        url = reverse("payments:view_transactions")
+        # Warm the user snapshot the navbar reads
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+
+        self._transactions(40)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(url)
+
+        self.assertEqual(len(small), len(large))
+        page = response.context["transactions"]
+        self.assertEqual(len(page), 20)
+        self.assertTrue(page.has_next)
+        self.assertEqual(response.context["page_totals"]["deposits"], Decimal("200.00"))
+
+    def test_payment_history_follows_cursor(self):
+        """Test that the payment history pages through the user's payments."""
+        for appointment in self.appointments:
+            Payment.objects.create(
+                appointment_id=appointment, amount=Decimal("100.00"), status="success"
+            )
+
+        url = reverse("payments:payment_history")
+        with mock.patch("payments.views.HISTORY_PAGE_SIZE", 2):
+            first = self.client.get(url).context["payment_history"]
+            second = self.client.get(url, {"after": first.next_cursor}).context[
+                "payment_history"
+            ]
+
+        self.assertEqual(len(first) + len(second), 3)
+        self.assertFalse(second.has_next)
+
+    def test_monthly_statement_uses_running_balances(self):
+        """Test that the statement reads opening and closing balances."""
+        self._transactions(4)
+        month = timezone.localdate().replace(day=1)
+        previous = timezone.make_aware(
+            datetime.combine(month - timedelta(days=1), time(12, 0))
+        )
+        first = WalletTransaction.objects.order_by("id").first()
+        WalletTransaction.objects.filter(pk=first.pk).update(created_at=previous)
+
+        response = self.client.get(
+            reverse("payments:wallet_statement"), {"month": f"{month:%Y-%m}"}
+        )
+
+        statement = response.context["statement"]
+        self.assertEqual(statement["opening_balance"], Decimal("10.00"))
+        self.assertEqual(statement["deposits"], Decimal("30.00"))
+        self.assertEqual(statement["closing_balance"], Decimal("40.00"))
+        self.assertEqual(statement["transactions"], 3)
+
+    def test_deposit_and_withdraw_bump_wallet_version(self):
+        """Test that wallet moves change the snapshot's wallet version."""
+        from accounts.services import UserSnapshotService
+
+        versions = [UserSnapshotService.get(self.user.pk).wallet_version]
+        self.client.post(reverse("payments:deposit_funds"), {"amount": "50"})
+        versions.append(UserSnapshotService.get(self.user.pk).wallet_version)
+        self.client.post(reverse("payments:withdraw_funds"), {"amount": "20"})
+        versions.append(UserSnapshotService.get(self.user.pk).wallet_version)
+
+        self.assertEqual(len(set(versions)), 3)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.wallet_balance, Decimal("30.00"))
+
+
+class PaymentTestMixin:
+    """Shared fixtures: a patient with a funded wallet and a held appointment."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.patient = User.objects.create_user(
+            username="patient",
+            email="patient@test.com",
+            password="testpass123",
+            wallet_balance=Decimal("500.00"),
+        )
+        doctor = Doctor.objects.create(
+            user=User.objects.create_user(
+                username="dr_smith",
+                email="dr.smith@test.com",
+                first_name="John",
+                last_name="Smith",
+                user_type="doctor",
+            ),
+            specialty=Specialty.objects.create(
+                name="Cardiology", description="Heart specialist"
+            ),
+            license_number="LIC123456",
+            experience_years=5,
+            bio="Cardiologist",
+            consultation_fee=Decimal("100.00"),
+            created_by=self.patient,
+        )
+        self.appointment = Appointment.objects.create(
+            patient=self.patient,
+            doctor=doctor,
+            time_slot=TimeSlot.objects.create(
+                doctor=doctor,
+                date=date.today() + timedelta(days=1),
+                start_time=time(9, 0),
+                end_time=time(9, 15),
+            ),
+            status="PENDING",
+            consultation_fee=Decimal("100.00"),
+            hold_expires_at=timezone.now() + timedelta(minutes=15),
+        )
+        self.url = reverse("payments:process_payment", args=[self.appointment.id])
+        self.client.login(username="patient", password="testpass123")
+
+    def _submit(self, key, method="wallet"):
+        return self.client.post(
+            self.url, {"payment_method": method, "idempotency_key": key}
+        )
+
+
+class IdempotentPaymentTest(PaymentTestMixin, TestCase):
+    """Test cases for idempotent payment processing."""
+
+    def test_double_submit_charges_once(self):
+        """Test that resubmitting the same key replays the first response."""
+        first = self._submit("key-0000000001")
+        second = self._submit("key-0000000001")
+
+        self.assertEqual(first.url, second.url)
+        self.assertEqual(Payment.objects.count(), 1)
+        self.assertEqual(WalletTransaction.objects.count(), 1)
+        self.patient.refresh_from_db()
+        self.assertEqual(self.patient.wallet_balance, Decimal("400.00"))
+
+    def test_wallet_payment_bumps_wallet_version(self):
+        """Test that paying from the wallet changes the snapshot's wallet version."""
+        from accounts.services import UserSnapshotService
+
+        before = UserSnapshotService.get(self.patient.pk)
+        self._submit("key-0000000006")
+
+        after = UserSnapshotService.get(self.patient.pk)
+        self.assertGreater(after.wallet_version, before.wallet_version)
+
+    def test_retry_after_cache_loss_finds_stored_payment(self):
+        """Test that the unique key catches a retry the cache no longer knows."""
+        self._submit("key-0000000002")
+        cache.clear()
+
+        response = self._submit("key-0000000002")
+
+        self.assertRedirects(
+            response,
+            reverse("appointments:booking_confirmation", args=[self.appointment.id]),
+        )
+        self.assertEqual(Payment.objects.count(), 1)
+        self.patient.refresh_from_db()
+        self.assertEqual(self.patient.wallet_balance, Decimal("400.00"))
+
+    def test_second_key_cannot_pay_twice(self):
+        """Test that a fresh key for an already paid appointment is refused."""
+        self._submit("key-0000000003")
+
+        self._submit("key-0000000004", method="card")
+
+        self.assertEqual(Payment.objects.count(), 1)
+        self.patient.refresh_from_db()
+        self.assertEqual(self.patient.wallet_balance, Decimal("400.00"))
+
+    def test_insufficient_funds_rolls_back_insert(self):
+        """Test that a refused wallet payment leaves no Payment behind."""
+        User.objects.filter(pk=self.patient.pk).update(wallet_balance=Decimal("10"))
+
+        response = self._submit("key-0000000005")
+
+        self.assertRedirects(response, reverse("payments:wallet_detail"))
+        self.assertFalse(Payment.objects.exists())
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.status, "PENDING")
+
+
+class CardGatewayTest(PaymentTestMixin, TestCase):
+    """Test cases for asynchronous card capture and the gateway webhook."""
+
+    def _pay_by_card(self):
+        with mock.patch("payments.services.CaptureWorker.submit") as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                self._submit("key-card-000001", method="card")
+        payment = Payment.objects.get()
+        submit.assert_called_once_with(payment.pk)
+        return payment
+
+    def _webhook(self, payload, signature=None):
+        body = json.dumps(payload).encode()
+        return self.client.post(
+            reverse("payments:gateway_webhook"),
+            body,
+            content_type="application/json",
+            headers={"X-Gateway-Signature": signature or PaymentGateway.sign(body)},
+        )
+
+    def test_card_payment_defers_capture(self):
+        """Test that the request only queues the gateway call."""
+        payment = self._pay_by_card()
+
+        self.assertEqual(payment.status, Payment.PENDING)
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.status, "PENDING_PAYMENT")
+
+    def test_capture_confirms_appointment(self):
+        """Test that a successful capture confirms the appointment."""
+        payment = self._pay_by_card()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            captured = CardPaymentService.capture(
+                payment.pk, gateway=MockGateway(latency=0)
+            )
+
+        self.assertTrue(captured)
+        payment.refresh_from_db()
+        self.appointment.refresh_from_db()
+        self.assertEqual(payment.status, Payment.SUCCESS)
+        self.assertTrue(payment.gateway_reference.startswith("mock_"))
+        self.assertEqual(self.appointment.status, "CONFIRMED")
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(
+            list(
+                self.appointment.status_changes.order_by("id").values_list(
+                    "from_status", "to_status", "reason"
+                )
+            ),
+            [
+                ("PENDING", "PENDING_PAYMENT", "payment"),
+                ("PENDING_PAYMENT", "CONFIRMED", "gateway"),
+            ],
+        )
+
+    def test_decline_gives_hold_back(self):
+        """Test that a declined card reopens the appointment for payment."""
+        payment = self._pay_by_card()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CardPaymentService.capture(
+                payment.pk, gateway=MockGateway(latency=0, decline_rate=1)
+            )
+
+        payment.refresh_from_db()
+        self.appointment.refresh_from_db()
+        self.assertEqual(payment.status, Payment.FILED)
+        self.assertEqual(self.appointment.status, "PENDING")
+        self.assertGreater(self.appointment.hold_expires_at, timezone.now())
+        self.assertEqual(self.patient.notifications.count(), 1)
+
+    def test_claimed_payment_is_not_charged_again(self):
+        """Test that a payment another capturer holds is left alone."""
+        payment = self._pay_by_card()
+        Payment.objects.filter(pk=payment.pk).update(capture_started_at=timezone.now())
+        gateway = mock.Mock(spec=PaymentGateway)
+
+        self.assertFalse(CardPaymentService.capture(payment.pk, gateway=gateway))
+        Payment.objects.filter(pk=payment.pk).update(
+            created_at=timezone.now() - CardPaymentService.SWEEP_AFTER
+        )
+        self.assertEqual(CardPaymentService.capture_stale(gateway=gateway), (0, 0))
+        gateway.charge.assert_not_called()
+
+        # A claim left behind by a dead capturer is taken over
+        Payment.objects.filter(pk=payment.pk).update(
+            capture_started_at=timezone.now() - CardPaymentService.CLAIM_TIMEOUT
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            settled = CardPaymentService.capture_stale(gateway=MockGateway(latency=0))
+        self.assertEqual(settled, (1, 0))
+
+    def test_retry_after_timeout_reuses_the_charge(self):
+        """Test that a retried capture sends the same idempotency key."""
+        payment = self._pay_by_card()
+        gateway = MockGateway(latency=0, error_rate=1)
+
+        self.assertFalse(CardPaymentService.capture(payment.pk, gateway=gateway))
+        gateway.error_rate = 0
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(CardPaymentService.capture(payment.pk, gateway=gateway))
+
+        payment.refresh_from_db()
+        self.assertEqual(list(gateway.charges), [str(payment.transaction_id)])
+        self.assertEqual(
+            payment.gateway_reference,
+            gateway.charges[str(payment.transaction_id)].reference,
+        )
+
+    def test_webhook_is_signed_and_idempotent(self):
+        """Test that the webhook rejects bad signatures and applies once."""
+        payment = self._pay_by_card()
+        event = {"payment_id": payment.pk, "status": "succeeded", "reference": "ch_1"}
+
+        self.assertEqual(self._webhook(event, signature="forged").status_code, 400)
+        self.assertEqual(self._webhook(event).json(), {"applied": True})
+        self.assertEqual(self._webhook(event).json(), {"applied": False})
 
-# Create your tests here.
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, Payment.SUCCESS)
+        self.assertEqual(payment.gateway_reference, "ch_1")
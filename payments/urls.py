@@ -9,7 +9,9 @@ urlpatterns = [
     path("withdraw/", views.withdraw_funds, name="withdraw_funds"),
     path("history/", views.payment_history, name="payment_history"),
     path("transactions/", views.view_transactions, name="view_transactions"),
+    path("statement/", views.wallet_statement, name="wallet_statement"),
     path(
         "process/<int:appointment_id>/", views.process_payment, name="process_payment"
     ),
+    path("gateway/webhook/", views.gateway_webhook, name="gateway_webhook"),
 ]
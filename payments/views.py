@@ -2,14 +2,35 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db import transaction
+from django.db.models import Count, Q, Sum
 from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
+from django.urls import reverse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods, require_POST
+from core.pagination import KeysetPaginator
+from ledger.services import LedgerService
+from .gateways import GatewayResult, PaymentGateway
 from .models import Payment, WalletTransaction
+from .reports import next_month, previous_month
+from .services import (
+    AlreadyPaid,
+    CardPaymentService,
+    HoldExpired,
+    InsufficientFunds,
+    PaymentError,
+    PaymentService,
+    WalletStatementService,
+)
 from appointments.models import Appointment
 from accounts.models import User
+from datetime import datetime
 from decimal import Decimal
+import json
 import uuid
 
+HISTORY_PAGE_SIZE = 20
+
 
 @login_required
 def wallet_detail(request):
@@ -42,18 +63,22 @@ def deposit_funds(request):
 
             # Add funds to wallet
             with transaction.atomic():
-                user = request.user
+                # Lock the row so concurrent requests cannot lose an update
+                # the ledger has already recorded
+                user = User.objects.select_for_update().get(pk=request.user.pk)
                 user.wallet_balance += amount
-                user.save()
+                user.save(update_fields=["wallet_balance", "updated_at"])
+                request.user.wallet_balance = user.wallet_balance
 
                 # Create wallet transaction record
-                WalletTransaction.objects.create(
+                wallet_transaction = WalletTransaction.objects.create(
                     user_id=user,
                     transaction_type=WalletTransaction.DEPOSIT,
                     amount=amount,
                     description=f"Deposit of ${amount}",
                     balance_after=user.wallet_balance,
                 )
+                LedgerService.record_deposit(wallet_transaction)
 
                 messages.success(
                     request, f"Successfully deposited ${amount} to your wallet."
@@ -78,24 +103,25 @@ def withdraw_funds(request):
                 messages.error(request, "Amount must be greater than zero.")
                 return redirect("payments:wallet_detail")
 
-            if amount > request.user.wallet_balance:
-                messages.error(request, "Insufficient funds in wallet.")
-                return redirect("payments:wallet_detail")
-
             # Withdraw funds from wallet
             with transaction.atomic():
-                user = request.user
+                user = User.objects.select_for_update().get(pk=request.user.pk)
+                if amount > user.wallet_balance:
+                    messages.error(request, "Insufficient funds in wallet.")
+                    return redirect("payments:wallet_detail")
                 user.wallet_balance -= amount
-                user.save()
+                user.save(update_fields=["wallet_balance", "updated_at"])
+                request.user.wallet_balance = user.wallet_balance
 
                 # Create wallet transaction record
-                WalletTransaction.objects.create(
+                wallet_transaction = WalletTransaction.objects.create(
                     user_id=user,
                     transaction_type=WalletTransaction.WITHDRAW,
                     amount=amount,
                     description=f"Withdrawal of ${amount}",
                     balance_after=user.wallet_balance,
                 )
+                LedgerService.record_withdrawal(wallet_transaction)
 
                 messages.success(
                     request, f"Successfully withdrew ${amount} from your wallet."
@@ -111,130 +137,208 @@ def withdraw_funds(request):
 
 @login_required
 def payment_history(request):
-    """Display payment history for the user."""
-    payments = (
-        Payment.objects.filter(appointment_id__patient=request.user)
-        .select_related("appointment_id__doctor__user")
-        .order_by("-created_at")
+    """Display the user's payments, newest first, one keyset page at a time."""
+    payments = Payment.objects.filter(
+        appointment_id__patient=request.user
+    ).select_related("appointment_id__doctor__user", "appointment_id__time_slot")
+    page = KeysetPaginator(payments, HISTORY_PAGE_SIZE).page(
+        after=request.GET.get("after"), before=request.GET.get("before")
     )
 
     context = {
-        "payments": payments,
+        "payment_history": page,
+        "page_totals": Payment.objects.filter(
+            pk__in=[payment.pk for payment in page]
+        ).aggregate(
+            paid=Sum("amount", filter=Q(status=Payment.SUCCESS)),
+            failed=Count("id", filter=Q(status=Payment.FILED)),
+        ),
     }
     return render(request, "payments/payment_history.html", context)
 
 
 @login_required
 def view_transactions(request):
-    """Display all wallet transactions for the user."""
-    transactions = WalletTransaction.objects.filter(user_id=request.user).order_by(
-        "-created_at"
+    """Display the user's wallet transactions, newest first, one keyset page at a time."""
+    transactions = WalletTransaction.objects.filter(
+        user_id=request.user
+    ).select_related("appointment_id__doctor__user", "appointment_id__time_slot")
+    page = KeysetPaginator(transactions, HISTORY_PAGE_SIZE).page(
+        after=request.GET.get("after"), before=request.GET.get("before")
     )
 
     context = {
-        "transactions": transactions,
+        "transactions": page,
+        "page_totals": WalletTransaction.objects.filter(
+            pk__in=[tx.pk for tx in page]
+        ).aggregate(
+            deposits=Sum(
+                "amount", filter=Q(transaction_type=WalletTransaction.DEPOSIT)
+            ),
+            withdrawals=Sum(
+                "amount", filter=Q(transaction_type=WalletTransaction.WITHDRAW)
+            ),
+        ),
     }
     return render(request, "payments/view_transactions.html", context)
 
 
+@login_required
+def wallet_statement(request):
+    """Display a monthly wallet statement built from running balances."""
+    today = timezone.localdate()
+    try:
+        month = datetime.strptime(request.GET.get("month", ""), "%Y-%m").date()
+    except ValueError:
+        month = today.replace(day=1)
+
+    context = {
+        "statement": WalletStatementService.monthly_statement(request.user.pk, month),
+        "previous_month": previous_month(month),
+        "next_month": next_month(month) if month < today.replace(day=1) else None,
+    }
+    return render(request, "payments/wallet_statement.html", context)
+
+
+def _replay(request, outcome):
+    """Turn a stored payment outcome into a message and a redirect."""
+    messages.add_message(request, outcome["level"], outcome["message"])
+    return redirect(outcome["url"])
+
+
 @login_required
 def process_payment(request, appointment_id):
-    """Process payment for an appointment."""
+    """
+    Process payment for an appointment.
+
+    Every submission carries an idempotency key (the ``Idempotency-Key``
+    header or the form's hidden field). A retry of a processed request is
+    answered from the replay cache, or from the Payment stored with the key,
+    without charging again.
+    """
+    if request.method == "POST":
+        key = PaymentService.clean_key(
+            request.headers.get("Idempotency-Key")
+            or request.POST.get("idempotency_key")
+        )
+        replay = PaymentService.get_replay(request.user.pk, key)
+        if replay:
+            return _replay(request, replay)
+
     appointment = get_object_or_404(
         Appointment, id=appointment_id, patient=request.user
     )
 
+    if appointment.status == "EXPIRED" or appointment.hold_expired:
+        messages.error(
+            request,
+            "Your reservation has expired and the time slot was released. Please book again.",
+        )
+        return redirect("appointments:book", doctor_id=appointment.doctor_id)
+
     if request.method == "POST":
         payment_method = request.POST.get("payment_method")
 
-        if payment_method == "wallet":
-            # Process wallet payment
-            if request.user.wallet_balance >= appointment.consultation_fee:
-                with transaction.atomic():
-                    # Deduct from wallet
-                    user = request.user
-                    user.wallet_balance -= appointment.consultation_fee
-                    user.save()
-
-                    # Create payment record
-                    payment = Payment.objects.create(
-                        appointment_id=appointment,
-                        amount=appointment.consultation_fee,
-                        status=Payment.SUCCESS,
-                    )
-
-                    # Create wallet transaction
-                    WalletTransaction.objects.create(
-                        user_id=user,
-                        transaction_type=WalletTransaction.WITHDRAW,
-                        amount=appointment.consultation_fee,
-                        description=f"Payment for appointment with Dr. {appointment.doctor.user.get_full_name()}",
-                        balance_after=user.wallet_balance,
-                        appointment_id=appointment,
-                    )
-
-                    # Update appointment status
-                    appointment.status = "CONFIRMED"
-                    appointment.save()
-
-                    # Send payment confirmation email
-                    from appointments.services import AppointmentEmailService
-
-                    try:
-                        AppointmentEmailService.send_payment_confirmation(appointment)
-                    except Exception as e:
-                        # Don't fail the payment if email fails
-                        print(
-                            f"Warning: Could not send payment confirmation email: {str(e)}"
-                        )
-
-                    messages.success(
-                        request,
-                        "Payment successful! Your appointment has been confirmed.",
-                    )
-                    return redirect(
-                        "appointments:booking_confirmation",
-                        appointment_id=appointment.id,
-                    )
-            else:
-                messages.error(
-                    request,
-                    "Insufficient funds in wallet. Please add funds or use another payment method.",
+        if payment_method in PaymentService.METHODS:
+            try:
+                payment, created = PaymentService.pay(
+                    request.user, appointment, payment_method, key
                 )
+            except HoldExpired as e:
+                outcome = {
+                    "level": messages.ERROR,
+                    "message": str(e),
+                    "url": reverse(
+                        "appointments:book", kwargs={"doctor_id": appointment.doctor_id}
+                    ),
+                }
+            except InsufficientFunds as e:
+                # Not replayed: the user may add funds and submit again
+                messages.error(request, str(e))
                 return redirect("payments:wallet_detail")
-
-        elif payment_method == "card":
-            # For now, simulate card payment success
-            with transaction.atomic():
-                payment = Payment.objects.create(
-                    appointment_id=appointment,
-                    amount=appointment.consultation_fee,
-                    status=Payment.SUCCESS,
-                )
-
-                appointment.status = "CONFIRMED"
-                appointment.save()
-
-                # Send payment confirmation email
-                from appointments.services import AppointmentEmailService
-
-                try:
-                    AppointmentEmailService.send_payment_confirmation(appointment)
-                except Exception as e:
-                    # Don't fail the payment if email fails
-                    print(
-                        f"Warning: Could not send payment confirmation email: {str(e)}"
+            except AlreadyPaid as e:
+                outcome = {
+                    "level": messages.INFO,
+                    "message": str(e),
+                    "url": reverse(
+                        "appointments:booking_confirmation",
+                        kwargs={"appointment_id": appointment.id},
+                    ),
+                }
+            except PaymentError as e:
+                outcome = {
+                    "level": messages.ERROR,
+                    "message": str(e),
+                    "url": reverse("appointments:appointment_list"),
+                }
+            else:
+                if payment.status == Payment.PENDING:
+                    # Card charge handed to the capture worker
+                    message = (
+                        "Your card payment is being processed. The appointment "
+                        "will be confirmed as soon as the bank approves it."
                     )
-
-                messages.success(
-                    request, "Payment successful! Your appointment has been confirmed."
-                )
-                return redirect(
-                    "appointments:booking_confirmation", appointment_id=appointment.id
-                )
+                else:
+                    if created:
+                        # Send payment confirmation email
+                        from appointments.services import AppointmentEmailService
+
+                        try:
+                            AppointmentEmailService.send_payment_confirmation(
+                                appointment
+                            )
+                        except Exception as e:
+                            # Don't fail the payment if email fails
+                            print(
+                                f"Warning: Could not send payment confirmation email: {str(e)}"
+                            )
+                    message = "Payment successful! Your appointment has been confirmed."
+                outcome = {
+                    "level": messages.SUCCESS,
+                    "message": message,
+                    "url": reverse(
+                        "appointments:booking_confirmation",
+                        kwargs={"appointment_id": payment.appointment_id_id},
+                    ),
+                }
+            PaymentService.store_replay(request.user.pk, key, outcome)
+            return _replay(request, outcome)
 
     context = {
         "appointment": appointment,
         "user_balance": request.user.wallet_balance,
+        "idempotency_key": uuid.uuid4().hex,
     }
     return render(request, "payments/process_payment.html", context)
+
+
+@csrf_exempt
+@require_POST
+def gateway_webhook(request):
+    """
+    Receive a charge result from the card gateway.
+
+    The body is JSON ``{"payment_id", "status": "succeeded"|"failed",
+    "reference", "error"}`` signed with PAYMENT_WEBHOOK_SECRET in the
+    ``X-Gateway-Signature`` header. Deliveries are idempotent.
+    """
+    if not PaymentGateway.verify(
+        request.body, request.headers.get("X-Gateway-Signature")
+    ):
+        return JsonResponse({"error": "invalid signature"}, status=400)
+    try:
+        event = json.loads(request.body)
+        payment_id = int(event["payment_id"])
+        succeeded = event["status"] == "succeeded"
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": "malformed event"}, status=400)
+
+    applied = CardPaymentService.apply_result(
+        payment_id,
+        GatewayResult(
+            succeeded=succeeded,
+            reference=str(event.get("reference", ""))[:64],
+            error=str(event.get("error", "")),
+        ),
+    )
+    return JsonResponse({"applied": applied})
@@ -0,0 +1,72 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class CaptureWorker:
+    """
+    Bounded thread pool that captures card payments off the request thread.
+
+    At most PAYMENT_CAPTURE_WORKERS gateway calls run at once and at most
+    PAYMENT_CAPTURE_QUEUE payments wait for one. When the queue is full the
+    payment simply stays pending for ``manage.py capture_payments``, so a
+    slow gateway never backs up into request handling.
+    """
+
+    _executor = None
+    _slots = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def _ensure_started(cls):
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=settings.PAYMENT_CAPTURE_WORKERS,
+                    thread_name_prefix="payment-capture",
+                )
+                cls._slots = threading.BoundedSemaphore(
+                    settings.PAYMENT_CAPTURE_WORKERS + settings.PAYMENT_CAPTURE_QUEUE
+                )
+
+    @classmethod
+    def submit(cls, payment_id):
+        """
+        Queue the capture of a pending payment without waiting for it.
+
+        Returns:
+            bool: False if the pool is saturated and the payment was left
+            for the capture_payments sweep
+        """
+        cls._ensure_started()
+        if not cls._slots.acquire(blocking=False):
+            logger.warning("Capture queue full; payment %s left pending", payment_id)
+            return False
+        cls._executor.submit(cls._run, payment_id, cls._slots)
+        return True
+
+    @classmethod
+    def _run(cls, payment_id, slots):
+        from .services import CardPaymentService
+
+        try:
+            CardPaymentService.capture(payment_id)
+        except Exception:
+            logger.exception("Capturing payment %s failed", payment_id)
+        finally:
+            close_old_connections()
+            slots.release()
+
+    @classmethod
+    def shutdown(cls, wait=True):
+        """Stop the pool, e.g. at the end of a benchmark."""
+        with cls._lock:
+            if cls._executor is not None:
+                cls._executor.shutdown(wait=wait)
+                cls._executor = None
+                cls._slots = None